@@ -1,26 +1,63 @@
 import os
-import json
 import re
-from io import BytesIO
-from email import message_from_bytes
-from email.policy import default as default_policy
+import logging
+from functools import cached_property
 from dotenv import load_dotenv
-from langchain.prompts import FewShotPromptTemplate, PromptTemplate
-from langchain.chains import LLMChain
-from PyPDF2 import PdfReader
-from langchain_groq import ChatGroq
+
+from agents import deadline, scheduler
+from agents.parsing import classifier_text
+from agents.prompt_builder import FewShotPromptBuilder
+from mcp.metrics import stage_timer
 
 load_dotenv()
 
-class ClassifierAgent:
-    def __init__(self, temperature: float = 0.0):
-        groq_key = os.getenv("GROQ_API_KEY")
-        groq_model = os.getenv("GROQ_MODEL")
-        if not groq_key or not groq_model:
-            raise ValueError("GROQ_API_KEY and GROQ_MODEL must be set in .env")
+logger = logging.getLogger(__name__)
+
+# Every intent the classifier is asked to choose from; an LLM may still answer something else
+INTENTS = ("RFQ", "Complaint", "Invoice", "Regulation", "Fraud Risk", "Unknown")
+
+PROMPT_PREFIX = (
+    "You are a classifier tasked with determining the business intent of a file based on its format and content. "
+    "Analyze the semantic context of keywords (e.g., financial terms like 'invoice' and 'total' for invoices, "
+    "legal terms like 'act' for regulations) and choose exactly one intent from [" + ", ".join(INTENTS) + "]. "
+    "Prioritize the meaning and role of keywords in the context, not just their presence.\n\n"
+)
+EXAMPLE_TEMPLATE = "Format: {format}\nText: {text}\nContext: {context}\nIntent: {intent}\n"
+PROMPT_SUFFIX = "Format: {input_format}\nText: {input_text}\nIntent:"
+
 
-        self.llm = ChatGroq(api_key=groq_key, model=groq_model, temperature=temperature)
+def format_from_filename(filename: str) -> str:
+    """Document format from the file extension: JSON, PDF, Email or Unknown."""
+    ext = filename.lower().rsplit(".", 1)[-1] if "." in filename else ""
+    if ext == "json":
+        return "JSON"
+    if ext == "pdf":
+        return "PDF"
+    if ext in {"eml", "txt", "email"}:
+        return "Email"
+    return "Unknown"
+
+
+class ClassifierAgent:
+    """
+    Classifies a document's format (from its filename) and business intent:
+    keyword scoring first, then a few-shot LLM prompt when scoring is not conclusive.
+
+    The LLM prompt is built per request (agents/prompt_builder.py), from the
+    environment:
+      - CLASSIFIER_FEW_SHOT_K: examples included, picked by format and word overlap (default 3)
+      - CLASSIFIER_PROMPT_TOKENS: estimated token budget of the whole prompt; the
+        input snippet is cut to fit (default 1000)
+    """
+
+    def __init__(self, temperature: float = 0.0, llm=None):
+        # LangChain and the Groq client are only built the first time the
+        # LLM fallback is needed (see the llm property below).
+        self.temperature = temperature
+        self._llm = llm
         self.max_snippet_chars = 4096  # Increased for more context
+        self.few_shot_k = int(os.getenv("CLASSIFIER_FEW_SHOT_K", 3))
+        self.prompt_tokens = int(os.getenv("CLASSIFIER_PROMPT_TOKENS", 1000))
 
         # Semantic keyword clusters with weights
         self.intent_keywords = {
@@ -54,7 +91,7 @@ class ClassifierAgent:
         }
 
         # Few-shot examples with semantic context
-        few_shot_examples = [
+        self.few_shot_examples = [
             {
                 "format": "Email",
                 "text": "Subject: Urgent complaint #12987\nThe product I received is defective and doesn’t work. Please replace it immediately.",
@@ -99,35 +136,39 @@ class ClassifierAgent:
             },
         ]
 
-        example_prompt = PromptTemplate(
-            input_variables=["format", "text", "intent", "context"],
-            template="Format: {{ format }}\nText: {{ text }}\nContext: {{ context }}\nIntent: {{ intent }}\n",
-            template_format="jinja2"
+    @cached_property
+    def llm(self):
+        if self._llm is not None:
+            return self._llm
+        from agents.llm import get_llm
+        return get_llm("classifier", self.temperature)
+
+    @cached_property
+    def prompt_builder(self) -> FewShotPromptBuilder:
+        return FewShotPromptBuilder(
+            prefix=PROMPT_PREFIX,
+            examples=self.few_shot_examples,
+            example_template=EXAMPLE_TEMPLATE,
+            suffix=PROMPT_SUFFIX,
+            k=self.few_shot_k,
+            token_budget=self.prompt_tokens,
         )
 
-        prefix = (
-            "You are a classifier tasked with determining the business intent of a file based on its format and content. "
-            "Analyze the semantic context of keywords (e.g., financial terms like 'invoice' and 'total' for invoices, "
-            "legal terms like 'act' for regulations) and choose exactly one intent from [RFQ, Complaint, Invoice, Regulation, Fraud Risk, Unknown]. "
-            "Prioritize the meaning and role of keywords in the context, not just their presence.\n\n"
-        )
-        suffix = "Format: {{ input_format }}\nText: {{ input_text }}\nIntent:"
-
-        self.few_shot_prompt = FewShotPromptTemplate(
-            examples=few_shot_examples,
-            example_prompt=example_prompt,
-            prefix=prefix,
-            suffix=suffix,
-            input_variables=["input_format", "input_text"],
-            example_separator="\n---\n",
-            template_format="jinja2"
-        )
-
-        self.chain = LLMChain(llm=self.llm, prompt=self.few_shot_prompt)
-
-    def process(self, raw_bytes: bytes, filename: str, metadata: dict = None) -> dict:
-        fmt = self._format_from_filename(filename)
-        snippet = self._bytes_to_text(raw_bytes)
+    def warm_up(self):
+        """Build the prompt builder and LLM client ahead of the first request."""
+        return self.prompt_builder, self.llm
+
+    def process(self, raw_bytes: bytes, filename: str, metadata: dict = None, text: str = None) -> dict:
+        """
+        `text` may carry the output of _bytes_to_text computed elsewhere
+        (e.g. in the parse process pool) so it isn't parsed twice.
+        """
+        fmt = format_from_filename(filename)
+        if text is not None:
+            snippet = text
+        else:
+            with stage_timer("classifier_parse", format=fmt, agent="classifier"):
+                snippet = self._bytes_to_text(raw_bytes)
 
         if len(snippet) > self.max_snippet_chars:
             snippet = snippet[:self.max_snippet_chars] + "..."
@@ -138,71 +179,48 @@ class ClassifierAgent:
 
         # Semantic scoring
         intent_scores = self._score_intents(snippet, fmt)
-        if fmt == "PDF" and intent_scores.get("Invoice", 0) >= 3:  # Require strong invoice evidence
-            return {"source": "classifier", "format": fmt, "intent": "Invoice"}
+        keyword_intent = self.keyword_intent(intent_scores, fmt)
+        if keyword_intent is not None:
+            return {"source": "classifier", "format": fmt, "intent": keyword_intent}
 
-        # Fallback to LLM
-        llm_output = self.chain.run(input_format=fmt, input_text=snippet)
-        intent = self._parse_intent(llm_output)
+        # Fallback to LLM; out of latency budget, the best keyword score decides
+        try:
+            # Likely fraud/complaints go ahead of bulk LLM work
+            likely = self._intent_from_scores(intent_scores)
+            with scheduler.at_least(scheduler.URGENT_INTENTS.get(likely, "low")):
+                intent = self.classify_with_llm(fmt, snippet)
+        except Exception as e:
+            if not deadline.is_timeout(e):
+                raise
+            logger.warning(f"Classifier LLM call cut short ({e}); using keyword scores")
+            deadline.degrade("metadata.intent")
+            intent = self._intent_from_scores(intent_scores)
         return {"source": "classifier", "format": fmt, "intent": intent}
 
-    def _format_from_filename(self, filename: str) -> str:
-        ext = filename.lower().rsplit(".", 1)[-1] if "." in filename else ""
-        if ext == "json":
-            return "JSON"
-        if ext == "pdf":
-            return "PDF"
-        if ext in {"eml", "txt", "email"}:
-            return "Email"
-        return "Unknown"
+    def classify_with_llm(self, fmt: str, snippet: str, builder: FewShotPromptBuilder = None) -> str:
+        """
+        Ask the LLM for the intent. Prompt and completion token counts are
+        recorded per call by the LLM metrics callback (agents/llm.py).
+        """
+        built = (builder or self.prompt_builder).build(fmt, snippet, self._score_intents(snippet, fmt))
+        logger.debug(f"Classifier prompt: ~{built['prompt_tokens']} tokens, examples {built['examples']}, "
+                     f"snippet truncated: {built['truncated']}")
+        with scheduler.llm_slot():
+            llm_output = deadline.bounded(self.llm).invoke(built["prompt"]).content
+        return self._parse_intent(llm_output)
+
+    def keyword_intent(self, scores: dict, fmt: str):
+        """The intent keyword scores settle on their own, or None if the LLM has to decide."""
+        if fmt == "PDF" and scores.get("Invoice", 0) >= 3:  # Require strong invoice evidence
+            return "Invoice"
+        return None
+
+    def _intent_from_scores(self, scores: dict) -> str:
+        best = max(scores, key=scores.get)
+        return best if scores[best] > 0 else "Unknown"
 
     def _bytes_to_text(self, raw_bytes: bytes) -> str:
-        # Email
-        try:
-            msg = message_from_bytes(raw_bytes, policy=default_policy)
-            headers = [f"Subject: {msg.get('Subject', '')}" if msg.get("Subject") else "",
-                      f"From: {msg.get('From', '')}" if msg.get("From") else ""]
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain" and part.get_payload(decode=True):
-                        body += part.get_payload(decode=True).decode("utf-8", errors="ignore")
-            else:
-                body = msg.get_payload(decode=True).decode("utf-8", errors="ignore")
-            combined = " ".join(headers) + " " + body
-            return re.sub(r"\s+", " ", combined).strip()
-        except:
-            pass
-
-        # JSON
-        try:
-            text = raw_bytes.decode("utf-8", errors="ignore")
-            data = json.loads(text)
-            return json.dumps(data, indent=2)
-        except:
-            pass
-
-        # PDF
-        try:
-            reader = PdfReader(BytesIO(raw_bytes))
-            pages = []
-            for i, page in enumerate(reader.pages):
-                if i >= 2:
-                    break
-                txt = page.extract_text() or ""
-                txt = re.sub(r"\s+", " ", txt)  # Normalize whitespace
-                txt = re.sub(r"\|\s*\|", " ", txt)  # Remove table artifacts
-                pages.append(txt)
-            return " ".join(pages).strip()
-        except:
-            pass
-
-        # UTF-8 fallback
-        try:
-            decoded = raw_bytes.decode("utf-8", errors="ignore")
-            return re.sub(r"\s+", " ", decoded).strip()
-        except:
-            return repr(raw_bytes[:200])
+        return classifier_text(raw_bytes)
 
     def _score_intents(self, snippet: str, fmt: str) -> dict:
         scores = {intent: 0 for intent in self.intent_keywords}
@@ -0,0 +1,95 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from mcp.metrics import DEGRADED
+
+# Don't start an LLM or HTTP call with less time than this left; fall back instead
+MIN_CALL_SECONDS = float(os.getenv("CONDUIT_DEADLINE_MIN_CALL_MS", 200)) / 1000.0
+
+
+class DeadlineExceeded(Exception):
+    """The request's latency budget ran out before this step could run."""
+
+
+class Deadline:
+    """
+    Latency budget of one request. It is carried in a context variable, so it
+    reaches every stage without being passed around: asyncio tasks,
+    asyncio.to_thread and LangChain's batch executor all copy the context.
+
+    Stages that fall back to a rule-based result because of it call
+    degrade(field), and the request reports those fields.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def check(self) -> float:
+        """Remaining seconds, or DeadlineExceeded if too little is left to start a call."""
+        remaining = self.remaining()
+        if remaining < MIN_CALL_SECONDS:
+            raise DeadlineExceeded(f"Latency budget of {self.seconds:.1f}s exhausted")
+        return remaining
+
+    def degrade(self, field: str) -> None:
+        if field not in self.degraded:
+            self.degraded.append(field)
+            DEGRADED.labels(field=field).inc()
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("conduit_deadline", default=None)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Run the enclosed stages under a budget of `seconds` (None or <= 0: unbounded)."""
+    deadline = Deadline(seconds) if seconds and seconds > 0 else None
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds the next call may take (None when unbounded); raises DeadlineExceeded."""
+    deadline = _current.get()
+    return deadline.check() if deadline is not None else None
+
+
+def bounded(llm):
+    """
+    The chat model limited to the request's remaining budget (agents/llm.py
+    BudgetedLLM): each attempt times out with what is left, retries happen
+    only while the budget allows them, and streams stop when it runs out.
+    Raises DeadlineExceeded if there's no time left to start a call.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return llm
+    deadline.check()
+    from agents.llm import BudgetedLLM
+    return BudgetedLLM(llm, deadline)
+
+
+def is_timeout(error: BaseException) -> bool:
+    """Whether `error` means the budget (or a provider/HTTP timeout) cut a call short."""
+    return isinstance(error, (DeadlineExceeded, TimeoutError)) or "Timeout" in type(error).__name__
+
+
+def degrade(field: str) -> None:
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.degrade(field)
@@ -1,16 +1,19 @@
 import os
 import re
+import logging
+from functools import cached_property
 from uuid import uuid4
 from email import message_from_bytes
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable
 
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+
+from agents import deadline, scheduler
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class EmailAgent:
     """
     EmailAgent:
@@ -18,11 +21,46 @@ class EmailAgent:
       - Extracts: sender, subject, body_summary, urgency, tone, thread_id
       - Suggests an action: "escalate" → CRM or "log" → database
       - Uses a small LLMChain to detect tone (angry/polite/threatening/spam)
+      - Lists attachments as sub-documents (extract_attachments) and folds their
+        results back into the email's extraction and action (aggregate)
+
+    Attachment handling is configured from the environment:
+      - CONDUIT_MAX_ATTACHMENTS:        attachments processed per email (default 10)
+      - CONDUIT_ATTACHMENT_DEPTH:       how deep attached emails are followed (default 2)
+      - CONDUIT_ATTACHMENT_CONCURRENCY: attachments processed at once per upload (default 4)
     """
 
-    def __init__(self, temperature: float = 0.0):
-        model_name = os.getenv("GROQ_MODEL")
-        self.llm = ChatGroq(model_name=model_name, temperature=temperature)
+    # Targets that outrank a plain "log" when an attachment asks for them
+    ESCALATION_RANK = {"risk_alert": 2, "crm": 1}
+
+    # Used when an attachment has no filename with a known extension
+    CONTENT_TYPE_EXTENSIONS = {
+        "application/pdf":  "pdf",
+        "application/json": "json",
+        "message/rfc822":   "eml",
+        "text/plain":       "txt",
+    }
+
+    def __init__(self, temperature: float = 0.0, llm=None):
+        self.temperature = temperature
+        self._llm = llm
+        self.urgent_keywords = ["urgent", "asap", "immediately", "as soon as possible"]
+        self.max_attachments = int(os.getenv("CONDUIT_MAX_ATTACHMENTS", 10))
+        self.attachment_depth = int(os.getenv("CONDUIT_ATTACHMENT_DEPTH", 2))
+        self.attachment_concurrency = int(os.getenv("CONDUIT_ATTACHMENT_CONCURRENCY", 4))
+
+    @cached_property
+    def llm(self):
+        if self._llm is not None:
+            return self._llm
+        from agents.llm import get_llm
+        return get_llm("email_agent", self.temperature)
+
+    @cached_property
+    def tone_chain(self):
+        # Built on first use so that importing/constructing the agent stays cheap
+        from langchain.prompts import PromptTemplate
+        from langchain.chains import LLMChain
 
         tone_prompt = PromptTemplate(
             input_variables=["email_body"],
@@ -32,18 +70,22 @@ class EmailAgent:
                 "Tone:"
             )
         )
-        self.tone_chain = LLMChain(llm=self.llm, prompt=tone_prompt)
+        return LLMChain(llm=self.llm, prompt=tone_prompt)
 
-        self.urgent_keywords = ["urgent", "asap", "immediately", "as soon as possible"]
+    def warm_up(self):
+        """Build the tone chain and LLM client ahead of the first request."""
+        return self.tone_chain
 
-    def process(self, raw_bytes: bytes, metadata: Dict[str, Any]) -> dict:
+    def process(self, raw_bytes: bytes, metadata: Dict[str, Any],
+                emit: Callable[[str, Dict[str, Any]], None] = None) -> dict:
         """
         1) Parse MIME headers/body
         2) Extract: sender, subject, body
         3) Compute: urgency, tone, body_summary, thread_id
+           (with `emit`, the tone is streamed as "token" events)
         4) Suggest action
         5) Return:
-            {"source":"email_agent", "data":{...}, "action_suggestion":{...}}
+            {"source":"email_agent", "source_id", "data":{...}, "action_suggestion":{...}}
         """
         msg = message_from_bytes(raw_bytes)
         sender = msg.get("From", "")
@@ -54,6 +96,8 @@ class EmailAgent:
         if msg.is_multipart():
             for part in msg.walk():
                 content_type = part.get_content_type()
+                if part.get_content_disposition() == "attachment":
+                    continue  # processed as a sub-document, see extract_attachments
                 if content_type == "text/plain" and part.get_payload(decode=True):
                     body += part.get_payload(decode=True).decode("utf-8", errors="ignore")
         else:
@@ -64,7 +108,9 @@ class EmailAgent:
 
         body_summary = self._summarize_body(body)
         urgency = self._get_urgency(subject, body)
-        tone    = self._get_tone(body)
+        # An urgent email's tone call goes ahead of bulk LLM work
+        with scheduler.at_least("urgent" if urgency == "high" else "normal"):
+            tone = self._get_tone(body, emit)
         thread_id = in_reply_to if in_reply_to else uuid4().hex
 
         data = {
@@ -76,17 +122,73 @@ class EmailAgent:
             "thread_id":    thread_id
         }
 
-        if urgency == "high" or tone == "angry":
-            action_suggestion = {"action": "escalate", "target": "crm"}
-        else:
-            action_suggestion = {"action": "log", "target": "database"}
-
         return {
             "source": "email_agent",
+            "source_id": metadata.get("source_id", f"email_{uuid4().hex}"),
             "data": data,
-            "action_suggestion": action_suggestion
+            "action_suggestion": self._determine_action(urgency, tone)
         }
 
+    def extract_attachments(self, raw_bytes: bytes) -> List[Dict[str, Any]]:
+        """
+        Return the email's attachments as sub-documents:
+            [{"filename", "content_type", "content": bytes}, ...]
+        Attached emails (message/rfc822) are returned whole, not descended into.
+        At most max_attachments are returned.
+        """
+        msg = message_from_bytes(raw_bytes)
+        if not msg.is_multipart():
+            return []
+        attachments = []
+        for part in msg.get_payload():
+            attachments.extend(self._attachments_of(part))
+        return attachments[:self.max_attachments]
+
+    def _attachments_of(self, part) -> List[Dict[str, Any]]:
+        content_type = part.get_content_type()
+        if content_type == "message/rfc822":
+            inner = part.get_payload()
+            inner = inner[0] if isinstance(inner, list) else inner
+            content = inner.as_bytes() if hasattr(inner, "as_bytes") else bytes(inner)
+            return [self._attachment(part, content_type, content)]
+        if part.is_multipart():
+            found = []
+            for sub in part.get_payload():
+                found.extend(self._attachments_of(sub))
+            return found
+        if part.get_content_disposition() != "attachment":
+            return []  # message body (text/plain, text/html alternatives, inline images)
+        content = part.get_payload(decode=True)
+        return [self._attachment(part, content_type, content)] if content else []
+
+    def _attachment(self, part, content_type: str, content: bytes) -> Dict[str, Any]:
+        filename = part.get_filename() or ""
+        known = filename.lower().rsplit(".", 1)[-1] in {"pdf", "json", "eml", "txt", "email"} if "." in filename else False
+        if not known and content_type in self.CONTENT_TYPE_EXTENSIONS:
+            filename = f"{filename or 'attachment'}.{self.CONTENT_TYPE_EXTENSIONS[content_type]}"
+        return {"filename": filename or "attachment", "content_type": content_type, "content": content}
+
+    def aggregate(self, result: dict, children: List[Dict[str, Any]]) -> dict:
+        """
+        Fold attachment results into the email's own result:
+          - data["attachments"]: one summary per attachment (format, intent,
+            extraction and suggested action, or the error that stopped it)
+          - the action becomes the most severe one among the email and its
+            attachments (risk_alert > crm > anything else)
+        """
+        data = dict(result["data"], attachments=children)
+        action = result["action_suggestion"]
+        for child in children:
+            suggestion = child.get("action_suggestion") or {}
+            if self.ESCALATION_RANK.get(suggestion.get("target"), 0) > self.ESCALATION_RANK.get(action.get("target"), 0):
+                action = dict(suggestion, reason=f"attachment {child['filename']}")
+        return dict(result, data=data, action_suggestion=action)
+
+    def _determine_action(self, urgency: str, tone: str) -> Dict[str, str]:
+        if urgency == "high" or tone == "angry":
+            return {"action": "escalate", "target": "crm"}
+        return {"action": "log", "target": "database"}
+
     def _summarize_body(self, body: str) -> str:
         return body.strip()[:200]
 
@@ -97,12 +199,28 @@ class EmailAgent:
                 return "high"
         return "normal"
 
-    def _get_tone(self, body: str) -> str:
+    def _get_tone(self, body: str, emit=None) -> str:
         if not body.strip():
             return "polite"
 
         truncated = body[:1000]
-        llm_response = self.tone_chain.run(email_body=truncated).strip().lower()
+        try:
+            prompt = self.tone_chain.prompt.format(email_body=truncated)
+            with scheduler.llm_slot():
+                llm = deadline.bounded(self.llm)
+                if emit is not None:
+                    from agents.llm import stream_completion
+                    llm_response = stream_completion(llm, prompt, emit, "tone")
+                else:
+                    llm_response = llm.invoke(prompt).content
+        except Exception as e:
+            if not deadline.is_timeout(e):
+                raise
+            # Out of latency budget: default tone (urgency is keyword-based anyway)
+            logger.warning(f"Tone LLM call cut short ({e}); defaulting to polite")
+            deadline.degrade("extraction.tone")
+            return "polite"
+        llm_response = llm_response.strip().lower()
 
         # Post‑process to ensure one of the three labels
         for label in ["angry", "polite", "threatening", "spam"]:
@@ -3,7 +3,6 @@ import json
 import logging
 from typing import Any, Dict, List, Union
 from datetime import datetime
-from jsonschema import validate, ValidationError
 
 class JSONAgent:
     """
@@ -83,6 +82,9 @@ class JSONAgent:
         4) Decide an action_suggestion
         5) Return a standardized dict and log to shared_memory
         """
+        # jsonschema is slow to import; only pay for it once JSON actually arrives
+        from jsonschema import validate, ValidationError
+
         try:
             if isinstance(json_data, (bytes, bytearray)):
                 text = json_data.decode("utf-8")
@@ -0,0 +1,198 @@
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+from uuid import UUID
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable, RunnableBinding
+from langchain_groq import ChatGroq
+
+from mcp.metrics import LLM_CALL_TOKENS, LLM_LATENCY, LLM_TOKENS
+
+load_dotenv()
+
+# One ChatGroq client (and its HTTP connection pool) per (model, temperature,
+# max_retries), shared by every agent instead of each agent building its own.
+_clients: Dict[tuple, ChatGroq] = {}
+_clients_lock = threading.Lock()
+
+# Retries of a call under a latency budget (see BudgetedLLM), and the first backoff
+BUDGET_RETRIES = int(os.getenv("CONDUIT_LLM_RETRIES", 2))
+BUDGET_BACKOFF = float(os.getenv("CONDUIT_LLM_BACKOFF_MS", 500)) / 1000.0
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    LangChain callback that times every LLM invocation and counts the tokens
+    reported by the provider (in total and per call), labeled by the agent
+    that made the call.
+    """
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._observe(run_id, "success")
+        for kind, count in token_usage(response).items():
+            if count:
+                LLM_TOKENS.labels(agent=self.agent, type=kind).inc(count)
+                LLM_CALL_TOKENS.labels(agent=self.agent, type=kind).observe(count)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._observe(run_id, "error")
+
+    def _observe(self, run_id: UUID, status: str) -> None:
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            LLM_LATENCY.labels(agent=self.agent, status=status).observe(time.perf_counter() - start)
+
+
+def token_usage(response) -> Dict[str, int]:
+    """
+    Prompt and completion tokens of an LLMResult. Invoked calls report them in
+    llm_output["token_usage"]; streamed ones only on the generated message
+    (usage_metadata, which Groq fills from the last chunk, or its
+    response_metadata["token_usage"]).
+    """
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return {"prompt": usage.get("prompt_tokens", 0), "completion": usage.get("completion_tokens", 0)}
+    totals = {"prompt": 0, "completion": 0}
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is None:
+                continue
+            metadata = getattr(message, "usage_metadata", None)
+            if metadata:
+                totals["prompt"] += metadata.get("input_tokens", 0)
+                totals["completion"] += metadata.get("output_tokens", 0)
+                continue
+            usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+            totals["prompt"] += usage.get("prompt_tokens", 0)
+            totals["completion"] += usage.get("completion_tokens", 0)
+    return totals
+
+
+def get_llm(agent: str, temperature: float = 0.0):
+    """
+    Return the shared chat model bound to a per-agent metrics callback.
+    The client is only created on first use, so the service can start (and
+    serve non-LLM paths) without GROQ_API_KEY and GROQ_MODEL; the first LLM
+    call raises ValueError if either is missing.
+    """
+    return _client(temperature).with_config(callbacks=[LLMMetricsHandler(agent)])
+
+
+def _client(temperature: float, max_retries: int = 2) -> ChatGroq:
+    groq_key = os.getenv("GROQ_API_KEY")
+    model = os.getenv("GROQ_MODEL")
+    if not groq_key or not model:
+        raise ValueError("GROQ_API_KEY and GROQ_MODEL must be set in .env")
+
+    key = (model, temperature, max_retries)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = ChatGroq(model=model, temperature=temperature, groq_api_key=groq_key,
+                                  max_retries=max_retries)
+                _clients[key] = client
+    return client
+
+
+def without_retries(llm):
+    """
+    `llm` (as returned by get_llm) on a client that doesn't retry by itself;
+    other chat models (e.g. test fakes) are returned as they are.
+    """
+    if (isinstance(llm, RunnableBinding) and isinstance(llm.bound, ChatGroq)
+            and getattr(llm.bound, "max_retries", 0)):
+        client = _client(llm.bound.temperature, max_retries=0)
+        return RunnableBinding(bound=client, kwargs=llm.kwargs, config=llm.config)
+    return llm
+
+
+def _retryable(error: BaseException) -> bool:
+    """What the Groq SDK itself retries: connection errors and timeouts, 408, 409, 429 and 5xx."""
+    import groq
+    if isinstance(error, groq.APIConnectionError):
+        return True
+    return isinstance(error, groq.APIStatusError) and (error.status_code in (408, 409, 429)
+                                                       or error.status_code >= 500)
+
+
+class BudgetedLLM(Runnable):
+    """
+    A chat model whose calls fit in a request's latency budget (see
+    agents/deadline.py bounded()). The client's own retries would each get
+    the full timeout plus backoff, so they are replaced by retries here:
+    - every attempt starts only if the budget allows one (else
+      DeadlineExceeded) and times out with what is left of it
+    - a failed attempt is retried (CONDUIT_LLM_RETRIES, default 2) after an
+      exponential backoff from CONDUIT_LLM_BACKOFF_MS, unless the backoff
+      would leave too little of the budget
+    - streams stop with DeadlineExceeded once the budget is spent, checked
+      on every chunk; they aren't retried once output has started
+    The timeout applies per connect/read/write phase of one attempt, so a
+    non-streamed response trickling in can still overrun by one phase.
+    """
+
+    def __init__(self, llm, deadline, retries: int = None, backoff: float = None):
+        self.llm = without_retries(llm)
+        self.deadline = deadline
+        self.retries = BUDGET_RETRIES if retries is None else retries
+        self.backoff = BUDGET_BACKOFF if backoff is None else backoff
+
+    def invoke(self, input: Any, config: Optional[Dict] = None, **kwargs: Any) -> Any:
+        from agents.deadline import MIN_CALL_SECONDS
+
+        for attempt in range(self.retries + 1):
+            seconds = self.deadline.check()
+            try:
+                return self.llm.bind(timeout=seconds).invoke(input, config, **kwargs)
+            except Exception as e:
+                wait = self.backoff * 2 ** attempt
+                if (attempt == self.retries or not _retryable(e)
+                        or self.deadline.remaining() < wait + MIN_CALL_SECONDS):
+                    raise
+            time.sleep(wait)
+
+    def stream(self, input: Any, config: Optional[Dict] = None, **kwargs: Any) -> Iterator[Any]:
+        from agents.deadline import DeadlineExceeded
+
+        seconds = self.deadline.check()
+        for chunk in self.llm.bind(timeout=seconds).stream(input, config, **kwargs):
+            if not self.deadline.remaining():
+                raise DeadlineExceeded("Latency budget ran out while streaming")
+            yield chunk
+
+
+def stream_completion(llm, prompt: str, emit: Callable[[str, Dict[str, Any]], None], stage: str) -> str:
+    """
+    Run `prompt` through the chat model's streaming interface, passing each
+    piece of output to `emit("token", {"stage": stage, "text": ...})` as it
+    arrives. Returns the whole completion; stops with DeadlineExceeded if the
+    request's budget runs out mid-stream.
+    """
+    from agents.deadline import DeadlineExceeded, current
+
+    deadline = current()
+    parts = []
+    for chunk in llm.stream(prompt):
+        if deadline is not None and not deadline.remaining():
+            raise DeadlineExceeded("Latency budget ran out while streaming")
+        if chunk.content:
+            parts.append(chunk.content)
+            emit("token", {"stage": stage, "text": chunk.content})
+    return "".join(parts)
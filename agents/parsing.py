@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import signal
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from email import message_from_bytes
+from email.policy import default as default_policy
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+from agents.pdf_backends import extract_pages
+
+logger = logging.getLogger(__name__)
+
+
+# === Parsers ===
+# Plain module-level functions so they can run inside pool worker processes.
+
+def classifier_text(raw_bytes: bytes) -> str:
+    """Best-effort text for intent classification (email → JSON → first PDF pages → UTF-8)."""
+    # Email
+    try:
+        msg = message_from_bytes(raw_bytes, policy=default_policy)
+        headers = [f"Subject: {msg.get('Subject', '')}" if msg.get("Subject") else "",
+                  f"From: {msg.get('From', '')}" if msg.get("From") else ""]
+        body = ""
+        if msg.is_multipart():
+            for part in msg.walk():
+                if part.get_content_type() == "text/plain" and part.get_payload(decode=True):
+                    body += part.get_payload(decode=True).decode("utf-8", errors="ignore")
+        else:
+            body = msg.get_payload(decode=True).decode("utf-8", errors="ignore")
+        combined = " ".join(headers) + " " + body
+        return re.sub(r"\s+", " ", combined).strip()
+    except:
+        pass
+
+    # JSON
+    try:
+        text = raw_bytes.decode("utf-8", errors="ignore")
+        data = json.loads(text)
+        return json.dumps(data, indent=2)
+    except:
+        pass
+
+    # PDF
+    try:
+        _, texts = extract_pages(raw_bytes, "fast", max_pages=2)
+        pages = []
+        for txt in texts:
+            txt = re.sub(r"\s+", " ", txt)  # Normalize whitespace
+            txt = re.sub(r"\|\s*\|", " ", txt)  # Remove table artifacts
+            pages.append(txt)
+        return " ".join(pages).strip()
+    except:
+        pass
+
+    # UTF-8 fallback
+    try:
+        decoded = raw_bytes.decode("utf-8", errors="ignore")
+        return re.sub(r"\s+", " ", decoded).strip()
+    except:
+        return repr(raw_bytes[:200])
+
+
+def pdf_text(raw_bytes: bytes, profile: str = "full") -> str:
+    """
+    Full PDF text, one "--- Page N ---" section per page, from the backends of
+    `profile` (see agents/pdf_backends.py; "layout" keeps table columns apart).
+    """
+    try:
+        backend, pages = extract_pages(raw_bytes, profile)
+        logger.debug(f"Extracted {len(pages)} PDF pages with {backend}")
+        text_parts = [f"--- Page {page_num + 1} ---\n{page_text}"
+                      for page_num, page_text in enumerate(pages) if page_text.strip()]
+        return "\n\n".join(text_parts)
+
+    except Exception as e:
+        logger.error(f"Error reading PDF: {e}")
+        raise Exception(f"Failed to extract text from PDF: {e}")
+
+
+def pdf_layout_text(raw_bytes: bytes) -> str:
+    return pdf_text(raw_bytes, "layout")
+
+
+PARSERS: Dict[str, Callable[[bytes], str]] = {
+    "classifier": classifier_text,
+    "pdf": pdf_text,
+    "pdf_layout": pdf_layout_text,
+}
+
+
+def _run_parser(kind: str, path: str) -> str:
+    """
+    Worker entry point. The payload arrives as a file in shared memory
+    (/dev/shm when available) rather than pickled through the pool's pipe.
+    Our pid is written next to it so the parent can kill us on timeout.
+    """
+    with open(path + ".pid", "w") as f:
+        f.write(str(os.getpid()))
+    with open(path, "rb") as f:
+        raw_bytes = f.read()
+    return PARSERS[kind](raw_bytes)
+
+
+# === Process pool ===
+
+class ParseQueueFull(Exception):
+    """Raised when the parse pool already holds its maximum number of tasks."""
+
+
+class ParseTimeout(Exception):
+    """Raised when a parse exceeded its time limit and its worker was killed."""
+
+
+class ParsePool:
+    """
+    Runs CPU-bound document parsing in a ProcessPoolExecutor so that large
+    PDFs don't hold the GIL of the uvicorn worker serving other requests.
+
+    Configured from the environment:
+      - CONDUIT_PARSE_WORKERS:     pool size (default: CPU count, 0 = parse in a thread)
+      - CONDUIT_PARSE_QUEUE_LIMIT: tasks allowed to wait beyond the running ones (default 2x workers)
+      - CONDUIT_PARSE_TIMEOUT:     seconds before a parse is killed (default 30)
+      - CONDUIT_PARSE_INLINE_BYTES: payloads smaller than this skip the pool (default 64 KiB)
+    """
+
+    def __init__(self, workers: int = None, queue_limit: int = None, timeout: float = None,
+                 inline_bytes: int = None):
+        env_workers = os.getenv("CONDUIT_PARSE_WORKERS")
+        self.workers = workers if workers is not None else int(env_workers or os.cpu_count() or 1)
+        self.queue_limit = queue_limit if queue_limit is not None else int(
+            os.getenv("CONDUIT_PARSE_QUEUE_LIMIT", 2 * max(self.workers, 1)))
+        self.timeout = timeout if timeout is not None else float(os.getenv("CONDUIT_PARSE_TIMEOUT", 30))
+        self.inline_bytes = inline_bytes if inline_bytes is not None else int(
+            os.getenv("CONDUIT_PARSE_INLINE_BYTES", 64 * 1024))
+        self.shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.pending = 0
+        self.killed = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def warm_up(self) -> None:
+        """Start every worker process now rather than on the first large upload."""
+        if self.workers > 0:
+            pool = self._pool()
+            for f in [pool.submit(os.getpid) for _ in range(self.workers)]:
+                f.result()
+
+    async def parse(self, kind: str, raw_bytes: bytes) -> str:
+        """Parse `raw_bytes` with PARSERS[kind] without blocking the event loop."""
+        if self.workers <= 0 or len(raw_bytes) < self.inline_bytes:
+            return await asyncio.to_thread(PARSERS[kind], raw_bytes)
+
+        if self.pending >= self.workers + self.queue_limit:
+            raise ParseQueueFull(f"{self.pending} parse tasks already queued or running")
+
+        fd, path = tempfile.mkstemp(prefix="conduit-parse-", dir=self.shm_dir)
+        self.pending += 1
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw_bytes)
+            try:
+                return await self._submit(kind, path)
+            except BrokenProcessPool:
+                # Another task's runaway worker was killed and took the pool down
+                # with it; our task was collateral, so retry once on a fresh pool.
+                return await self._submit(kind, path)
+        finally:
+            self.pending -= 1
+            for p in (path, path + ".pid"):
+                try:
+                    os.unlink(p)
+                except FileNotFoundError:
+                    pass
+
+    async def _submit(self, kind: str, path: str) -> str:
+        pool = self._pool()
+        try:
+            future = asyncio.wrap_future(pool.submit(_run_parser, kind, path))
+            return await asyncio.wait_for(future, self.timeout)
+        except BrokenProcessPool:
+            if self._executor is pool:
+                self._executor = None
+            raise
+        except asyncio.TimeoutError:
+            self._kill_worker(path, pool)
+            raise ParseTimeout(f"{kind} parse exceeded {self.timeout}s")
+
+    def _kill_worker(self, path: str, pool: ProcessPoolExecutor) -> None:
+        """Kill the worker stuck on `path` and replace the (now broken) pool."""
+        try:
+            with open(path + ".pid") as f:
+                os.kill(int(f.read()), signal.SIGKILL)
+        except (FileNotFoundError, ValueError, ProcessLookupError):
+            return  # still queued (wait_for cancelled it) or already finished
+        self.killed += 1
+        logger.warning(f"Killed parse worker for {path} after {self.timeout}s")
+        if self._executor is pool:
+            self._executor = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
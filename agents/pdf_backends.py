@@ -0,0 +1,303 @@
+import os
+import re
+import logging
+import importlib.util
+from abc import ABC, abstractmethod
+from io import BytesIO
+from statistics import median
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (x0, y, x1 or None if unknown, font size, text) of one piece of text on a page,
+# in PDF user space (y grows upwards)
+Fragment = Tuple[float, float, Optional[float], float, str]
+
+# Smallest column width render_layout uses, in points: some PDFs report a font
+# size of 0 (the scale lives in the text matrix instead)
+MIN_COLUMN_WIDTH = 1.0
+
+
+class PDFBackend(ABC):
+    """
+    One way of turning PDF bytes into per-page text.
+    - name: how configuration refers to it
+    - module: the import it needs; the backend is skipped when that isn't installed
+    - layout: whether it keeps table columns apart (fixed-width rendering)
+    pages() returns one string per page, at most `max_pages` of them.
+    """
+
+    name = ""
+    module = ""
+    layout = False
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    @abstractmethod
+    def pages(self, raw_bytes: bytes, max_pages: int = None) -> List[str]:
+        """The text of each page of `raw_bytes`, at most `max_pages` of them."""
+
+
+class PyPDF2Backend(PDFBackend):
+    """PyPDF2's extract_text(): pure Python, always available, runs table cells together."""
+
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def pages(self, raw_bytes: bytes, max_pages: int = None) -> List[str]:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(BytesIO(raw_bytes))
+        texts = []
+        for page_num, page in enumerate(reader.pages):
+            if max_pages is not None and page_num >= max_pages:
+                break
+            texts.append(self._page_text(page, page_num))
+        return texts
+
+    def _page_text(self, page, page_num: int) -> str:
+        try:
+            return page.extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Error extracting text from page {page_num + 1}: {e}")
+            return ""
+
+
+class PyPDF2LayoutBackend(PyPDF2Backend):
+    """
+    PyPDF2 with text positions from its visitor hook, rendered by render_layout().
+    PyPDF2 reports one position per text run and merges cells placed on the
+    same baseline into one run, so only tables whose cells end a run (like
+    data/invoice.pdf) keep their columns; prefer a native layout backend.
+    """
+
+    name = "pypdf2-layout"
+    layout = True
+
+    def _page_text(self, page, page_num: int) -> str:
+        fragments: List[Fragment] = []
+
+        def visit(text, cm, tm, font_dict, font_size):
+            if not text.strip():
+                return
+            # Text matrix origin mapped through the current transformation matrix
+            x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+            y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+            size = abs(font_size * (tm[0] or 1) * (cm[0] or 1)) or 10.0
+            text = text.replace("\n", " ")
+            fragments.append((x, y, x + _text_width(text, font_dict, size), size, text))
+
+        try:
+            page.extract_text(visitor_text=visit)
+        except Exception as e:
+            logger.warning(f"Error extracting text from page {page_num + 1}: {e}")
+        return render_layout(fragments)
+
+
+def _text_width(text: str, font_dict, size: float) -> float:
+    """Width of `text` from a simple font's /Widths, else about half an em per character."""
+    try:
+        widths, first = font_dict["/Widths"], int(font_dict["/FirstChar"])
+        default = float(font_dict.get("/FontDescriptor", {}).get("/MissingWidth", 500))
+    except (KeyError, TypeError, ValueError):
+        return len(text) * size * 0.5
+    total = 0.0
+    for char in text:
+        index = ord(char) - first
+        total += float(widths[index]) if 0 <= index < len(widths) else default
+    return total / 1000.0 * size
+
+
+class PyMuPDFBackend(PDFBackend):
+    """MuPDF (pip install pymupdf): native, in content-stream order."""
+
+    name = "pymupdf"
+    module = "pymupdf"
+
+    def pages(self, raw_bytes: bytes, max_pages: int = None) -> List[str]:
+        import pymupdf
+        with pymupdf.open(stream=raw_bytes, filetype="pdf") as doc:
+            count = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+            return [self._page_text(doc[i]) for i in range(count)]
+
+    def _page_text(self, page) -> str:
+        return page.get_text("text")
+
+
+class PyMuPDFLayoutBackend(PyMuPDFBackend):
+    """MuPDF's text spans rendered by render_layout()."""
+
+    name = "pymupdf-layout"
+    layout = True
+
+    def _page_text(self, page) -> str:
+        height = page.rect.height
+        fragments = []
+        for block in page.get_text("dict")["blocks"]:
+            for line in block.get("lines", ()):
+                for span in line["spans"]:
+                    if span["text"].strip():
+                        # MuPDF's y grows downwards; flip it to match PDF user space
+                        fragments.append((span["bbox"][0], height - span["origin"][1], span["bbox"][2],
+                                          span["size"], span["text"]))
+        return render_layout(fragments)
+
+
+class PdfiumBackend(PDFBackend):
+    """PDFium (pip install pypdfium2): native, fastest for plain text."""
+
+    name = "pdfium"
+    module = "pypdfium2"
+
+    def pages(self, raw_bytes: bytes, max_pages: int = None) -> List[str]:
+        import pypdfium2
+        doc = pypdfium2.PdfDocument(raw_bytes)
+        try:
+            count = len(doc) if max_pages is None else min(max_pages, len(doc))
+            texts = []
+            for i in range(count):
+                textpage = doc[i].get_textpage()
+                texts.append(textpage.get_text_range().replace("\r\n", "\n"))
+            return texts
+        finally:
+            doc.close()
+
+
+class PdfminerLayoutBackend(PDFBackend):
+    """pdfminer.six's layout analysis (pip install pdfminer.six): slow, pure Python, keeps columns."""
+
+    name = "pdfminer-layout"
+    module = "pdfminer"
+    layout = True
+
+    def pages(self, raw_bytes: bytes, max_pages: int = None) -> List[str]:
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer, LTTextLine
+
+        texts = []
+        for page in extract_pages(BytesIO(raw_bytes), maxpages=max_pages or 0):
+            fragments = []
+            for element in page:
+                if not isinstance(element, LTTextContainer):
+                    continue
+                for line in element:
+                    if isinstance(line, LTTextLine) and line.get_text().strip():
+                        fragments.append((line.x0, line.y0, line.x1, line.height, line.get_text().rstrip("\n")))
+            texts.append(render_layout(fragments))
+        return texts
+
+
+BACKENDS: Dict[str, PDFBackend] = {b.name: b for b in (
+    PyPDF2Backend(), PyPDF2LayoutBackend(), PyMuPDFBackend(), PyMuPDFLayoutBackend(),
+    PdfiumBackend(), PdfminerLayoutBackend(),
+)}
+
+# Preference order per use, fastest adequate first (see benchmarks/bench_pdf_backends.py):
+#   - fast:   the classifier's first-pages snippet
+#   - full:   the PDF agent's text
+#   - layout: the PDF agent's text for intents whose tables matter (PDF_LAYOUT_INTENTS)
+PROFILES: Dict[str, Tuple[str, ...]] = {
+    "fast": ("pdfium", "pymupdf", "pypdf2"),
+    "full": ("pdfium", "pymupdf", "pypdf2"),
+    "layout": ("pymupdf-layout", "pdfminer-layout", "pypdf2-layout", "pypdf2"),
+}
+
+# Below this, the text is taken as a failed extraction and the next backend is tried
+MIN_CHARS_PER_PAGE = 20
+MIN_QUALITY = 0.9
+
+_PRINTABLE = re.compile(r"[\w\s.,;:!?()\[\]{}'\"/\\@#$%&*+=<>|~^`₹€£¥§°-]")
+
+
+def layout_intents() -> set:
+    """Intents whose PDFs are extracted with the "layout" profile (PDF_LAYOUT_INTENTS, default Invoice)."""
+    return {i.strip().lower() for i in os.getenv("PDF_LAYOUT_INTENTS", "Invoice").split(",") if i.strip()}
+
+
+def profile_backends(profile: str) -> List[PDFBackend]:
+    """
+    Installed backends for `profile`, in order of preference. PDF_TEXT_<PROFILE>
+    (e.g. PDF_TEXT_LAYOUT=pdfminer-layout,pypdf2) overrides the default order.
+    """
+    configured = os.getenv(f"PDF_TEXT_{profile.upper()}", "").strip()
+    names = [n.strip() for n in configured.split(",") if n.strip()] if configured else PROFILES[profile]
+    unknown = [n for n in names if n not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown PDF text backend(s) {', '.join(unknown)}; choose from {', '.join(BACKENDS)}")
+    return [BACKENDS[n] for n in names if BACKENDS[n].available()]
+
+
+def text_quality(pages: List[str]) -> float:
+    """
+    Share of ordinary characters (letters, digits, punctuation, whitespace) in
+    the text, 0.0 for none at all. Garbled font mappings score low.
+    """
+    text = "".join(pages)
+    if not text:
+        return 0.0
+    return len(_PRINTABLE.findall(text)) / len(text)
+
+
+def adequate(pages: List[str]) -> bool:
+    chars = sum(len(p.strip()) for p in pages)
+    return chars >= MIN_CHARS_PER_PAGE * max(len(pages), 1) and text_quality(pages) >= MIN_QUALITY
+
+
+def extract_pages(raw_bytes: bytes, profile: str = "full", max_pages: int = None) -> Tuple[str, List[str]]:
+    """
+    (backend name, per-page text) from the first backend of `profile` whose
+    text is adequate. A backend that fails or returns near-empty or garbled
+    text hands over to the next; if none is adequate, the one with the most
+    text wins. Raises the last backend's error if every one of them failed.
+    """
+    best: Optional[Tuple[str, List[str]]] = None
+    error: Optional[Exception] = None
+    for backend in profile_backends(profile):
+        try:
+            pages = backend.pages(raw_bytes, max_pages)
+        except Exception as e:
+            logger.warning(f"PDF text backend {backend.name} failed: {e}")
+            error = e
+            continue
+        if adequate(pages):
+            return backend.name, pages
+        if best is None or sum(map(len, pages)) > sum(map(len, best[1])):
+            best = (backend.name, pages)
+    if best is not None:
+        return best
+    raise error or RuntimeError(f"No PDF text backend installed for profile {profile!r}")
+
+
+def render_layout(fragments: List[Fragment]) -> str:
+    """
+    Lay text fragments out as fixed-width lines, keeping table columns apart:
+    fragments on the same baseline (within half a font size) form a line,
+    ordered by x, and each starts at the column matching its x position, or
+    one space after the previous fragment if that's further right. Fragments
+    that touch the previous one (e.g. a word split by a font change) are joined.
+    """
+    if not fragments:
+        return ""
+    unit = max(median(abs(f[3]) for f in fragments) * 0.5, MIN_COLUMN_WIDTH)  # about one average glyph width
+    left = min(f[0] for f in fragments)
+
+    rows: List[List[Fragment]] = []
+    for fragment in sorted(fragments, key=lambda f: (-f[1], f[0])):
+        if rows and abs(rows[-1][0][1] - fragment[1]) <= fragment[3] * 0.5:
+            rows[-1].append(fragment)
+        else:
+            rows.append([fragment])
+
+    lines = []
+    for row in rows:
+        line, end_x = "", None
+        for x0, _, x1, size, text in sorted(row, key=lambda f: f[0]):
+            column = int(round((x0 - left) / unit))
+            if column > len(line):
+                line += " " * (column - len(line))
+            elif line and not line.endswith(" ") and not text.startswith(" ") and abs(x0 - end_x) > size * 0.15:
+                line += " "  # a separate cell that the column estimate put too far left
+            line += text
+            end_x = x1 if x1 is not None else x0 + len(text) * size * 0.5
+        lines.append(line.rstrip())
+    return "\n".join(lines)
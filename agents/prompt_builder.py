@@ -0,0 +1,106 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from agents.tokens import estimate_tokens, truncate_to_tokens
+
+WORD_RE = re.compile(r"[a-z]{3,}")
+
+# Relevance bonus for an example of the same format as the input; similarity
+# itself is at most 1, so a same-format example wins unless the text is unrelated
+FORMAT_BONUS = 0.5
+# Bonus per keyword-score point of the example's intent (see ClassifierAgent._score_intents)
+INTENT_SCORE_BONUS = 0.25
+
+
+def word_set(text: str, limit: int = 2000) -> set:
+    return set(WORD_RE.findall((text or "")[:limit].lower()))
+
+
+def similarity(a: set, b: set) -> float:
+    """Cosine similarity of two word sets (0..1)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / (len(a) * len(b)) ** 0.5
+
+
+class FewShotPromptBuilder:
+    """
+    Builds a few-shot prompt per request instead of sending every example:
+    - scores each example by format match, word overlap with the input and,
+      when given, the keyword score of the example's intent
+    - keeps the k best, preferring examples of distinct intents
+    - truncates the input text to whatever is left of the token budget
+      (examples are dropped first if they would leave it less than a quarter)
+
+    Prompts have the same layout as LangChain's FewShotPromptTemplate:
+    prefix, examples and suffix joined by `separator`.
+    """
+
+    def __init__(self, prefix: str, examples: List[Dict[str, str]], example_template: str,
+                 suffix: str, k: int = 3, token_budget: Optional[int] = None, separator: str = "\n---\n"):
+        self.prefix = prefix
+        self.examples = examples
+        self.example_template = example_template
+        self.suffix = suffix
+        self.k = k
+        self.token_budget = token_budget
+        self.separator = separator
+        self._rendered = [example_template.format(**example) for example in examples]
+        self._example_tokens = [estimate_tokens(r) for r in self._rendered]
+        self._example_words = [word_set(e["text"] + " " + e.get("context", "")) for e in examples]
+
+    def select(self, fmt: str, text: str, intent_scores: Dict[str, int] = None) -> List[int]:
+        """Indexes of the examples to show for this input, most relevant first."""
+        words = word_set(text)
+        intent_scores = intent_scores or {}
+        scores = [
+            (FORMAT_BONUS if example["format"] == fmt else 0.0)
+            + similarity(words, self._example_words[i])
+            + INTENT_SCORE_BONUS * intent_scores.get(example["intent"], 0)
+            for i, example in enumerate(self.examples)
+        ]
+        # Ties keep the examples' declared order, so selection is deterministic
+        ranked = sorted(range(len(self.examples)), key=lambda i: (-scores[i], i))
+
+        chosen, intents = [], set()
+        for i in ranked:
+            if len(chosen) < self.k and self.examples[i]["intent"] not in intents:
+                chosen.append(i)
+                intents.add(self.examples[i]["intent"])
+        for i in ranked:  # fewer distinct intents than k: fill with the next best
+            if len(chosen) < self.k and i not in chosen:
+                chosen.append(i)
+        return chosen
+
+    def build(self, fmt: str, text: str, intent_scores: Dict[str, int] = None) -> Dict[str, Any]:
+        """
+        Returns:
+        - prompt: the rendered prompt
+        - examples: intents of the examples used
+        - prompt_tokens: estimated size of the prompt
+        - truncated: whether the input text was cut to fit the budget
+        """
+        chosen = self.select(fmt, text, intent_scores)
+        suffix_tokens = estimate_tokens(self.suffix.format(input_format=fmt, input_text=""))
+        fixed = estimate_tokens(self.prefix) + suffix_tokens
+
+        truncated = False
+        if self.token_budget is not None:
+            while chosen and self.token_budget - fixed - self._examples_tokens(chosen) < self.token_budget // 4:
+                chosen.pop()
+            room = self.token_budget - fixed - self._examples_tokens(chosen)
+            if estimate_tokens(text) > room:
+                text = truncate_to_tokens(text, room - 1) + "..."
+                truncated = True
+
+        parts = [self.prefix] + [self._rendered[i] for i in chosen] + [self.suffix.format(input_format=fmt, input_text=text)]
+        prompt = self.separator.join(parts)
+        return {
+            "prompt": prompt,
+            "examples": [self.examples[i]["intent"] for i in chosen],
+            "prompt_tokens": estimate_tokens(prompt),
+            "truncated": truncated,
+        }
+
+    def _examples_tokens(self, chosen: List[int]) -> int:
+        return sum(self._example_tokens[i] + estimate_tokens(self.separator) for i in chosen)
@@ -0,0 +1,240 @@
+import os
+import time
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from agents import deadline
+from mcp.metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT
+
+# Most to least urgent; a request's level indexes this tuple
+PRIORITIES = ("urgent", "high", "normal", "low")
+DEFAULT_WEIGHTS = {"urgent": 8, "high": 4, "normal": 2, "low": 1}
+
+# Starting level by format when the caller gives none: emails are customers
+# waiting, PDFs are mostly bulk
+FORMAT_PRIORITY = {"Email": "high", "JSON": "normal", "PDF": "low"}
+# Intents that jump the queue once known (keyword scores or classification)
+URGENT_INTENTS = {"Fraud Risk": "high", "Complaint": "high"}
+
+
+class Priority:
+    def __init__(self, level: str, fixed: bool = False):
+        self.level = level
+        self.fixed = fixed  # caller-supplied: signals don't change it
+
+
+_current: ContextVar[Optional[Priority]] = ContextVar("conduit_priority", default=None)
+
+
+def parse_priority(value: str) -> str:
+    """A priority name or its index (0 = urgent ... 3 = low); raises ValueError."""
+    value = (value or "").strip().lower()
+    if value.isdigit() and int(value) < len(PRIORITIES):
+        return PRIORITIES[int(value)]
+    if value not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)} (or 0-{len(PRIORITIES) - 1})")
+    return value
+
+
+def current_level() -> str:
+    priority = _current.get()
+    return priority.level if priority is not None else "normal"
+
+
+@contextmanager
+def priority_scope(level: str, fixed: bool = False):
+    """Run the enclosed LLM calls at `level`; `fixed` levels ignore at_least()."""
+    token = _current.set(Priority(level, fixed))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def raise_to(level: str) -> None:
+    """Raise the current request's level (never lowers it, never overrides the caller's)."""
+    priority = _current.get()
+    if priority is not None and not priority.fixed and PRIORITIES.index(level) < PRIORITIES.index(priority.level):
+        priority.level = level
+
+
+@contextmanager
+def at_least(level: str):
+    """Like raise_to, for the enclosed calls only."""
+    priority = _current.get()
+    if priority is None or priority.fixed or PRIORITIES.index(level) >= PRIORITIES.index(priority.level):
+        yield
+        return
+    token = _current.set(Priority(level))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("level", "tag", "enqueued")
+
+    def __init__(self, level: str, tag: float):
+        self.level = level
+        self.tag = tag
+        self.enqueued = time.monotonic()
+
+
+class LLMScheduler:
+    """
+    Limits concurrent LLM calls to `slots` and, when they are all busy,
+    decides who goes next by weighted fair queuing over the priority levels:
+    - each call gets a virtual finish tag, 1/weight after the previous call of
+      its level, so under saturation levels are served in proportion to their
+      weights (default urgent 8 : high 4 : normal 2 : low 1)
+    - a waiter's tag decreases by one unit per `aging` seconds waited, so
+      low-priority work is never starved
+    - waiting ends early with DeadlineExceeded when the request's latency
+      budget runs out, which sends the caller to its rule-based fallback
+
+    Time spent queued is recorded per level in conduit_llm_queue_wait_seconds.
+    """
+
+    def __init__(self, slots: int, weights: Dict[str, float] = None, aging: float = 5.0):
+        self.slots = slots
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.aging = aging
+        self._free = slots
+        self._cond = threading.Condition()
+        self._waiting: List[_Waiter] = []
+        self._virtual = 0.0
+        self._last_tag = {level: 0.0 for level in PRIORITIES}
+
+    @contextmanager
+    def slot(self, level: str = None):
+        """Hold one LLM slot for the enclosed call."""
+        level = level or current_level()
+        self._acquire(level)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self, level: str) -> None:
+        started = time.monotonic()
+        with self._cond:
+            tag = max(self._virtual, self._last_tag[level]) + 1.0 / self.weights[level]
+            self._last_tag[level] = tag
+            if self._free > 0 and not self._waiting:
+                self._grant(tag)
+                LLM_QUEUE_WAIT.labels(priority=level).observe(0.0)
+                return
+
+            waiter = _Waiter(level, tag)
+            self._waiting.append(waiter)
+            LLM_QUEUE_DEPTH.labels(priority=level).inc()
+            try:
+                while not (self._free > 0 and self._next() is waiter):
+                    budget = deadline.current()
+                    timeout = budget.remaining() if budget is not None else None
+                    if timeout is not None and timeout <= 0:
+                        raise deadline.DeadlineExceeded("Latency budget ran out while queued for the LLM")
+                    # Wake up now and then to re-rank by age even if nothing is released
+                    self._cond.wait(min(timeout, self.aging) if timeout is not None else self.aging)
+                self._grant(tag)
+            finally:
+                self._waiting.remove(waiter)
+                LLM_QUEUE_DEPTH.labels(priority=level).dec()
+                # The next in line may have changed (e.g. this waiter gave up)
+                self._cond.notify_all()
+        LLM_QUEUE_WAIT.labels(priority=level).observe(time.monotonic() - started)
+
+    def _grant(self, tag: float) -> None:
+        self._free -= 1
+        self._virtual = max(self._virtual, tag)
+
+    def _next(self) -> _Waiter:
+        now = time.monotonic()
+        return min(self._waiting, key=lambda w: (w.tag - (now - w.enqueued) / self.aging, w.enqueued))
+
+    def _release(self) -> None:
+        with self._cond:
+            self._free += 1
+            self._cond.notify_all()
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Optional[LLMScheduler]:
+    """
+    The process-wide scheduler, configured from the environment:
+      - CONDUIT_LLM_CONCURRENCY: LLM calls in flight at once (default 8, 0 = no scheduling)
+      - CONDUIT_LLM_WEIGHTS: e.g. "urgent=8,high=4,normal=2,low=1"
+      - CONDUIT_LLM_AGING_SECONDS: wait worth one unit of priority (default 5)
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                slots = int(os.getenv("CONDUIT_LLM_CONCURRENCY", 8))
+                weights = dict(DEFAULT_WEIGHTS)
+                for pair in filter(None, os.getenv("CONDUIT_LLM_WEIGHTS", "").split(",")):
+                    name, _, weight = pair.partition("=")
+                    weights[parse_priority(name)] = float(weight)
+                aging = float(os.getenv("CONDUIT_LLM_AGING_SECONDS", 5))
+                _scheduler = LLMScheduler(slots, weights, aging) if slots > 0 else False
+    return _scheduler or None
+
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def executor_for(level: str) -> ThreadPoolExecutor:
+    """
+    The thread pool for work at `level`. Each level has its own, sized by
+    CONDUIT_PRIORITY_THREADS (default min(32, cpu + 4), like asyncio's default
+    executor): a thread waiting for an LLM slot blocks its pool, and with one
+    shared FIFO pool a backlog of bulk work would hold every thread and keep
+    an urgent call from even reaching the scheduler's queue.
+    """
+    executor = _executors.get(level)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(level)
+            if executor is None:
+                threads = int(os.getenv("CONDUIT_PRIORITY_THREADS", 0)) or min(32, (os.cpu_count() or 1) + 4)
+                executor = _executors[level] = ThreadPoolExecutor(threads, thread_name_prefix=f"conduit-{level}")
+    return executor
+
+
+async def run_in_thread(fn: Callable, *args, **kwargs) -> Any:
+    """
+    asyncio.to_thread on the current request's priority pool (executor_for),
+    for work that makes LLM calls. The context is copied as to_thread does.
+    """
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor_for(current_level()), call)
+
+
+def shutdown_executors() -> None:
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+@contextmanager
+def llm_slot():
+    """Wrap every LLM call: waits for a slot at the current request's priority."""
+    scheduler = get_scheduler()
+    if scheduler is None:
+        yield
+        return
+    with scheduler.slot():
+        yield
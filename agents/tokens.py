@@ -0,0 +1,16 @@
+import math
+
+
+# Llama-family tokenizers average a little under 4 characters per token on
+# English business text; over-estimating slightly keeps prompts inside budget.
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate for budgeting prompts, without loading a tokenizer."""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut `text` so that estimate_tokens(result) <= budget."""
+    return text[:int(max(budget, 0) * CHARS_PER_TOKEN)]
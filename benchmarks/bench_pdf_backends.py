@@ -0,0 +1,138 @@
+"""
+PDF text-extraction backends compared over the corpus (agents/pdf_backends.py).
+
+For every installed backend and every PDF in data/ plus the synthetic ones,
+reports extraction speed and text quality:
+  - p50 ms and pages/s
+  - quality: share of ordinary characters (low for garbled font mappings)
+  - tokens: share of the document's words found, against the words most
+    backends agree on (glued table cells such as "PriceQtyNet" lose them)
+  - rows: for the synthetic table invoice, the share of table rows that come
+    out as one line with their cells in order and apart (layout preservation)
+Then shows which backend each profile (fast/full/layout) picks per document.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pdf_backends
+    python -m benchmarks.bench_pdf_backends --scale 0.1 --iterations 5
+    python -m benchmarks.bench_pdf_backends --json pdf_backends.json
+"""
+
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from typing import Dict, List
+
+from agents.pdf_backends import BACKENDS, PROFILES, extract_pages, profile_backends, text_quality
+from benchmarks.corpus import load_data_corpus, make_large_invoice_pdf, make_table_invoice_pdf, table_invoice_rows
+from benchmarks.harness import measure
+
+_WORD = re.compile(r"\S+")
+
+
+def pdf_corpus(scale: float) -> Dict[str, bytes]:
+    docs = {name: raw for name, raw in load_data_corpus().items() if name.lower().endswith(".pdf")}
+    docs["large_invoice.pdf"] = make_large_invoice_pdf(max(1, int(200 * scale)))
+    docs["table_invoice.pdf"] = make_table_invoice_pdf(max(1, int(20 * scale)))
+    return docs
+
+
+def time_backend(backend, raw: bytes, iterations: int) -> Dict[str, object]:
+    try:
+        pages = backend.pages(raw)
+    except Exception as e:
+        return {"error": str(e)}
+    p50 = measure(lambda: backend.pages(raw), iterations, warmup=1)["p50_ms"]
+    return {"pages": pages, "p50_ms": p50, "pages_per_sec": len(pages) / (p50 / 1000) if p50 else 0.0}
+
+
+def reference_words(outputs: List[List[str]]) -> Counter:
+    """Words (with counts) that at least half of the backends extracted."""
+    votes = Counter()
+    for pages in outputs:
+        votes.update(set(_WORD.findall("\n".join(pages))))
+    needed = max(1, len(outputs) / 2)
+    agreed = {w for w, n in votes.items() if n >= needed}
+    counts = Counter()
+    for pages in outputs:
+        words = Counter(w for w in _WORD.findall("\n".join(pages)) if w in agreed)
+        counts = counts | words  # the highest count any backend saw
+    return counts
+
+
+def token_recall(pages: List[str], reference: Counter) -> float:
+    if not reference:
+        return 0.0
+    found = Counter(_WORD.findall("\n".join(pages))) & reference
+    return sum(found.values()) / sum(reference.values())
+
+
+def row_recall(pages: List[str]) -> float:
+    """Share of table rows extracted as one line, cells in order, separated by 2+ spaces or tabs."""
+    expected = hits = 0
+    for page, text in enumerate(pages):
+        lines = {tuple(c.strip() for c in re.split(r"\s{2,}|\t", line.strip()) if c.strip())
+                 for line in text.splitlines()}
+        for row in table_invoice_rows(page):
+            expected += 1
+            hits += tuple(cell for cell in row if cell) in lines
+    return hits / expected if expected else 0.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="size multiplier for synthetic inputs")
+    parser.add_argument("--iterations", type=int, default=10, help="timed runs per backend and document")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    installed = [b for b in BACKENDS.values() if b.available()]
+    missing = [b.name for b in BACKENDS.values() if not b.available()]
+    print(f"Backends: {', '.join(b.name for b in installed)}"
+          + (f" (not installed: {', '.join(missing)})" if missing else ""))
+
+    results: Dict[str, Dict[str, dict]] = {}
+    header = f"{'document':<24} {'backend':<16} {'p50 ms':>9} {'pages/s':>9} {'quality':>8} {'tokens':>7} {'rows':>6}"
+    print("\n" + header)
+    print("-" * len(header))
+    for doc, raw in pdf_corpus(args.scale).items():
+        runs = {b.name: time_backend(b, raw, args.iterations) for b in installed}
+        reference = reference_words([r["pages"] for r in runs.values() if "pages" in r])
+        results[doc] = {}
+        for name, run in runs.items():
+            if "error" in run:
+                print(f"{doc:<24} {name:<16} failed: {run['error']}")
+                results[doc][name] = {"error": run["error"]}
+                continue
+            row = {
+                "p50_ms": run["p50_ms"],
+                "pages_per_sec": run["pages_per_sec"],
+                "quality": text_quality(run["pages"]),
+                "tokens": token_recall(run["pages"], reference),
+            }
+            if doc == "table_invoice.pdf":
+                row["rows"] = row_recall(run["pages"])
+            results[doc][name] = row
+            rows = f"{row['rows']:>6.0%}" if "rows" in row else f"{'-':>6}"
+            print(f"{doc:<24} {name:<16} {row['p50_ms']:>9.2f} {row['pages_per_sec']:>9.0f} "
+                  f"{row['quality']:>8.3f} {row['tokens']:>7.1%} {rows}")
+
+    print("\nProfile choices (first adequate backend in order):")
+    for profile in PROFILES:
+        order = ", ".join(b.name for b in profile_backends(profile))
+        print(f"  {profile:<7} [{order}]")
+        for doc, raw in pdf_corpus(args.scale).items():
+            t0 = time.perf_counter()
+            name, _ = extract_pages(raw, profile)
+            print(f"    {doc:<24} -> {name:<16} {(time.perf_counter() - t0) * 1000:>8.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+"""
+Per-stage micro-benchmarks for the document pipeline.
+
+Runs the parsing, scoring and agent stages over the data/ corpus and the
+synthetic variants from benchmarks/corpus.py, with ChatGroq replaced by
+DeterministicChatModel and Redis replaced by FakeRedis.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_stages                       # run and print
+    python -m benchmarks.bench_stages --save-baseline       # record baseline
+    python -m benchmarks.bench_stages --check --threshold 0.2
+    python -m benchmarks.bench_stages --filter pdf --scale 0.1
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.corpus import load_data_corpus, synthetic_corpus
+from benchmarks.fakes import DeterministicChatModel, FakeRedis
+from benchmarks.harness import compare, load_baseline, measure, print_table, save_baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "stages.json")
+
+
+def build_components():
+    """Construct the agents and MemoryStore against the deterministic fakes."""
+    from agents.classifier import ClassifierAgent
+    from agents.email_agent import EmailAgent
+    from agents.json_agent import JSONAgent
+    from agents.pdf_agent import PDFAgent
+    from memory.memory import MemoryStore
+
+    llm = DeterministicChatModel()
+    classifier = ClassifierAgent(llm=llm)
+    email_agent = EmailAgent(llm=llm)
+    pdf_agent = PDFAgent(llm=llm)
+    json_agent = JSONAgent()
+
+    memory = MemoryStore()
+    memory.client = memory.blob_client = FakeRedis()
+    return classifier, email_agent, json_agent, pdf_agent, memory
+
+
+def build_cases(scale: float) -> List[Tuple[str, Callable[[], object], int]]:
+    """Return (name, callable, iterations) for every benchmark."""
+    from agents.classifier import format_from_filename
+
+    classifier, email_agent, json_agent, pdf_agent, memory = build_components()
+
+    docs = load_data_corpus()
+    docs.update(synthetic_corpus(scale))
+
+    def iterations_for(raw: bytes) -> int:
+        # Keep large inputs from dominating wall-clock time
+        if len(raw) > 5_000_000:
+            return 5
+        if len(raw) > 500_000:
+            return 10
+        return 50
+
+    cases = []
+    for name, raw in docs.items():
+        n = iterations_for(raw)
+        cases.append((f"classifier._bytes_to_text[{name}]",
+                      lambda raw=raw: classifier._bytes_to_text(raw), n))
+
+        snippet = classifier._bytes_to_text(raw)[:classifier.max_snippet_chars]
+        fmt = format_from_filename(name)
+        cases.append((f"classifier._score_intents[{name}]",
+                      lambda s=snippet, f=fmt: classifier._score_intents(s, f), 200))
+
+        if name.endswith(".eml"):
+            metadata = {"format": "Email", "intent": "Complaint"}
+            cases.append((f"email_agent.process[{name}]",
+                          lambda raw=raw, m=metadata: email_agent.process(raw, m), n))
+        elif name.endswith(".json"):
+            metadata = {"format": "JSON", "intent": "RFQ"}
+            cases.append((f"json_agent.process[{name}]",
+                          lambda raw=raw, m=metadata: json_agent.process(raw, m), n))
+        elif name.endswith(".pdf"):
+            cases.append((f"pdf_agent._extract_text_from_bytes[{name}]",
+                          lambda raw=raw: pdf_agent._extract_text_from_bytes(raw), n))
+            # Chunking, concurrent extraction and merging, on already-parsed text
+            text = pdf_agent._extract_text_from_bytes(raw)
+            metadata = {"format": "PDF", "intent": "invoice"}
+            cases.append((f"pdf_agent.process[{name}]",
+                          lambda raw=raw, m=metadata, t=text: pdf_agent.process(raw, m, text=t), n))
+
+    # MemoryStore: writes of a typical action event, reads over a pre-filled log
+    action = {"status": "success", "target": "crm", "http_status": 200,
+              "response_body": {"message": "CRM ticket created."}, "error": None}
+    cases.append(("memory.write[action]", lambda: memory.write("router", "action", action), 2000))
+
+    reader = build_components()[-1]
+    event_pairs = max(1, int(10_000 * scale))
+    for i in range(event_pairs):
+        reader.write("classifier", "metadata", {"source": "classifier", "format": "PDF", "intent": "Invoice"})
+        reader.write("router", "action", dict(action, n=i))
+    cases.append((f"memory.read_all[{2 * event_pairs} events]", reader.read_all, 10))
+    cases.append(("memory.read_by_key[action]", lambda: reader.read_by_key("action"), 10))
+
+    # Large extractions (a whole parsed JSON document) are stored once as blobs;
+    # events and reads only carry a reference
+    carts = json.loads(docs["carts.json"])
+    cases.append(("memory.write[extraction carts.json]",
+                  lambda: memory.write("json_agent", "extraction", carts), 500))
+    blob_reader = build_components()[-1]
+    extraction_count = max(1, int(1_000 * scale))
+    for i in range(extraction_count):
+        blob_reader.write("json_agent", "extraction", dict(carts, n=i))
+    cases.append((f"memory.read_by_key[extraction x{extraction_count}]",
+                  lambda: blob_reader.read_by_key("extraction"), 10))
+
+    # The same workload on the SQLite backend (writes are committed in batches,
+    # reads wait for them)
+    from memory.sqlite_store import SQLiteMemoryStore
+    sqlite_dir = tempfile.mkdtemp(prefix="conduit-bench-")
+    sqlite_memory = SQLiteMemoryStore(os.path.join(sqlite_dir, "write.db"))
+    cases.append(("sqlite_memory.write[action]", lambda: sqlite_memory.write("router", "action", action), 2000))
+    sqlite_reader = SQLiteMemoryStore(os.path.join(sqlite_dir, "read.db"))
+    for i in range(event_pairs):
+        sqlite_reader.write("classifier", "metadata", {"source": "classifier", "format": "PDF", "intent": "Invoice"})
+        sqlite_reader.write("router", "action", dict(action, n=i, action="escalate" if i % 4 == 0 else "log"))
+    sqlite_reader.flush()
+    cases.append((f"sqlite_memory.read_all[{2 * event_pairs} events]", sqlite_reader.read_all, 10))
+    cases.append(("sqlite_memory.read_by_key[action]", lambda: sqlite_reader.read_by_key("action"), 10))
+    cases.append(("sqlite_memory.read_by_action[escalate]", lambda: sqlite_reader.read_by_action("escalate"), 10))
+    return cases
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="fail if results regress against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression ratio (default 0.2)")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--scale", type=float, default=1.0, help="size multiplier for synthetic inputs")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn, iterations in build_cases(args.scale):
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(fn, iterations=iterations)
+
+    print_table(results)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"\nNo baseline at {args.baseline}; run with --save-baseline first.")
+            return 2
+        regressions = compare(load_baseline(args.baseline), results, args.threshold)
+        if regressions:
+            print(f"\nRegressions above {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Startup benchmark: cold import time of mcp.main and time-to-first-response
+of a freshly started uvicorn worker.
+
+    python -m benchmarks.bench_startup                      # import time + TTFR
+    python -m benchmarks.bench_startup --warmup none,all    # compare CONDUIT_WARMUP settings
+    python -m benchmarks.bench_startup --upload             # also time the first /upload
+
+Each measurement runs in a new interpreter so module caches never help.
+The first /upload needs Redis (REDIS_HOST / REDIS_PORT); LLM calls go to the
+mock server from benchmarks/mock_llm.py.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.loadgen import ROOT, _free_port, _stop, start_mock_llm
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import mcp.main; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+
+def measure_import_ms(runs: int) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def top_imports(limit: int) -> List[tuple]:
+    """Slowest top-level imports (cumulative microseconds) from `python -X importtime`."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import mcp.main"], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        # Nesting is shown as two extra spaces per level after the separator's one
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:  # mcp.main itself and the modules it imports directly
+            rows.append((name.strip(), int(cumulative_us)))
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows[:limit]
+
+
+def _wait_for(url: str, proc: subprocess.Popen, method: str = "GET", timeout: float = 120.0, **kwargs) -> Optional[float]:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if proc.poll() is not None:
+            return None
+        try:
+            resp = httpx.request(method, url, timeout=timeout, **kwargs)
+            if resp.status_code < 500:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def measure_ttfr(warmup: str, llm_url: str, upload: bool) -> Dict[str, Optional[float]]:
+    """Spawn a single uvicorn worker and time its first responses."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": env.get("GROQ_API_KEY", "startup-bench"),
+        "GROQ_MODEL": env.get("GROQ_MODEL", "mock"),
+        "GROQ_BASE_URL": llm_url,
+        "GROQ_API_BASE": llm_url,
+        "BASE_URL": url,
+        "CONDUIT_WARMUP": "" if warmup == "none" else warmup,
+    })
+    cmd = [sys.executable, "-m", "uvicorn", "mcp.main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning"]
+    spawned = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    try:
+        ready = _wait_for(f"{url}/", proc)
+        result = {"health_ms": (ready - spawned) * 1000 if ready else None, "upload_ms": None}
+        if upload and ready:
+            with open(os.path.join(ROOT, "data", "complaint.eml"), "rb") as f:
+                doc = f.read()
+            t0 = time.perf_counter()
+            resp = httpx.post(f"{url}/upload", files={"file": ("complaint.eml", doc)},
+                              headers={"X-Filename": "complaint.eml"}, timeout=120)
+            if resp.status_code == 200:
+                result["upload_ms"] = (time.perf_counter() - t0) * 1000
+        return result
+    finally:
+        _stop(proc)
+
+
+def _fmt(samples: List[float]) -> str:
+    if not samples:
+        return "n/a"
+    return f"median={statistics.median(samples):.0f}ms min={min(samples):.0f}ms max={max(samples):.0f}ms"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", default="none", help="comma-separated CONDUIT_WARMUP values to compare")
+    parser.add_argument("--upload", action="store_true", help="also time the first /upload (needs Redis)")
+    parser.add_argument("--top", type=int, default=10, help="show the N slowest imports")
+    args = parser.parse_args(argv)
+
+    print(f"import mcp.main: {_fmt(measure_import_ms(args.runs))}")
+    print("slowest imports (cumulative):")
+    for name, us in top_imports(args.top):
+        print(f"  {name:<40} {us / 1000:>8.1f}ms")
+
+    llm_proc, llm_url = start_mock_llm(argparse.Namespace(llm_latency_ms=50, llm_jitter_ms=0, llm_error_rate=0))
+    try:
+        for warmup in args.warmup.split(","):
+            health, first_upload = [], []
+            for _ in range(args.runs):
+                r = measure_ttfr(warmup, llm_url, args.upload)
+                if r["health_ms"] is not None:
+                    health.append(r["health_ms"])
+                if r["upload_ms"] is not None:
+                    first_upload.append(r["upload_ms"])
+            print(f"\nCONDUIT_WARMUP={warmup}")
+            print(f"  spawn -> first GET /     : {_fmt(health)}")
+            if args.upload:
+                print(f"  first POST /upload       : {_fmt(first_upload)}")
+    finally:
+        _stop(llm_proc)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
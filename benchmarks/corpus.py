@@ -0,0 +1,169 @@
+"""
+Benchmark inputs: the sample files under data/ plus synthetic, scaled-up
+variants (long PDFs, 100k-item JSON arrays, MIME emails with attachments).
+Everything is generated deterministically so runs are comparable.
+"""
+
+import json
+import os
+from email.message import EmailMessage
+from typing import Dict, List
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+INVOICE_LINES = [
+    "TAX INVOICE",
+    "Invoice Number: INV-{page:05d}  Order Number: 407-0648430-{page:07d}",
+    "Seller: Benchmark Supplies Ltd, 12 Market Road, Pune",
+    "Description            Qty   Unit Price    Amount",
+    "Widget A               10    12.50         125.00",
+    "Widget B               2     80.00         160.00",
+    "Cable assembly (2m)    25    3.20          80.00",
+    "Subtotal: 365.00  Tax: 36.50  Total: 401.50",
+    "Payment terms: Net 30. Due date: 2025-07-15.",
+]
+
+
+def load_data_corpus() -> Dict[str, bytes]:
+    """Return {filename: raw_bytes} for every sample file in data/."""
+    corpus = {}
+    for name in sorted(os.listdir(DATA_DIR)):
+        path = os.path.join(DATA_DIR, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                corpus[name] = f.read()
+    return corpus
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]], cells: List[List[tuple]] = None) -> bytes:
+    """
+    Build a minimal, valid PDF with one text page per entry in `pages`.
+    Each page is a list of lines rendered in Helvetica. `cells` optionally
+    adds (x, y, text) strings placed at absolute positions on each page.
+    """
+    objects: List[bytes] = []
+    page_count = len(pages)
+    font_id = 3
+    first_page_id = 4
+    kids = " ".join(f"{first_page_id + 2 * i} 0 R" for i in range(page_count))
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for i, lines in enumerate(pages):
+        content_id = first_page_id + 2 * i + 1
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        )
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 760 Td"]
+        for line in lines:
+            ops.append(f"({_pdf_escape(line)}) Tj T*")
+        for x, y, text in (cells[i] if cells else ()):
+            ops.append(f"1 0 0 1 {x} {y} Tm ({_pdf_escape(text)}) Tj")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+
+    xref_at = len(out)
+    out += b"xref\n0 %d\n" % (len(objects) + 1)
+    out += b"0000000000 65535 f \n"
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    return bytes(out)
+
+
+def make_large_invoice_pdf(page_count: int = 200) -> bytes:
+    """A long invoice with a full page of line items on every page."""
+    pages = []
+    for p in range(page_count):
+        lines = [line.format(page=p) for line in INVOICE_LINES]
+        lines += [f"Line item {p}-{j}: Service fee {j}   1   {j}.00   {j}.00" for j in range(30)]
+        pages.append(lines)
+    return make_pdf(pages)
+
+
+# Column x positions of the table invoice; every cell is placed on its own
+TABLE_COLUMNS = (50, 90, 300, 350, 420, 500)
+TABLE_HEADER = ("Sl.", "Description", "Qty", "Unit Price", "Tax", "Amount")
+
+
+def table_invoice_rows(page: int) -> List[List[str]]:
+    """The rows of page `page` of make_table_invoice_pdf(): header, line items, total."""
+    rows = [list(TABLE_HEADER)]
+    for j in range(25):
+        qty, price = j % 7 + 1, 12.5 + j
+        rows.append([str(j + 1), f"Part {page}-{j} steel bracket", str(qty), f"{price:.2f}",
+                     f"{qty * price * 0.18:.2f}", f"{qty * price * 1.18:.2f}"])
+    rows.append(["", "Total", "", "", "", f"{sum(float(r[5]) for r in rows[1:]):.2f}"])
+    return rows
+
+
+def make_table_invoice_pdf(page_count: int = 20) -> bytes:
+    """
+    A table-heavy invoice: every cell is positioned separately, the way
+    invoicing tools lay tables out, so extraction has to keep columns apart.
+    The expected rows are table_invoice_rows(page).
+    """
+    return make_pdf([[] for _ in range(page_count)], cells=[
+        [(TABLE_COLUMNS[c], 760 - 16 * r, cell)
+         for r, row in enumerate(table_invoice_rows(p)) for c, cell in enumerate(row) if cell]
+        for p in range(page_count)
+    ])
+
+
+def make_json_array(item_count: int = 100_000) -> bytes:
+    """An RFQ document whose `items` array holds `item_count` entries."""
+    doc = {
+        "rfq_id": "RFQ-BENCH-1",
+        "company": "Benchmark Corp",
+        "deadline": "2025-12-31",
+        "budget_range": 250000,
+        "items": [
+            {"item_name": f"Part {i}", "quantity": (i % 500) + 1}
+            for i in range(item_count)
+        ],
+    }
+    return json.dumps(doc).encode("utf-8")
+
+
+def make_mime_with_attachments(pdf_pages: int = 5, json_items: int = 1_000) -> bytes:
+    """A complaint email carrying an invoice PDF and a JSON order as attachments."""
+    msg = EmailMessage()
+    msg["From"] = "Jane Doe <jane@example.com>"
+    msg["To"] = "support@company.com"
+    msg["Subject"] = "Complaint: defective order, please replace ASAP"
+    msg.set_content(
+        "Hello,\n\nThe items in the attached order arrived defective. "
+        "I have attached the invoice and the order file. Please replace them "
+        "as soon as possible or issue a refund.\n\nRegards,\nJane\n"
+    )
+    pdf = make_pdf([[line.format(page=p) for line in INVOICE_LINES] for p in range(pdf_pages)])
+    msg.add_attachment(pdf, maintype="application", subtype="pdf", filename="invoice.pdf")
+    msg.add_attachment(make_json_array(json_items), maintype="application", subtype="json",
+                       filename="order.json")
+    return msg.as_bytes()
+
+
+def synthetic_corpus(scale: float = 1.0) -> Dict[str, bytes]:
+    """
+    Scaled inputs keyed by a descriptive name. `scale` shrinks or grows the
+    generated documents (e.g. 0.1 for a quick smoke run).
+    """
+    return {
+        "large_invoice.pdf": make_large_invoice_pdf(max(1, int(200 * scale))),
+        "items_100k.json": make_json_array(max(1, int(100_000 * scale))),
+        "complaint_with_attachments.eml": make_mime_with_attachments(),
+    }
@@ -0,0 +1,126 @@
+"""
+Offline evaluation of the classifier's LLM fallback.
+
+Classifies every labeled sample in benchmarks/classifier_samples.jsonl (plus
+the labeled files in data/) twice: with the old prompt (all few-shot
+examples, up to max_snippet_chars of input) and with the per-request prompt
+builder. It reports accuracy, estimated prompt tokens and LLM latency for both.
+
+Uses Groq when GROQ_API_KEY is set; otherwise (or with --fake) the
+deterministic fake model, which only checks the plumbing and token counts.
+
+Usage (from the repository root):
+    python -m benchmarks.eval_classifier
+    python -m benchmarks.eval_classifier --k 2 --budget 600
+    python -m benchmarks.eval_classifier --check --tolerance 0.05
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.corpus import load_data_corpus
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "classifier_samples.jsonl")
+
+# Sample files in data/ whose intent is unambiguous
+DATA_LABELS = {
+    "complaint.eml": "Complaint",
+    "invoice.pdf": "Invoice",
+    "INVOICE (1).pdf": "Invoice",
+}
+
+
+def load_samples(classifier) -> List[Dict[str, str]]:
+    from agents.classifier import format_from_filename
+
+    with open(SAMPLES_PATH, encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    for name, raw in load_data_corpus().items():
+        if name in DATA_LABELS:
+            samples.append({
+                "format": format_from_filename(name),
+                "text": classifier._bytes_to_text(raw),
+                "intent": DATA_LABELS[name],
+                "name": name,
+            })
+    return samples
+
+
+def evaluate(classifier, builder, samples: List[Dict[str, str]]) -> Dict[str, object]:
+    correct, tokens, latencies, misses = 0, [], [], []
+    for sample in samples:
+        snippet = sample["text"][:classifier.max_snippet_chars]
+        scores = classifier._score_intents(snippet, sample["format"])
+        tokens.append(builder.build(sample["format"], snippet, scores)["prompt_tokens"])
+        t0 = time.perf_counter()
+        intent = classifier.classify_with_llm(sample["format"], snippet, builder=builder)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if intent == sample["intent"]:
+            correct += 1
+        else:
+            misses.append(f"{sample.get('name', sample['text'][:40])!r}: expected {sample['intent']}, got {intent}")
+    return {
+        "accuracy":       correct / len(samples),
+        "prompt_tokens":  statistics.mean(tokens),
+        "latency_p50_ms": statistics.median(latencies),
+        "misses":         misses,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=None, help="few-shot examples (default: CLASSIFIER_FEW_SHOT_K)")
+    parser.add_argument("--budget", type=int, default=None, help="prompt token budget (default: CLASSIFIER_PROMPT_TOKENS)")
+    parser.add_argument("--fake", action="store_true", help="use the deterministic fake model even if GROQ_API_KEY is set")
+    parser.add_argument("--verbose", action="store_true", help="list misclassified samples")
+    parser.add_argument("--check", action="store_true", help="fail if the builder loses accuracy")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="accuracy drop allowed by --check")
+    args = parser.parse_args(argv)
+
+    from agents.classifier import ClassifierAgent
+    from agents.prompt_builder import FewShotPromptBuilder
+
+    llm = None
+    if args.fake or not os.getenv("GROQ_API_KEY"):
+        from benchmarks.fakes import DeterministicChatModel
+        llm = DeterministicChatModel()
+        print("Using the deterministic fake model: accuracy figures only check the plumbing\n")
+    classifier = ClassifierAgent(llm=llm)
+    if args.k is not None:
+        classifier.few_shot_k = args.k
+    if args.budget is not None:
+        classifier.prompt_tokens = args.budget
+
+    builder = classifier.prompt_builder
+    full = FewShotPromptBuilder(builder.prefix, builder.examples, builder.example_template, builder.suffix,
+                                k=len(builder.examples), token_budget=None, separator=builder.separator)
+    samples = load_samples(classifier)
+
+    results = {
+        "all examples": evaluate(classifier, full, samples),
+        f"k={builder.k}, budget={builder.token_budget}": evaluate(classifier, builder, samples),
+    }
+
+    print(f"{len(samples)} labeled samples\n")
+    print(f"{'prompt':<28}{'accuracy':>10}{'prompt tok':>12}{'p50 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<28}{r['accuracy']:>10.1%}{r['prompt_tokens']:>12.0f}{r['latency_p50_ms']:>10.1f}")
+    for name, r in results.items():
+        for miss in r["misses"] if args.verbose else ():
+            print(f"  [{name}] {miss}")
+
+    if args.check:
+        baseline, candidate = (r["accuracy"] for r in results.values())
+        if candidate + args.tolerance < baseline:
+            print(f"\nAccuracy dropped from {baseline:.1%} to {candidate:.1%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Small timing harness shared by the benchmark scripts:
+  - measure(): ops/sec, p50/p99 latency and tracemalloc allocation figures
+  - save_baseline() / compare(): JSON baselines and regression detection
+"""
+
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_samples))))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def measure(fn: Callable[[], Any], iterations: int = 50, warmup: int = 3) -> Dict[str, float]:
+    """
+    Time `fn` over `iterations` calls, then run it once more under tracemalloc
+    (kept separate so allocation tracing does not skew the latency numbers).
+    """
+    for _ in range(warmup):
+        fn()
+
+    gc.collect()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - t0) / 1e6)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        base_current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated_blocks = sum(
+        stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0
+    )
+
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(samples, 50),
+        "p99_ms": _percentile(samples, 99),
+        "max_ms": samples[-1] if samples else 0.0,
+        "alloc_peak_kb": (peak - base_current) / 1024,
+        "alloc_retained_kb": (current - base_current) / 1024,
+        "alloc_blocks": allocated_blocks,
+    }
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    header = f"{'benchmark':<58} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'blocks':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<58} {r['ops_per_sec']:>10.1f} {r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+              f"{r['alloc_peak_kb']:>10.1f} {r['alloc_blocks']:>8}")
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    payload = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    with open(path) as f:
+        return json.load(f).get("results", {})
+
+
+def compare(baseline: Dict[str, Dict[str, float]],
+            results: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """
+    Return a human-readable line for every benchmark whose throughput dropped,
+    or whose p99 latency grew, by more than `threshold` (e.g. 0.2 = 20%).
+    Benchmarks missing from the baseline are ignored.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["ops_per_sec"] and current["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{name}: ops/sec {base['ops_per_sec']:.1f} -> {current['ops_per_sec']:.1f}"
+            )
+        if base["p99_ms"] and current["p99_ms"] > base["p99_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p99 {base['p99_ms']:.3f}ms -> {current['p99_ms']:.3f}ms"
+            )
+    return regressions
@@ -0,0 +1,99 @@
+"""
+A dependency-free latency histogram in the spirit of HdrHistogram: values are
+recorded into log-linear buckets (each power-of-two range is split into a
+fixed number of linear sub-buckets), so relative error is bounded by the
+configured precision at any magnitude while memory stays constant.
+"""
+
+import math
+from typing import Dict, List, Tuple
+
+
+class LatencyHistogram:
+    def __init__(self, lowest_us: int = 1, highest_us: int = 3_600_000_000, significant_digits: int = 2):
+        """
+        lowest_us / highest_us: trackable range in microseconds
+        significant_digits: precision kept per value (2 => ~1% relative error)
+        """
+        self.lowest = lowest_us
+        self.highest = highest_us
+        self.sub_bucket_count = 2 ** int(math.ceil(math.log2(2 * 10 ** significant_digits)))
+        self.sub_bucket_half = self.sub_bucket_count // 2
+        self.sub_bucket_bits = int(math.log2(self.sub_bucket_count))
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.min_us = None
+        self.max_us = 0
+        self.sum_us = 0
+
+    def _index(self, value: int) -> int:
+        # Bucket 0 covers [0, sub_bucket_count); every following bucket doubles
+        # the range while keeping sub_bucket_half linear steps.
+        if value < self.sub_bucket_count:
+            return value
+        bucket = value.bit_length() - self.sub_bucket_bits
+        sub = value >> bucket
+        return (bucket + 1) * self.sub_bucket_half + (sub - self.sub_bucket_half)
+
+    def _value_at(self, index: int) -> int:
+        """Highest value that maps to `index` (what HdrHistogram reports)."""
+        if index < self.sub_bucket_count:
+            return index
+        bucket = index // self.sub_bucket_half - 1
+        sub = index % self.sub_bucket_half + self.sub_bucket_half
+        return ((sub + 1) << bucket) - 1
+
+    def record(self, value_us: float, count: int = 1) -> None:
+        v = int(min(max(value_us, self.lowest), self.highest))
+        idx = self._index(v)
+        self.counts[idx] = self.counts.get(idx, 0) + count
+        self.total += count
+        self.sum_us += v * count
+        self.min_us = v if self.min_us is None else min(self.min_us, v)
+        self.max_us = max(self.max_us, v)
+
+    def record_ms(self, value_ms: float) -> None:
+        self.record(value_ms * 1000.0)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for idx, c in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + c
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile_ms(self, pct: float) -> float:
+        if not self.total:
+            return 0.0
+        target = max(1, int(math.ceil(pct / 100.0 * self.total)))
+        running = 0
+        for idx in sorted(self.counts):
+            running += self.counts[idx]
+            if running >= target:
+                return min(self._value_at(idx), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def mean_ms(self) -> float:
+        return (self.sum_us / self.total) / 1000.0 if self.total else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.total,
+            "min_ms": (self.min_us or 0) / 1000.0,
+            "mean_ms": self.mean_ms(),
+            "p50_ms": self.percentile_ms(50),
+            "p90_ms": self.percentile_ms(90),
+            "p99_ms": self.percentile_ms(99),
+            "p999_ms": self.percentile_ms(99.9),
+            "max_ms": self.max_us / 1000.0,
+        }
+
+    def percentile_distribution(self) -> List[Tuple[float, float, int]]:
+        """(percentile, value_ms, cumulative count) rows, like HdrHistogram's output."""
+        rows = []
+        for pct in (0, 50, 75, 90, 95, 99, 99.5, 99.9, 99.99, 100):
+            value = self.percentile_ms(pct) if pct else (self.min_us or 0) / 1000.0
+            rows.append((pct, value, int(math.ceil(pct / 100.0 * self.total))))
+        return rows
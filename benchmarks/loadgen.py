@@ -0,0 +1,354 @@
+"""
+End-to-end load generator for the Conduit service.
+
+Starts the mock LLM server and the app (uvicorn, N workers) locally, drives
+/upload with a weighted mix of Email/JSON/PDF documents plus a share of
+/audit reads, and reports throughput, HDR-style latency histograms, error
+rates, load-generator event-loop lag and server responsiveness (latency of
+the `/` health probe while under load).
+
+Closed loop (fixed number of concurrent clients):
+    python -m benchmarks.loadgen --mode closed --concurrency 8,32 --workers 1,2 --duration 30
+
+Open loop (Poisson arrivals at a fixed rate, latency measured from the
+intended send time so generator stalls are not hidden):
+    python -m benchmarks.loadgen --mode open --rate 20 --duration 60 --llm-latency-ms 400 --llm-error-rate 0.05
+
+Against an already running app (no processes are started):
+    python -m benchmarks.loadgen --url http://localhost:8000 --mode closed --concurrency 16
+
+The app still needs Redis (REDIS_HOST / REDIS_PORT are passed through), e.g.
+`docker compose up redis`.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.corpus import load_data_corpus, synthetic_corpus
+from benchmarks.histogram import LatencyHistogram
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIT_PATHS = ["/audit", "/audit/store", "/audit/alert", "/audit/escalate", "/audit/log"]
+FORMAT_BY_EXT = {"eml": "email", "txt": "email", "json": "json", "pdf": "pdf"}
+
+
+@dataclass
+class RunStats:
+    started: float = 0.0
+    elapsed: float = 0.0
+    latency: Dict[str, LatencyHistogram] = field(default_factory=dict)
+    status: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    loop_lag: LatencyHistogram = field(default_factory=LatencyHistogram)
+    server_probe: LatencyHistogram = field(default_factory=LatencyHistogram)
+    dropped: int = 0
+
+    def record(self, kind: str, latency_ms: float, outcome: str) -> None:
+        self.latency.setdefault(kind, LatencyHistogram()).record_ms(latency_ms)
+        by_outcome = self.status.setdefault(kind, {})
+        by_outcome[outcome] = by_outcome.get(outcome, 0) + 1
+
+    def report(self) -> Dict[str, object]:
+        overall = LatencyHistogram()
+        for h in self.latency.values():
+            overall.merge(h)
+        total = overall.total
+        errors = sum(c for by in self.status.values() for o, c in by.items() if not o.startswith("2"))
+        return {
+            "elapsed_s": self.elapsed,
+            "requests": total,
+            "throughput_rps": total / self.elapsed if self.elapsed else 0.0,
+            "error_rate": errors / total if total else 0.0,
+            "dropped": self.dropped,
+            "latency": {k: h.summary() for k, h in sorted(self.latency.items())},
+            "overall": overall.summary(),
+            "status": self.status,
+            "client_loop_lag": self.loop_lag.summary(),
+            "server_probe": self.server_probe.summary(),
+        }
+
+
+def load_documents(include_synthetic: bool, scale: float) -> Dict[str, List[Tuple[str, bytes]]]:
+    """Group corpus documents by format: {"email": [(filename, bytes), ...], ...}"""
+    docs = load_data_corpus()
+    if include_synthetic:
+        docs.update(synthetic_corpus(scale))
+    grouped: Dict[str, List[Tuple[str, bytes]]] = {}
+    for name, raw in docs.items():
+        fmt = FORMAT_BY_EXT.get(name.rsplit(".", 1)[-1].lower())
+        if fmt:
+            grouped.setdefault(fmt, []).append((name, raw))
+    return grouped
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        fmt, _, weight = part.partition("=")
+        mix[fmt.strip().lower()] = float(weight or 1)
+    return mix
+
+
+class LoadGenerator:
+    def __init__(self, url: str, documents, mix: Dict[str, float], audit_ratio: float,
+                 timeout: float, seed: int):
+        self.url = url
+        self.documents = documents
+        self.formats = [f for f in mix if documents.get(f)]
+        self.weights = [mix[f] for f in self.formats]
+        self.audit_ratio = audit_ratio
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.stats = RunStats()
+        self.recording = False
+
+    def _next_request(self):
+        if self.audit_ratio and self.rng.random() < self.audit_ratio:
+            return "audit", self.rng.choice(AUDIT_PATHS), None
+        fmt = self.rng.choices(self.formats, weights=self.weights)[0]
+        name, raw = self.rng.choice(self.documents[fmt])
+        return f"upload:{fmt}", "/upload", (name, raw)
+
+    async def _send(self, client: httpx.AsyncClient, intended_start: Optional[float] = None) -> None:
+        kind, path, upload = self._next_request()
+        start = intended_start if intended_start is not None else time.perf_counter()
+        try:
+            if upload:
+                # Declared up front so admission applies the format's share (mcp/main.py)
+                resp = await client.post(path, files={"file": upload}, headers={"X-Filename": upload[0]})
+            else:
+                resp = await client.get(path)
+            outcome = str(resp.status_code)
+        except httpx.TimeoutException:
+            outcome = "timeout"
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        if self.recording:
+            self.stats.record(kind, (time.perf_counter() - start) * 1000.0, outcome)
+
+    async def _monitor_loop_lag(self, interval: float = 0.05) -> None:
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000.0)
+            if self.recording:
+                self.stats.loop_lag.record_ms(lag_ms)
+
+    async def _probe_server(self, client: httpx.AsyncClient, interval: float = 0.25) -> None:
+        while True:
+            start = time.perf_counter()
+            try:
+                await client.get("/")
+                if self.recording:
+                    self.stats.server_probe.record_ms((time.perf_counter() - start) * 1000.0)
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(interval)
+
+    async def run_closed(self, concurrency: int, duration: float, warmup: float, think_ms: float) -> RunStats:
+        async def user(client):
+            while True:
+                await self._send(client)
+                if think_ms:
+                    await asyncio.sleep(self.rng.expovariate(1000.0 / think_ms))
+
+        return await self._run(duration, warmup, lambda client: [user(client) for _ in range(concurrency)],
+                               max_connections=concurrency + 2)
+
+    async def run_open(self, rate: float, duration: float, warmup: float, max_outstanding: int) -> RunStats:
+        async def arrivals(client):
+            outstanding = set()
+            next_at = time.perf_counter()
+            while True:
+                next_at += self.rng.expovariate(rate)
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if len(outstanding) >= max_outstanding:
+                    if self.recording:
+                        self.stats.dropped += 1
+                    continue
+                task = asyncio.create_task(self._send(client, intended_start=next_at))
+                outstanding.add(task)
+                task.add_done_callback(outstanding.discard)
+
+        return await self._run(duration, warmup, lambda client: [arrivals(client)],
+                               max_connections=max_outstanding + 2)
+
+    async def _run(self, duration, warmup, make_workers, max_connections) -> RunStats:
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        async with httpx.AsyncClient(base_url=self.url, timeout=self.timeout, limits=limits) as client, \
+                httpx.AsyncClient(base_url=self.url, timeout=self.timeout) as probe_client:
+            tasks = [asyncio.create_task(c) for c in make_workers(client)]
+            tasks.append(asyncio.create_task(self._monitor_loop_lag()))
+            tasks.append(asyncio.create_task(self._probe_server(probe_client)))
+            await asyncio.sleep(warmup)
+            self.recording = True
+            self.stats.started = time.perf_counter()
+            await asyncio.sleep(duration)
+            self.recording = False
+            self.stats.elapsed = time.perf_counter() - self.stats.started
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self.stats
+
+
+# --- Local process management ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"process exited early with code {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def start_mock_llm(args) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    cmd = [sys.executable, "-m", "benchmarks.mock_llm", "--port", str(port),
+           "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms),
+           "--error-rate", str(args.llm_error_rate)]
+    proc = subprocess.Popen(cmd, cwd=ROOT)
+    url = f"http://127.0.0.1:{port}"
+    _wait_ready(f"{url}/stats", proc)
+    return proc, url
+
+
+def start_app(workers: int, llm_url: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": env.get("GROQ_API_KEY", "loadtest"),
+        "GROQ_MODEL": env.get("GROQ_MODEL", "mock"),
+        "GROQ_BASE_URL": llm_url,
+        "GROQ_API_BASE": llm_url,
+        "BASE_URL": url,
+    })
+    cmd = [sys.executable, "-m", "uvicorn", "mcp.main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    _wait_ready(url, proc)
+    return proc, url
+
+
+def _stop(proc: Optional[subprocess.Popen]) -> None:
+    if proc and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def print_report(label: str, report: Dict[str, object]) -> None:
+    print(f"\n=== {label} ===")
+    print(f"requests={report['requests']}  throughput={report['throughput_rps']:.1f} req/s  "
+          f"errors={report['error_rate']:.2%}  dropped={report['dropped']}")
+    print(f"{'kind':<16} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'max ms':>9}")
+    rows = list(report["latency"].items()) + [("ALL", report["overall"])]
+    for kind, s in rows:
+        print(f"{kind:<16} {s['count']:>7} {s['p50_ms']:>9.1f} {s['p90_ms']:>9.1f} {s['p99_ms']:>9.1f} "
+              f"{s['p999_ms']:>9.1f} {s['max_ms']:>9.1f}")
+    print(f"status codes: {json.dumps(report['status'], sort_keys=True)}")
+    lag, probe = report["client_loop_lag"], report["server_probe"]
+    print(f"client loop lag: p99={lag['p99_ms']:.1f}ms max={lag['max_ms']:.1f}ms   "
+          f"server health probe: p50={probe['p50_ms']:.1f}ms p99={probe['p99_ms']:.1f}ms max={probe['max_ms']:.1f}ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target an already running app instead of starting one")
+    parser.add_argument("--llm-url", help="use an already running mock LLM server")
+    parser.add_argument("--workers", default="1", help="comma-separated uvicorn worker counts to compare")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", default="8", help="closed loop: comma-separated client counts")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="closed loop: mean think time per client")
+    parser.add_argument("--rate", default="10", help="open loop: comma-separated arrival rates (req/s)")
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="open loop: cap on in-flight requests")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before each run")
+    parser.add_argument("--mix", default="email=4,json=3,pdf=3", help="upload mix weights by format")
+    parser.add_argument("--audit-ratio", type=float, default=0.05, help="fraction of requests hitting /audit*")
+    parser.add_argument("--synthetic", action="store_true", help="include large synthetic documents")
+    parser.add_argument("--scale", type=float, default=0.1, help="size multiplier for synthetic documents")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request client timeout (s)")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of LLM calls answered 429")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write all reports to this file")
+    args = parser.parse_args(argv)
+
+    documents = load_documents(args.synthetic, args.scale)
+    mix = parse_mix(args.mix)
+    worker_counts = [int(w) for w in args.workers.split(",")] if not args.url else [None]
+    loads = [float(x) for x in (args.concurrency if args.mode == "closed" else args.rate).split(",")]
+
+    llm_proc = None
+    reports = []
+    try:
+        llm_url = args.llm_url
+        if not args.url and not llm_url:
+            llm_proc, llm_url = start_mock_llm(args)
+
+        for workers, load in itertools.product(worker_counts, loads):
+            app_proc = None
+            try:
+                url = args.url
+                if not url:
+                    app_proc, url = start_app(workers, llm_url)
+                gen = LoadGenerator(url, documents, mix, args.audit_ratio, args.timeout, args.seed)
+                if args.mode == "closed":
+                    stats = asyncio.run(gen.run_closed(int(load), args.duration, args.warmup, args.think_ms))
+                    label = f"workers={workers or '?'} concurrency={int(load)}"
+                else:
+                    stats = asyncio.run(gen.run_open(load, args.duration, args.warmup, args.max_outstanding))
+                    label = f"workers={workers or '?'} rate={load:g}/s"
+                report = stats.report()
+                report["label"] = label
+                reports.append(report)
+                print_report(label, report)
+            finally:
+                _stop(app_proc)
+    finally:
+        _stop(llm_proc)
+
+    if len(reports) > 1:
+        print(f"\n{'configuration':<32} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>8} {'probe p99':>10}")
+        for r in reports:
+            print(f"{r['label']:<32} {r['throughput_rps']:>8.1f} {r['overall']['p50_ms']:>9.1f} "
+                  f"{r['overall']['p99_ms']:>9.1f} {r['error_rate']:>8.2%} {r['server_probe']['p99_ms']:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
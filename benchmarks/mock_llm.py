@@ -0,0 +1,115 @@
+"""
+Mock Groq (OpenAI-compatible) chat-completions server for load testing.
+
+Answers with the same canned responses as DeterministicChatModel, after a
+configurable latency (streamed in small chunks when the request asks for
+`stream`), and rejects a configurable fraction of calls with
+429 + Retry-After to exercise client retry behaviour.
+
+    python -m benchmarks.mock_llm --port 9100 --latency-ms 250 --jitter-ms 100 --error-rate 0.05
+
+Point the app at it with GROQ_BASE_URL=http://127.0.0.1:9100 (the Groq SDK
+appends /openai/v1/...).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.fakes import _answer
+
+app = FastAPI(title="Mock LLM")
+
+config = {
+    "latency_ms": float(os.getenv("MOCK_LLM_LATENCY_MS", 200)),
+    "jitter_ms": float(os.getenv("MOCK_LLM_JITTER_MS", 50)),
+    "error_rate": float(os.getenv("MOCK_LLM_ERROR_RATE", 0.0)),
+    "retry_after_s": float(os.getenv("MOCK_LLM_RETRY_AFTER_S", 1)),
+}
+stats = {"requests": 0, "rate_limited": 0}
+
+
+@app.get("/stats")
+async def get_stats():
+    return {"config": config, **stats}
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    if config["error_rate"] and random.random() < config["error_rate"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": str(config["retry_after_s"])},
+            content={"error": {"message": "Rate limit reached (mock)", "type": "tokens", "code": "rate_limit_exceeded"}},
+        )
+
+    delay = config["latency_ms"] + random.uniform(-config["jitter_ms"], config["jitter_ms"])
+    await asyncio.sleep(max(0.0, delay) / 1000.0)
+
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    content = _answer(prompt)
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(body.get("model", "mock"), content), media_type="text/event-stream")
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+async def stream_chunks(model: str, content: str):
+    chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+    pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+    for i, piece in enumerate(pieces + [None]):
+        delta = {} if piece is None else ({"role": "assistant", "content": piece} if i == 0 else {"content": piece})
+        chunk = {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if piece is None else None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(0.002)
+    yield "data: [DONE]\n\n"
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=config["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"],
+                        help="fraction of calls answered with 429")
+    parser.add_argument("--retry-after-s", type=float, default=config["retry_after_s"])
+    args = parser.parse_args()
+    config.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                  error_rate=args.error_rate, retry_after_s=args.retry_after_s)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
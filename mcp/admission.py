@@ -0,0 +1,240 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from mcp.metrics import ADMISSION_LIMIT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Largest fraction of the limit one format may hold, so slow PDFs can't take every slot
+# Uploads that don't declare a filename (format "Unknown") are held to the PDF share
+DEFAULT_SHARES = {"PDF": 0.5, "JSON": 0.75, "Email": 1.0, "Unknown": 0.5}
+
+
+class Overloaded(Exception):
+    """No upload slot is free, and none is likely to free up soon enough."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds, for the Retry-After header
+
+
+class Ticket:
+    __slots__ = ("format", "future", "granted", "enqueued", "started")
+
+    def __init__(self, fmt: str):
+        self.format = fmt
+        self.future: Optional[asyncio.Future] = None
+        self.granted = False
+        self.enqueued = time.monotonic()
+        self.started = self.enqueued
+
+    @property
+    def waited(self) -> float:
+        """Seconds spent queued before being admitted."""
+        return self.started - self.enqueued
+
+
+class GradientLimit:
+    """
+    Concurrency limit that follows observed latency, after the gradient
+    limiters used for service-to-service backpressure:
+    - per format, a moving average of recent upload durations is compared with
+      the baseline, the lowest duration seen (drifting up slowly so a lasting
+      change in document mix or model is eventually taken as the new normal):
+        gradient = clamp(tolerance * baseline / recent, 0.5, 1)
+    - limit <- limit * gradient + sqrt(limit), smoothed: while latency holds,
+      the sqrt term probes for more capacity; once the LLM backend slows down
+      and uploads take longer than the baseline, the limit shrinks
+    - the limit isn't changed while less than half of it is in use, since that
+      says nothing about how much more the backend could take
+
+    Formats are tracked separately because a PDF normally takes many times
+    longer than an email; mixing them would read the format mix as a slowdown.
+    """
+
+    def __init__(self, initial: float, minimum: float, maximum: float,
+                 tolerance: float = 1.5, smoothing: float = 0.2):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.service_time: Optional[float] = None  # recent average over all formats
+        self._recent: Dict[str, float] = {}
+        self._baseline: Dict[str, float] = {}
+
+    def update(self, fmt: str, duration: float, in_flight: int) -> float:
+        previous = self.service_time
+        self.service_time = duration if previous is None else previous + 0.1 * (duration - previous)
+        recent, baseline = self._recent.get(fmt), self._baseline.get(fmt)
+        if recent is None:
+            self._recent[fmt] = self._baseline[fmt] = duration
+            return self.limit
+        recent = self._recent[fmt] = recent + 0.1 * (duration - recent)
+        baseline = self._baseline[fmt] = min(duration, baseline + 0.002 * (recent - baseline))
+        if in_flight < self.limit / 2:
+            return self.limit
+
+        gradient = max(0.5, min(1.0, self.tolerance * baseline / recent))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = (1 - self.smoothing) * self.limit + self.smoothing * target
+        self.limit = max(self.minimum, min(self.maximum, limit))
+        return self.limit
+
+
+class AdmissionController:
+    """
+    Admission control for /upload: at most `limit` uploads are processed at
+    once, a few more wait in a short queue, and the rest are answered 429
+    with a Retry-After. Uploads are admitted from their headers alone, before
+    the multipart body is parsed, so a slow LLM backend can't pile up raw
+    documents in memory.
+    - the limit adapts to upload latency (see GradientLimit)
+    - each format may hold at most its share of the limit and of the queue; a
+      waiting email is admitted ahead of PDFs queued before it that are over
+      their quota
+    - Retry-After follows Little's law: slots free up at about
+      limit / service_time per second, and everyone queued goes first
+
+    Configured from the environment:
+      - ADMISSION_LIMIT:         initial limit on concurrent uploads (default 32, 0 = no admission control)
+      - ADMISSION_MIN_LIMIT:     lowest the limit adapts down to (default 4)
+      - ADMISSION_MAX_LIMIT:     highest the limit adapts up to (default 256)
+      - ADMISSION_ADAPTIVE:      "0" keeps the limit fixed at ADMISSION_LIMIT (default 1)
+      - ADMISSION_QUEUE:         uploads that may wait for a slot, per format at a share of 1 (default 64)
+      - ADMISSION_QUEUE_MS:      longest wait for a slot (default 2000, less if the latency budget is)
+      - ADMISSION_FORMAT_SHARES: per-format share of the limit (default "PDF=0.5,JSON=0.75,Email=1,Unknown=0.5")
+    """
+
+    def __init__(self):
+        initial = int(os.getenv("ADMISSION_LIMIT", 32))
+        self.enabled = initial > 0
+        self.adaptive = os.getenv("ADMISSION_ADAPTIVE", "1").strip().lower() not in ("0", "false", "no", "off")
+        minimum = min(int(os.getenv("ADMISSION_MIN_LIMIT", 4)), max(initial, 1))
+        maximum = max(int(os.getenv("ADMISSION_MAX_LIMIT", 256)), initial)
+        self.limiter = GradientLimit(max(initial, 1), minimum, maximum)
+        self.queue_size = int(os.getenv("ADMISSION_QUEUE", 64))
+        self.queue_timeout = float(os.getenv("ADMISSION_QUEUE_MS", 2000)) / 1000.0
+
+        self.shares = dict(DEFAULT_SHARES)
+        for pair in filter(None, os.getenv("ADMISSION_FORMAT_SHARES", "").split(",")):
+            fmt, _, share = pair.partition("=")
+            self.shares[fmt.strip()] = float(share)
+
+        self.in_flight = 0
+        self._by_format: Dict[str, int] = {}
+        self._waiting: Deque[Ticket] = deque()
+        ADMISSION_LIMIT.set(self.limit if self.enabled else 0)
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self.limiter.limit))
+
+    def quota(self, fmt: str) -> int:
+        """Slots `fmt` may hold at once; formats without a share only share the limit."""
+        return max(1, math.floor(self.shares.get(fmt, 1.0) * self.limit))
+
+    def queue_quota(self, fmt: str) -> int:
+        """Uploads of `fmt` that may wait at once: its share of ADMISSION_QUEUE."""
+        return max(1, math.floor(self.shares.get(fmt, 1.0) * self.queue_size))
+
+    def _fits(self, fmt: str) -> bool:
+        return self.in_flight < self.limit and self._by_format.get(fmt, 0) < self.quota(fmt)
+
+    async def acquire(self, fmt: str, timeout: float = None) -> Ticket:
+        """
+        Wait for a slot for an upload of format `fmt`, at most ADMISSION_QUEUE_MS
+        (or `timeout` seconds, if shorter). Raises Overloaded when the queue is
+        full or the wait runs out.
+        """
+        ticket = Ticket(fmt)
+        if not self.enabled:
+            return ticket
+        # Don't overtake uploads of the same format that are already waiting
+        if self._fits(fmt) and not any(w.format == fmt for w in self._waiting):
+            self._grant(ticket)
+            return ticket
+        if sum(w.format == fmt for w in self._waiting) >= self.queue_quota(fmt):
+            self._reject(fmt, "queue_full")
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._waiting.append(ticket)
+        ADMISSION_QUEUE_DEPTH.labels(format=fmt).inc()
+        wait = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        try:
+            await asyncio.wait_for(ticket.future, wait)
+        except BaseException as e:
+            if ticket.granted:
+                # Admitted just as the caller gave up (e.g. the client went away)
+                self.release(ticket, sample=False)
+            else:
+                self._waiting.remove(ticket)
+                ADMISSION_QUEUE_DEPTH.labels(format=fmt).dec()
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject(fmt, "timeout")
+            raise
+        return ticket
+
+    def release(self, ticket: Ticket, sample: bool = True) -> None:
+        """
+        Give the slot back. With `sample`, the upload's duration feeds the
+        adaptive limit (failed uploads are usually fast and would skew it).
+        """
+        if not ticket.granted:
+            return
+        ticket.granted = False
+        self.in_flight -= 1
+        self._by_format[ticket.format] -= 1
+        if sample and self.adaptive:
+            self.limiter.update(ticket.format, time.monotonic() - ticket.started, self.in_flight + 1)
+            ADMISSION_LIMIT.set(self.limit)
+        self._wake()
+
+    @asynccontextmanager
+    async def admit(self, fmt: str, timeout: float = None):
+        """Hold a slot for the enclosed block; see acquire()."""
+        ticket = await self.acquire(fmt, timeout)
+        ok = False
+        try:
+            yield ticket
+            ok = True
+        finally:
+            self.release(ticket, sample=ok)
+
+    def retry_after(self) -> int:
+        """Seconds until a new upload would likely be admitted (1-60)."""
+        service_time = self.limiter.service_time or 1.0
+        seconds = (len(self._waiting) + 1) * service_time / self.limit
+        return max(1, min(60, math.ceil(seconds)))
+
+    def _grant(self, ticket: Ticket) -> None:
+        self.in_flight += 1
+        self._by_format[ticket.format] = self._by_format.get(ticket.format, 0) + 1
+        ticket.granted = True
+        ticket.started = time.monotonic()
+        ADMISSION_WAIT.labels(format=ticket.format).observe(ticket.waited)
+
+    def _wake(self) -> None:
+        # Oldest first, skipping formats that are at their quota
+        for ticket in list(self._waiting):
+            if self.in_flight >= self.limit:
+                break
+            if ticket.future.done() or not self._fits(ticket.format):
+                continue
+            self._waiting.remove(ticket)
+            ADMISSION_QUEUE_DEPTH.labels(format=ticket.format).dec()
+            self._grant(ticket)
+            ticket.future.set_result(None)
+
+    def _reject(self, fmt: str, reason: str) -> None:
+        ADMISSION_REJECTED.labels(format=fmt, reason=reason).inc()
+        retry_after = self.retry_after()
+        logger.info(f"Rejected {fmt} upload ({reason}): {self.in_flight} in flight, "
+                    f"{len(self._waiting)} queued, limit {self.limit}, retry after {retry_after}s")
+        raise Overloaded(f"Too many uploads in progress ({reason.replace('_', ' ')}); retry later", retry_after)
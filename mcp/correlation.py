@@ -0,0 +1,42 @@
+import re
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Header carrying the correlation ID, in from clients and out to action targets
+HEADER = "X-Request-ID"
+
+_VALID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+_current: ContextVar[Optional[str]] = ContextVar("conduit_request_id", default=None)
+
+
+def new_request_id(supplied: Optional[str] = None) -> str:
+    """
+    The correlation ID of an upload: the caller's X-Request-ID if it sent one,
+    else a fresh uuid4 hex. Raises ValueError for IDs that aren't 1-64
+    letters, digits or ._:- (they end up in Redis keys and outbound headers).
+    """
+    if not supplied:
+        return uuid.uuid4().hex
+    if not _VALID.match(supplied):
+        raise ValueError("expected 1-64 letters, digits or ._:-")
+    return supplied
+
+
+def current() -> Optional[str]:
+    return _current.get()
+
+
+@contextmanager
+def request_scope(request_id: str):
+    """
+    Run the enclosed stages as upload `request_id`. Like the latency budget
+    (agents/deadline.py), it reaches tasks and worker threads with the context.
+    """
+    token = _current.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _current.reset(token)
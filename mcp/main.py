@@ -1,78 +1,537 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from agents.classifier import ClassifierAgent
-from agents.email_agent      import EmailAgent
-from agents.json_agent       import JSONAgent
-from agents.pdf_agent        import PDFAgent
-from memory.memory            import MemoryStore
-from mcp.router              import ActionRouter
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile
+from mcp.registry            import AgentRegistry
+from mcp import correlation, metrics, profiling
+from agents.parsing          import ParseQueueFull, ParseTimeout
+from agents.classifier       import format_from_filename
+from agents.deadline         import deadline_scope
+from mcp.admission           import Overloaded
+from agents                  import scheduler
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import hmac
+import json
 import logging
-from contextlib import asynccontextmanager
+import os
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, Callable, Dict, Optional
+
+# Progress callback: emit(event, data). Agents call it from worker threads.
+Emit = Callable[[str, Dict[str, Any]], None]
+
+
+def _build_memory():
+    from memory.backend import open_memory_store
+    return metrics.InstrumentedMemory(open_memory_store())
+
+
+def _build_compactor(registry: AgentRegistry):
+    from memory.compactor import Compactor
+    # The raw store: its helpers (bucket_of, segment_name...) aren't memory ops worth timing
+    return Compactor(registry.get("memory")._store)
+
+
+def build_registry() -> AgentRegistry:
+    """
+    Components are registered by import path and only imported/constructed on
+    first use, so startup doesn't pay for LangChain, PyPDF2 or jsonschema.
+    """
+    registry = AgentRegistry()
+    registry.register("memory",      _build_memory)
+    registry.register("classifier",  "agents.classifier:ClassifierAgent")
+    registry.register("email_agent", "agents.email_agent:EmailAgent")
+    registry.register("json_agent",  "agents.json_agent:JSONAgent")
+    registry.register("pdf_agent",   "agents.pdf_agent:PDFAgent")
+    registry.register("router",      "mcp.router:ActionRouter")
+    registry.register("parse_pool",  "agents.parsing:ParsePool")
+    registry.register("admission",   "mcp.admission:AdmissionController")
+    registry.register("compactor",   lambda: _build_compactor(registry))
+    return registry
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.info("Conduit starting up: initializing components")
-    app.state.memory       = MemoryStore()
-    app.state.classifier   = ClassifierAgent()
-    app.state.email_agent  = EmailAgent()
-    app.state.json_agent   = JSONAgent()
-    app.state.pdf_agent    = PDFAgent()
-    app.state.router       = ActionRouter()
+    app.state.registry = build_registry()
+
+    # Optional warm-up, e.g. CONDUIT_WARMUP=classifier,pdf_agent or CONDUIT_WARMUP=all
+    warmup = os.getenv("CONDUIT_WARMUP", "").strip()
+    if warmup:
+        names = app.state.registry.names() if warmup == "all" else [n.strip() for n in warmup.split(",") if n.strip()]
+        await asyncio.to_thread(app.state.registry.warm_up, names)
+
+    lag_monitor = asyncio.create_task(metrics.monitor_event_loop_lag())
+    # Moves old MemoryStore buckets from Redis to the compressed archive (0 = off)
+    compactor = None
+    if float(os.getenv("MEMORY_COMPACT_INTERVAL", 300)) > 0 and os.getenv("MEMORY_BACKEND", "redis").strip().lower() == "redis":
+        compactor = asyncio.create_task(run_compactor())
     yield  # everything after this is shutdown logic
 
         # --- SHUTDOWN LOGIC ---
     logging.info("Conduit shutting down: cleaning up resources")
+    lag_monitor.cancel()
+    if compactor is not None:
+        compactor.cancel()
+    loaded = app.state.registry.loaded()
         # Close memory connections
+    if "memory" in loaded:
+        try:
+            loaded["memory"].close()      # e.g., redis.close() or sqlite connection close
+        except Exception as e:
+            logging.warning(f"Error closing memory: {e}")
+    if "router" in loaded:
+        await loaded["router"].shutdown()
+    if "parse_pool" in loaded:
+        loaded["parse_pool"].shutdown()
+    scheduler.shutdown_executors()
+
+
+async def component(name: str):
+    """Fetch a component, building it off the event loop the first time."""
+    registry = app.state.registry
+    if registry.is_loaded(name):
+        return registry.get(name)
+    return await asyncio.to_thread(registry.get, name)
+
+
+async def run_compactor():
+    compactor = await component("compactor")
+    await compactor.run()
+
+
+async def parse_document(kind: str, raw_bytes: bytes) -> str:
+    """Run a CPU-bound parser in the parse process pool (see agents/parsing.py)."""
+    parse_pool = await component("parse_pool")
     try:
-        app.state.memory.close()      # e.g., redis.close() or sqlite connection close
-    except Exception as e:
-        logging.warning(f"Error closing memory: {e}")
+        return await parse_pool.parse(kind, raw_bytes)
+    except ParseQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ParseTimeout as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BrokenProcessPool as e:
+        raise HTTPException(status_code=503, detail=f"Parse worker crashed: {e}", headers={"Retry-After": "1"})
 
 
 app = FastAPI(title="Conduit")
 app = FastAPI(lifespan=lifespan)
 
+
+# Route paths without parameters, collected on the first request (every route
+# is registered by then)
+_static_paths: Optional[frozenset] = None
+
+
+def in_flight_path(path: str) -> str:
+    """`path` as an in-flight label: static route paths as-is, anything else "other"."""
+    global _static_paths
+    if _static_paths is None:
+        _static_paths = frozenset(route.path for route in app.routes if "{" not in route.path)
+    return path if path in _static_paths else "other"
+
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    # Only static route paths become label values, to keep cardinality bounded
+    path = in_flight_path(request.url.path)
+    metrics.IN_FLIGHT.labels(path=path).inc()
+    start = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.IN_FLIGHT.labels(path=path).dec()
+        route = request.scope.get("route")
+        metrics.HTTP_LATENCY.labels(
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=status,
+        ).observe(time.perf_counter() - start)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 async def health_check():
     return {"message": "Conduit service is running; ready to process files."}
 
-@app.post("/upload")
-async def upload(file: UploadFile = File(...)):
+AGENTS = {"Email": "email_agent", "JSON": "json_agent", "PDF": "pdf_agent"}
+
+
+class UnsupportedFormat(Exception):
+    """The classifier found no agent for this document."""
+
+
+async def classify_document(raw_bytes: bytes, filename: str, limiter=None) -> dict:
+    """Classify format + intent, with text extraction in the parse pool."""
+    classifier = await component("classifier")
+    async with limiter or nullcontext():
+        with metrics.stage_timer("classifier_parse", agent="classifier"):
+            snippet = await parse_document("classifier", raw_bytes)
+        with metrics.stage_timer("classify", agent="classifier") as span:
+            metadata = await scheduler.run_in_thread(profiling.traced(classifier.process, "classifier"),
+                                                     raw_bytes, filename, None, snippet)
+            span.update(format=metadata.get("format"), intent=metadata.get("intent"))
+    return metadata
+
+
+def pdf_parser(intent: str) -> str:
+    """Table-heavy intents (PDF_LAYOUT_INTENTS) get layout-preserving text extraction."""
+    from agents.pdf_backends import layout_intents
+    return "pdf_layout" if intent.lower() in layout_intents() else "pdf"
+
+
+async def extract_document(raw_bytes: bytes, metadata: dict, depth: int = 0, limiter=None,
+                           emit: Emit = None) -> dict:
+    """
+    Run the agent for the document's format. For emails, attachments go
+    through the same classify/extract pipeline concurrently with the email
+    itself, and their results are aggregated into the email's result.
+    With `emit`, PDF text extraction and the agent's LLM output are reported
+    as they happen (attachments are not streamed).
+    Raises UnsupportedFormat when no agent handles the format.
+    """
+    fmt, intent = metadata.get("format", ""), metadata.get("intent", "")
+    agent_name = AGENTS.get(fmt)
+    if agent_name is None:
+        raise UnsupportedFormat(fmt)
+    agent = await component(agent_name)
+
+    async def run_agent():
+        async with limiter or nullcontext():
+            extra = {}
+            if fmt == "PDF":
+                with metrics.stage_timer("pdf_parse", format=fmt, intent=intent, agent=agent_name):
+                    try:
+                        extra["text"] = await parse_document(pdf_parser(intent), raw_bytes)
+                    except HTTPException:
+                        raise
+                    except Exception:
+                        extra["text"] = ""  # unreadable PDF: the agent reports "No text could be extracted"
+                if emit is not None:
+                    emit("text_extracted", {"chars": len(extra["text"]),
+                                            "pages": extra["text"].count("--- Page ")})
+            if emit is not None and agent_name != "json_agent":
+                extra["emit"] = emit
+
+            # Agents make blocking LLM calls, so keep them off the event loop, in
+            # the thread pool of the request's priority (see agents/scheduler.py)
+            with metrics.stage_timer("extract", format=fmt, intent=intent, agent=agent_name):
+                return await scheduler.run_in_thread(profiling.traced(agent.process, agent_name), raw_bytes,
+                                                     metadata, **extra)
+
+    if fmt != "Email":
+        return await run_agent()
+    result, children = await asyncio.gather(run_agent(), process_attachments(agent, raw_bytes, depth, limiter,
+                                                                             metadata.get("source_id")))
+    return agent.aggregate(result, children) if children else result
+
+
+async def process_attachments(email_agent, raw_bytes: bytes, depth: int, limiter=None,
+                              parent_id: str = None) -> list:
+    """
+    Classify and extract an email's attachments concurrently. At most
+    attachment_concurrency documents per upload are worked on at once (the
+    limiter is shared by nested emails) and attached emails are followed
+    attachment_depth levels deep. Attachment n of the email with source_id
+    `parent_id` gets source_id "<parent_id>.<n>".
+    """
+    if depth >= email_agent.attachment_depth:
+        return []
+    attachments = await asyncio.to_thread(email_agent.extract_attachments, raw_bytes)
+    if not attachments:
+        return []
+    limiter = limiter or asyncio.Semaphore(email_agent.attachment_concurrency)
+
+    async def process_one(number: int, attachment: dict) -> dict:
+        summary = {"filename": attachment["filename"], "content_type": attachment["content_type"],
+                   "size": len(attachment["content"])}
+        try:
+            metadata = await classify_document(attachment["content"], attachment["filename"], limiter)
+            if parent_id is not None:
+                metadata["source_id"] = f"{parent_id}.{number}"
+            summary.update(format=metadata.get("format"), intent=metadata.get("intent"))
+            result = await extract_document(attachment["content"], metadata, depth + 1, limiter)
+            summary.update(source=result["source"], source_id=result.get("source_id"), data=result["data"],
+                           action_suggestion=result["action_suggestion"])
+        except UnsupportedFormat as e:
+            summary["error"] = f"Unsupported format: {e}"
+        except HTTPException as e:
+            summary["error"] = e.detail
+        except Exception as e:
+            logging.warning(f"Attachment {attachment['filename']} failed: {e}")
+            summary["error"] = str(e)
+        return summary
+
+    with metrics.stage_timer("attachments", format="Email"):
+        return list(await asyncio.gather(*(process_one(n, a) for n, a in enumerate(attachments, 1))))
+
+
+def request_budget(request: Request) -> Optional[float]:
+    """
+    Latency budget in seconds: the X-Deadline-Ms header, else CONDUIT_DEADLINE_MS
+    (default 30000). 0 means unbounded.
+    """
+    value = request.headers.get("x-deadline-ms") or os.getenv("CONDUIT_DEADLINE_MS", "30000")
+    try:
+        ms = float(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid X-Deadline-Ms: {value}")
+    return ms / 1000.0 if ms > 0 else None
+
+
+def request_correlation_id(request: Request) -> str:
+    """The upload's correlation ID: the caller's X-Request-ID, else a new one (mcp/correlation.py)."""
+    value = request.headers.get(correlation.HEADER)
+    try:
+        return correlation.new_request_id(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {correlation.HEADER}: {e}")
+
+
+def request_priority(request: Request) -> Optional[str]:
+    """Caller-supplied LLM priority from the X-Priority header (urgent/high/normal/low or 0-3)."""
+    value = request.headers.get("x-priority")
+    if not value:
+        return None
+    try:
+        return scheduler.parse_priority(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid X-Priority: {e}")
+
+
+# The multipart body of /upload and /upload/stream, parsed by read_upload()
+# once the upload is admitted; declared here for the OpenAPI schema only
+UPLOAD_BODY = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary"}}}}}}}
+
+
+def declared_filename(request: Request) -> str:
+    """
+    The upload's filename as declared before the body: the X-Filename header or
+    the `filename` query parameter. Only admission uses it (for the format's
+    share); the pipeline goes by the filename in the multipart body.
+    """
+    return request.headers.get("x-filename") or request.query_params.get("filename") or ""
+
+
+async def read_upload(request: Request) -> tuple:
+    """Parse the multipart body and return the (filename, bytes) of its `file` part; 422 without one."""
+    form = await request.form()
+    try:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=422, detail="Expected a multipart form with a 'file' field")
+        return file.filename, await file.read()
+    finally:
+        await form.close()
+
+
+async def admit_upload(filename: str, budget: Optional[float]) -> tuple:
+    """
+    Wait for an admission slot for this upload (mcp/admission.py). Only its
+    headers have been read at this point; the multipart body is parsed once a
+    slot is granted (read_upload). Returns (controller, ticket); release the
+    ticket when done. Raises 429 with Retry-After when the service is saturated.
+    """
+    admission = await component("admission")
+    if not admission.enabled:
+        return admission, await admission.acquire("")
+    fmt = format_from_filename(filename)
+    try:
+        return admission, await admission.acquire(fmt, budget)
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def remaining_budget(budget: Optional[float], ticket) -> Optional[float]:
+    """The latency budget left after waiting for admission (the wait counts against it)."""
+    return None if budget is None else max(budget - ticket.waited, 0.001)
+
+
+@app.post("/upload", openapi_extra=UPLOAD_BODY)
+async def upload(request: Request, response: Response):
     """
     1) Read raw bytes
     2) Classify format + intent
-    3) Dispatch to appropriate agent
+    3) Dispatch to appropriate agent (emails: attachments too, concurrently)
     4) Write metadata + extraction to memory
     5) Route the suggested action
     6) Write action outcome to memory
     7) Return combined result
+    The upload's correlation ID (X-Request-ID) comes back in the same header
+    and as `request_id`; /audit/request/{id} returns its events.
+    The body is only read once the upload is admitted; declare the filename
+    in X-Filename (or ?filename=) so it is admitted under its format's share.
+    """
+    budget, priority = request_budget(request), request_priority(request)
+    request_id = request_correlation_id(request)
+    response.headers[correlation.HEADER] = request_id
+    admission, ticket = await admit_upload(declared_filename(request), budget)
+    ok = False
+    try:
+        with metrics.stage_timer("read"):
+            filename, raw_bytes = await read_upload(request)
+        result = await process_upload(raw_bytes, filename, budget=remaining_budget(budget, ticket),
+                                      priority=priority, request_id=request_id)
+        ok = True
+        return result
+    finally:
+        admission.release(ticket, sample=ok)
+
+
+@app.post("/upload/stream", openapi_extra=UPLOAD_BODY)
+async def upload_stream(request: Request):
+    """
+    Same pipeline as /upload, answered as server-sent events while it runs:
+      - accepted:       sent immediately
+      - classified:     format + intent (before extraction starts)
+      - text_extracted: PDF text size and page count
+      - token:          streamed LLM output (PDF extraction, email tone)
+      - partial:        one chunk's extraction of a long PDF
+      - extracted:      extraction + suggested action
+      - routed:         action outcome
+      - done:           the same body /upload returns
+      - error:          {"status", "detail"} instead of an HTTP error code
+    Every event carries `elapsed_ms` since the request was received. The
+    correlation ID is in the X-Request-ID response header and in `accepted`.
+    """
+    started = time.perf_counter()
+    budget, priority = request_budget(request), request_priority(request)
+    request_id = request_correlation_id(request)
+    admission, ticket = await admit_upload(declared_filename(request), budget)
+    try:
+        with metrics.stage_timer("read"):
+            filename, raw_bytes = await read_upload(request)
+    except BaseException:
+        admission.release(ticket, sample=False)
+        raise
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    def sse(event: str, data: Dict[str, Any]) -> str:
+        data = dict(data, elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    # Started before the response so the admission slot is released even if
+    # the client goes away before streaming begins; only its events are lost
+    task = asyncio.create_task(process_upload(raw_bytes, filename, emit, remaining_budget(budget, ticket), priority,
+                                              request_id))
+    task.add_done_callback(
+        lambda t: admission.release(ticket, sample=not t.cancelled() and t.exception() is None))
+
+    async def events():
+        yield sse("accepted", {"filename": filename, "size": len(raw_bytes), "request_id": request_id})
+        while not task.done():
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield sse(*getter.result())
+            else:
+                getter.cancel()
+        while not queue.empty():
+            yield sse(*queue.get_nowait())
+
+        try:
+            yield sse("done", task.result())
+        except HTTPException as e:
+            yield sse("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logging.exception("Streaming upload failed")
+            yield sse("error", {"status": 500, "detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                      correlation.HEADER: request_id})
+
+
+async def process_upload(raw_bytes: bytes, filename: str, emit: Emit = None, budget: float = None,
+                         priority: str = None, request_id: str = None) -> dict:
     """
-    raw_bytes = await file.read()
+    Steps 2-7 of /upload; `emit` reports each step as it completes (see /upload/stream).
+
+    `request_id` (default: a new one) is the upload's correlation ID. It is
+    the agents' source_id, goes out with routed actions as X-Request-ID and
+    tags every MemoryStore event the upload writes.
+
+    Everything runs under a latency budget of `budget` seconds (agents/deadline.py).
+    LLM and router calls time out with it, and stages left without time fall
+    back to rule-based results. The response lists those fields in `degraded`.
+
+    LLM calls queue at `priority` (agents/scheduler.py). Without one, the
+    level follows the file's format and is raised for urgent intents and emails.
+    """
+    if priority is None:
+        level = scheduler.FORMAT_PRIORITY.get(format_from_filename(filename), "normal")
+    else:
+        level = priority
+    request_id = request_id or correlation.new_request_id()
+    with deadline_scope(budget) as scope, scheduler.priority_scope(level, fixed=priority is not None), \
+            correlation.request_scope(request_id):
+        if profiling.session is None:
+            result = await run_pipeline(raw_bytes, filename, emit, request_id)
+        else:
+            result = await profiling.profile_upload(run_pipeline(raw_bytes, filename, emit, request_id))
+    result["degraded"] = list(scope.degraded) if scope else []
+    return result
+
+
+async def run_pipeline(raw_bytes: bytes, filename: str, emit: Emit = None, request_id: str = None) -> dict:
+    notify = emit or (lambda event, data: None)
+    memory = await component("memory")
+    # Ties this upload's metadata, extraction and action events together
+    # (see /audit/request/{id} and mcp/reprocess.py)
+    request_id = request_id or correlation.new_request_id()
 
     # Step 1: Classify
-    metadata = app.state.classifier.process(raw_bytes, file.filename)
-    app.state.memory.write("classifier", "metadata", metadata)
+    metadata = await classify_document(raw_bytes, filename)
+    metadata["source_id"] = request_id
+    fmt, intent = metadata.get("format", ""), metadata.get("intent", "")
+    scheduler.raise_to(scheduler.URGENT_INTENTS.get(intent, "low"))
+    notify("classified", {"metadata": metadata})
+    with metrics.stage_timer("persist_metadata", format=fmt, intent=intent):
+        memory.write("classifier", "metadata", metadata, request_id=request_id)
 
     # Step 2: Dispatch
-    fmt = metadata.get("format", "")
-    if fmt == "Email":
-        result = app.state.email_agent.process(raw_bytes, metadata)
-    elif fmt == "JSON":
-        result = app.state.json_agent.process(raw_bytes, metadata)
-    elif fmt == "PDF":
-        result = app.state.pdf_agent.process(raw_bytes, metadata)
-    else:
+    agent_name = AGENTS.get(fmt, "")
+    try:
+        result = await extract_document(raw_bytes, metadata, emit=emit)
+    except UnsupportedFormat:
+        metrics.UPLOADS.labels(format=fmt, intent=metrics.intent_label(intent), agent="", status="rejected").inc()
         raise HTTPException(status_code=400, detail="Unknown format")
+    notify("extracted", {"extraction": result["data"], "action_suggestion": result["action_suggestion"]})
 
     # Step 3: Persist extraction
-    app.state.memory.write(result["source"], "extraction", result["data"])
+    with metrics.stage_timer("persist_extraction", format=fmt, intent=intent, agent=agent_name):
+        memory.write(result["source"], "extraction", result["data"], request_id=request_id)
 
     # Step 4: Route action
-    action_outcome = await app.state.router.decide_and_execute(result["action_suggestion"])
-    app.state.memory.write("router", "action", action_outcome)
+    with metrics.stage_timer("route", format=fmt, intent=intent, agent=agent_name):
+        router = await component("router")
+        action_outcome = await router.decide_and_execute(result["action_suggestion"])
+    notify("routed", {"action": action_outcome})
+    with metrics.stage_timer("persist_action", format=fmt, intent=intent, agent=agent_name):
+        # What was suggested and for which document, so audit queries and counters can slice by it
+        action_event = dict(action_outcome, action=result["action_suggestion"].get("action"),
+                            format=fmt, intent=intent)
+        memory.write("router", "action", action_event, request_id=request_id)
+    metrics.UPLOADS.labels(format=fmt, intent=metrics.intent_label(intent), agent=agent_name,
+                           status=result.get("status", "success")).inc()
 
     # Step 5: Return to client
     return {
+        "request_id": request_id,
         "metadata": metadata,
         "extraction": result["data"],
         "action": action_outcome
@@ -89,51 +548,195 @@ async def risk_alert(payload: dict):
     # Simulate flagging a compliance/fraud risk
     return {"status": "escalate", "detail": {"message": "Risk alert logged."}}
 
+# Bulk variants used by ActionRouter's batching mode: one result per item, in order
+@app.post("/crm/batch")
+async def crm_escalation_batch(payload: dict):
+    items = payload.get("items", [])
+    return {"results": [await crm_escalation(item) for item in items]}
+
+@app.post("/risk_alert/batch")
+async def risk_alert_batch(payload: dict):
+    items = payload.get("items", [])
+    return {"results": [await risk_alert(item) for item in items]}
+
+async def read_actions(since: Optional[str], until: Optional[str], action: Optional[str] = None) -> list:
+    """
+    Action events between `since` and `until` (ISO timestamps, UTC, both
+    optional), from Redis and the cold archive (or SQLite). `action` keeps
+    only events of that action type.
+    """
+    memory = await component("memory")
+    try:
+        if action is not None:
+            return await asyncio.to_thread(memory.read_by_action, action, since, until)
+        return await asyncio.to_thread(memory.read_by_key, "action", since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {e}")
+
 @app.get("/audit")
-async def audit():
+async def audit(since: Optional[str] = None, until: Optional[str] = None):
     """
     Retrieve all events from the MemoryStore where key is 'action'.
     """
-    actions = app.state.memory.read_by_key("action")
+    actions = await read_actions(since, until)
     return {"actions": actions}
 
+@app.get("/audit/request/{request_id}")
+async def audit_request(request_id: str, resolve: bool = False):
+    """
+    Every event one upload wrote (metadata, extraction, action, plus any
+    reprocessing), oldest first, looked up by its correlation ID. With
+    `resolve`, blob references are replaced by their payloads.
+    """
+    memory = await component("memory")
+    events = await asyncio.to_thread(memory.read_by_request, request_id)
+    if not events:
+        raise HTTPException(status_code=404, detail="No events for this request id")
+    if resolve:
+        events = await asyncio.to_thread(memory.resolve, events)
+    return {"request_id": request_id, "events": events}
+
+@app.get("/audit/stats")
+async def audit_stats(granularity: str = "hour", since: Optional[str] = None, until: Optional[str] = None,
+                      action: Optional[str] = None, target: Optional[str] = None, status: Optional[str] = None,
+                      format: Optional[str] = None, intent: Optional[str] = None, group_by: Optional[str] = None):
+    """
+    Action counts from the counters MemoryStore maintains on write: totals,
+    breakdowns per action/target/status/format/intent and a minute, hour or
+    day time series. Raw events are never read.
+    """
+    memory = await component("memory")
+    filters = {"action": action, "target": target, "status": status, "format": format, "intent": intent}
+    try:
+        return await asyncio.to_thread(memory.read_stats, granularity, since, until, filters, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/audit/blob/{digest}")
+async def audit_blob(digest: str):
+    """
+    Retrieve a large payload that events reference as {"$blob": digest, ...}.
+    """
+    memory = await component("memory")
+    try:
+        payload = await asyncio.to_thread(memory.read_blob, digest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return {"digest": digest, "payload": payload}
+
 @app.get("/audit/store")
-async def audit_store():
+async def audit_store(since: Optional[str] = None, until: Optional[str] = None):
     """
     Retrieve events where the action type is 'store'.
     """
-    actions = app.state.memory.read_by_key("action")
-    store_actions = [event for event in actions if event["value"].get("action") == "store"]
+    store_actions = await read_actions(since, until, action="store")
     return {"store_actions": store_actions}
 
 @app.get("/audit/alert")
-async def audit_alert():
+async def audit_alert(since: Optional[str] = None, until: Optional[str] = None):
     """
     Retrieve events where the action type is 'alert'.
     """
-    actions = app.state.memory.read_by_key("action")
-    alert_actions = [event for event in actions if event["value"].get("action") == "alert"]
+    alert_actions = await read_actions(since, until, action="alert")
     return {"alert_actions": alert_actions}
 
 @app.get("/audit/escalate")
-async def audit_escalate():
+async def audit_escalate(since: Optional[str] = None, until: Optional[str] = None):
     """
     Retrieve events where the action type is 'escalate'.
     """
-    actions = app.state.memory.read_by_key("action")
-    escalate_actions = [event for event in actions if event["value"].get("action") == "escalate"]
+    escalate_actions = await read_actions(since, until, action="escalate")
     return {"escalate_actions": escalate_actions}
 
 @app.get("/audit/log")
-async def audit_log():
+async def audit_log(since: Optional[str] = None, until: Optional[str] = None):
     """
     Retrieve events where the action type is 'log'.
     """
-    actions = app.state.memory.read_by_key("action")
-    log_actions = [event for event in actions if event["value"].get("action") == "log"]
+    log_actions = await read_actions(since, until, action="log")
     return {"log_actions": log_actions}
 
 
+def require_debug_token(request: Request) -> None:
+    """
+    /debug endpoints exist only when CONDUIT_DEBUG_TOKEN is set (404 otherwise)
+    and need it in the X-Debug-Token header (403 otherwise).
+    """
+    token = os.getenv("CONDUIT_DEBUG_TOKEN", "")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("x-debug-token", "").encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid X-Debug-Token")
+
+
+def profile_session() -> profiling.ProfileSession:
+    if profiling.last is None:
+        raise HTTPException(status_code=404, detail="No profiling session has been started")
+    return profiling.last
+
+
+@app.post("/debug/profile")
+async def start_profile(request: Request, payload: Optional[dict] = None):
+    """
+    Profile the agents' work for the next uploads (mcp/profiling.py). Body,
+    all optional: {"requests": 10, "mode": "sample"|"cprofile", "format": "PDF",
+    "intent": "Invoice", "duration": 60, "interval_ms": 5, "memory": false, "top": 30}
+    """
+    require_debug_token(request)
+    options = {k: v for k, v in (payload or {}).items()
+               if k in ("requests", "mode", "format", "intent", "duration", "interval_ms", "memory", "top")}
+    try:
+        session = profiling.start(**options)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.report()
+
+
+@app.get("/debug/profile")
+async def profile_report(request: Request, sort: str = "self"):
+    """Progress and results of the latest session: hot functions (sort: self, cumulative, calls) and allocations."""
+    require_debug_token(request)
+    try:
+        return profile_session().report(sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.delete("/debug/profile")
+async def stop_profile(request: Request):
+    """End the running session now, keeping what it collected."""
+    require_debug_token(request)
+    profile_session()
+    return profiling.stop().report()
+
+
+@app.get("/debug/profile/collapsed")
+async def profile_collapsed(request: Request):
+    """Collapsed stacks of a "sample" session, for flamegraph.pl or speedscope."""
+    require_debug_token(request)
+    session = profile_session()
+    if session.mode != "sample":
+        raise HTTPException(status_code=409, detail="Collapsed stacks need a session in sample mode")
+    return Response(session.collapsed(), media_type="text/plain")
+
+
+@app.get("/debug/profile/pstats")
+async def profile_pstats(request: Request, sort: str = "tottime"):
+    """pstats listing of a "cprofile" session (sort: any pstats key, e.g. tottime, cumulative, ncalls)."""
+    require_debug_token(request)
+    session = profile_session()
+    if session.mode != "cprofile":
+        raise HTTPException(status_code=409, detail="pstats output needs a session in cprofile mode")
+    try:
+        return Response(session.pstats_text(sort), media_type="text/plain")
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key {e}")
+
+
 # === Run Server ===
 
 if __name__ == "__main__":
@@ -0,0 +1,242 @@
+# metrics.py
+
+import os
+import time
+import asyncio
+import logging
+import functools
+from contextlib import contextmanager
+from typing import Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    REGISTRY,
+)
+
+logger = logging.getLogger(__name__)
+
+# Buckets span fast in-process steps (ms) up to slow LLM calls (tens of seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_LATENCY = Histogram(
+    "conduit_stage_duration_seconds",
+    "Time spent in each step of document processing",
+    ["stage", "format", "intent", "agent"],
+    buckets=LATENCY_BUCKETS,
+)
+UPLOADS = Counter(
+    "conduit_uploads_total",
+    "Processed uploads",
+    ["format", "intent", "agent", "status"],
+)
+LLM_LATENCY = Histogram(
+    "conduit_llm_call_duration_seconds",
+    "Latency of LLM chain invocations",
+    ["agent", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "conduit_llm_tokens_total",
+    "Tokens consumed by LLM calls",
+    ["agent", "type"],
+)
+LLM_CALL_TOKENS = Histogram(
+    "conduit_llm_call_tokens",
+    "Prompt and completion tokens of each LLM call",
+    ["agent", "type"],
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+LLM_QUEUE_WAIT = Histogram(
+    "conduit_llm_queue_wait_seconds",
+    "Time LLM calls waited for a slot in the priority scheduler",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "conduit_llm_queue_depth",
+    "LLM calls waiting for a slot in the priority scheduler",
+    ["priority"],
+    multiprocess_mode="livesum",
+)
+DEGRADED = Counter(
+    "conduit_degraded_total",
+    "Fields answered by a rule-based fallback because the request's latency budget ran out",
+    ["field"],
+)
+MEMORY_LATENCY = Histogram(
+    "conduit_memory_op_duration_seconds",
+    "Latency of MemoryStore operations",
+    ["op", "key", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+ROUTER_LATENCY = Histogram(
+    "conduit_router_request_duration_seconds",
+    "Latency of outbound ActionRouter HTTP attempts",
+    ["target", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+ROUTER_ACTIONS = Counter(
+    "conduit_router_actions_total",
+    "Routed actions by final outcome",
+    ["target", "status"],
+)
+ROUTER_BATCH_SIZE = Histogram(
+    "conduit_router_batch_size",
+    "Actions delivered per bulk request, by target",
+    ["target"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+ADMISSION_LIMIT = Gauge(
+    "conduit_admission_limit",
+    "Current limit on uploads processed at once (adapts to stage latency)",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "conduit_admission_queue_depth",
+    "Uploads waiting for an admission slot",
+    ["format"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_WAIT = Histogram(
+    "conduit_admission_wait_seconds",
+    "Time admitted uploads waited for a slot",
+    ["format"],
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "conduit_admission_rejected_total",
+    "Uploads answered 429 by admission control",
+    ["format", "reason"],
+)
+HTTP_LATENCY = Histogram(
+    "conduit_http_request_duration_seconds",
+    "Latency of incoming HTTP requests",
+    ["method", "path", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "conduit_requests_in_flight",
+    "Incoming HTTP requests currently being handled",
+    ["path"],
+    multiprocess_mode="livesum",
+)
+LOOP_LAG = Histogram(
+    "conduit_event_loop_lag_seconds",
+    "Delay between a scheduled event-loop wakeup and when it actually ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_LAG_LAST = Gauge(
+    "conduit_event_loop_lag_last_seconds",
+    "Most recent event-loop lag sample",
+    multiprocess_mode="max",
+)
+
+
+def intent_label(intent: str) -> str:
+    """
+    `intent` as a label value: one of the classifier's intents, else "other".
+    Intents come from LLM output, so unmapped they would add label values
+    without bound.
+    """
+    if not intent:
+        return ""
+    return _known_intents().get(str(intent).strip().casefold(), "other")
+
+
+@functools.lru_cache(maxsize=1)
+def _known_intents() -> Dict[str, str]:
+    # Imported here: agents.classifier itself imports this module
+    from agents.classifier import INTENTS
+    return {intent.casefold(): intent for intent in INTENTS}
+
+
+class Span(dict):
+    """Label values for a stage timing; callers may fill labels in as they learn them."""
+
+
+@contextmanager
+def stage_timer(stage: str, format: str = "", intent: str = "", agent: str = ""):
+    """
+    Time a block of work and record it in STAGE_LATENCY:
+
+        with stage_timer("classify") as span:
+            metadata = classifier.process(...)
+            span["format"] = metadata["format"]
+    """
+    span = Span(format=format, intent=intent, agent=agent)
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        STAGE_LATENCY.labels(
+            stage=stage,
+            format=span.get("format") or "",
+            intent=intent_label(span.get("intent")),
+            agent=span.get("agent") or "",
+        ).observe(time.perf_counter() - start)
+
+
+class InstrumentedMemory:
+    """
+    Transparent proxy around a MemoryStore that records the latency of every
+    public method call in MEMORY_LATENCY, labeled by method and event key.
+    """
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._store, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            if name == "write":
+                key = kwargs.get("key", args[1] if len(args) > 1 else "")
+            elif name == "read_by_key":
+                key = kwargs.get("key", args[0] if args else "")
+            elif name == "read_by_action":
+                key = "action"
+            else:
+                key = ""
+            status = "success"
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                MEMORY_LATENCY.labels(op=name, key=key or "", status=status).observe(time.perf_counter() - start)
+
+        return timed
+
+
+async def monitor_event_loop_lag(interval: float = 0.25) -> None:
+    """Background task: measure how late the event loop wakes us up."""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - expected)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+def render_latest() -> tuple:
+    """
+    Return (body, content_type) for the /metrics endpoint. When running under
+    several uvicorn workers with PROMETHEUS_MULTIPROC_DIR set, aggregate the
+    per-process metric files instead of the local registry.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,365 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sample", "cprofile")
+MAX_REQUESTS = 1000
+MAX_DURATION = 3600.0
+MAX_STACK_DEPTH = 128
+TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", 10))
+
+# The active session; None whenever nothing is being profiled, which is all
+# the upload path checks (see profile_upload and traced)
+session: Optional["ProfileSession"] = None
+# The most recent session, running or finished, for GET /debug/profile
+last: Optional["ProfileSession"] = None
+_start_lock = threading.Lock()
+
+
+class ProfiledRequest:
+    """What one profiled upload collected, merged into its session once its format and intent are known."""
+
+    def __init__(self, session: "ProfileSession"):
+        self.session = session
+        self.stats: Optional[pstats.Stats] = None
+        self.samples: Counter = Counter()
+        self.allocations: Dict[str, Counter] = {}
+        self.lock = threading.Lock()
+
+    def add_profile(self, profile: cProfile.Profile) -> None:
+        stats = pstats.Stats(profile)
+        with self.lock:
+            if self.stats is None:
+                self.stats = stats
+            else:
+                self.stats.add(stats)
+
+    def add_allocations(self, agent: str, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> None:
+        ignore = [tracemalloc.Filter(False, module.__file__) for module in (tracemalloc, cProfile, pstats)]
+        ignore.append(tracemalloc.Filter(False, __file__))
+        diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+        with self.lock:
+            counter = self.allocations.setdefault(agent, Counter())
+            for stat in diff:
+                if stat.size_diff > 0:
+                    frame = stat.traceback[0]
+                    counter[f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+
+
+_request: ContextVar[Optional[ProfiledRequest]] = ContextVar("conduit_profiled_request", default=None)
+
+
+class ProfileSession:
+    """
+    Profiling of the next `requests` uploads, for at most `duration` seconds:
+    - mode "sample": a background thread samples the stacks of threads running
+      an agent's process() for a profiled upload every `interval_ms`; results
+      are hot functions by sample count and collapsed stacks for flamegraphs
+    - mode "cprofile": each of those calls runs under its own cProfile
+      profiler (deterministic, with call counts, but several times slower)
+    - with `memory`, tracemalloc is on for the session and each process() call
+      records the allocations still alive when it returns, by source line
+    - `format` / `intent` keep only matching uploads; the others don't count
+
+    Only the agents' process() calls are covered: parsing in the parse pool
+    runs in other processes, and the event loop is shared by every request.
+    """
+
+    def __init__(self, requests: int = 10, mode: str = "sample", format: str = None, intent: str = None,
+                 duration: float = 60.0, interval_ms: float = 5.0, memory: bool = False, top: int = 30):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}; choose from {', '.join(MODES)}")
+        if not 1 <= int(requests) <= MAX_REQUESTS:
+            raise ValueError(f"requests must be between 1 and {MAX_REQUESTS}")
+        if not 0 < float(duration) <= MAX_DURATION:
+            raise ValueError(f"duration must be between 0 and {MAX_DURATION:.0f} seconds")
+        if float(interval_ms) < 1:
+            raise ValueError("interval_ms must be at least 1")
+        self.mode = mode
+        self.target = int(requests)
+        self.format = format.lower() if format else None
+        self.intent = intent.lower() if intent else None
+        self.duration = float(duration)
+        self.interval = float(interval_ms) / 1000.0
+        self.memory = bool(memory)
+        self.top = max(1, int(top))
+
+        self.started = time.time()
+        self.expires_at = time.monotonic() + self.duration
+        self.finished: Optional[float] = None
+        self.reason: Optional[str] = None
+        self.in_progress = 0
+        self.profiled = 0
+        self.skipped = 0
+        self.stats: Optional[pstats.Stats] = None
+        self.samples: Counter = Counter()
+        self.allocations: Dict[str, Counter] = {}
+        self.threads: Dict[int, ProfiledRequest] = {}  # thread id -> upload it's working for
+        self._lock = threading.Lock()
+        self._owns_tracemalloc = False
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self.reason is None
+
+    def start(self) -> None:
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._owns_tracemalloc = True
+        if self.mode == "sample":
+            self._sampler = threading.Thread(target=self._sample_loop, name="conduit-profiler", daemon=True)
+            self._sampler.start()
+        logger.info(f"Profiling the next {self.target} uploads ({self.mode}, format={self.format}, "
+                    f"intent={self.intent}, memory={self.memory}) for at most {self.duration:.0f}s")
+
+    def stop(self, reason: str) -> None:
+        global session
+        with self._lock:
+            if not self.running:
+                return
+            self.reason = reason
+            self.finished = time.time()
+            self.threads.clear()
+        if session is self:
+            session = None
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        logger.info(f"Profiling session ended ({reason}): {self.profiled} uploads profiled, {self.skipped} skipped")
+
+    def expired(self) -> bool:
+        if self.running and time.monotonic() >= self.expires_at:
+            self.stop("expired")
+        return not self.running
+
+    def claim(self) -> Optional[ProfiledRequest]:
+        """Profile this upload, unless enough are already profiled or in progress."""
+        if self.expired():
+            return None
+        with self._lock:
+            if not self.running or self.profiled + self.in_progress >= self.target:
+                return None
+            self.in_progress += 1
+        return ProfiledRequest(self)
+
+    def complete(self, request: ProfiledRequest, metadata: Optional[dict]) -> None:
+        """Merge an upload's profile if it matches the filters (failed uploads only match a session without any)."""
+        metadata = metadata or {}
+        matches = ((self.format is None or str(metadata.get("format", "")).lower() == self.format)
+                   and (self.intent is None or str(metadata.get("intent", "")).lower() == self.intent))
+        with self._lock:
+            self.in_progress -= 1
+            if not self.running:
+                return
+            if not matches:
+                self.skipped += 1
+                return
+            self.profiled += 1
+            if request.stats is not None:
+                if self.stats is None:
+                    self.stats = request.stats
+                else:
+                    self.stats.add(request.stats)
+            self.samples.update(request.samples)
+            for agent, counter in request.allocations.items():
+                self.allocations.setdefault(agent, Counter()).update(counter)
+            done = self.profiled >= self.target
+        if done:
+            self.stop("complete")
+
+    def call(self, request: ProfiledRequest, agent: str, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        """Run an agent call for a profiled upload (in its worker thread)."""
+        if not self.running:
+            return fn(*args, **kwargs)
+        before = tracemalloc.take_snapshot() if self.memory and tracemalloc.is_tracing() else None
+        profile = None
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:  # another profiler is active in this thread
+                logger.warning(f"cProfile unavailable for {agent}: {e}")
+                profile = None
+        thread = threading.get_ident()
+        with self._lock:
+            self.threads[thread] = request
+        try:
+            return _profiled_call(fn, args, kwargs)
+        finally:
+            with self._lock:
+                self.threads.pop(thread, None)
+            if profile is not None:
+                profile.disable()
+            after = tracemalloc.take_snapshot() if before is not None and tracemalloc.is_tracing() else None
+            if profile is not None:
+                request.add_profile(profile)
+            if after is not None:
+                request.add_allocations(agent, before, after)
+
+    def _sample_loop(self) -> None:
+        while not self.expired():
+            time.sleep(self.interval)
+            with self._lock:
+                threads = dict(self.threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for thread, request in threads.items():
+                frame = frames.get(thread)
+                stack = _stack(frame) if frame is not None else None
+                if stack:
+                    with request.lock:
+                        request.samples[stack] += 1
+
+    def hot_functions(self, sort: str = "self") -> List[dict]:
+        """The `top` functions by self time (or cumulative time, or calls)."""
+        key = {"self": "self_s", "cumulative": "cumulative_s", "calls": "calls"}.get(sort)
+        if key is None:
+            raise ValueError(f"Unknown sort {sort!r}; choose from self, cumulative, calls")
+        if self.mode == "cprofile":
+            rows = []
+            for (filename, line, name), (_, calls, self_time, cumulative, _) in (self.stats.stats.items()
+                                                                                 if self.stats else ()):
+                rows.append({"function": _label(filename, line, name), "calls": calls,
+                             "self_s": round(self_time, 6), "cumulative_s": round(cumulative, 6)})
+        else:
+            if key == "calls":
+                raise ValueError("Sampling doesn't count calls; sort by self or cumulative")
+            own, total = Counter(), Counter()
+            for stack, count in self.samples.items():
+                own[stack[-1]] += count
+                for frame in set(stack):
+                    total[frame] += count
+            rows = [{"function": frame, "samples": total[frame],
+                     "self_s": round(own[frame] * self.interval, 6),
+                     "cumulative_s": round(total[frame] * self.interval, 6)} for frame in total]
+        return sorted(rows, key=lambda r: r[key], reverse=True)[:self.top]
+
+    def collapsed(self) -> str:
+        """Collapsed stacks ("root;...;leaf count" per line), for flamegraph.pl or speedscope."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common())
+
+    def pstats_text(self, sort: str = "tottime") -> str:
+        if self.stats is None:
+            return ""
+        stream = io.StringIO()
+        with self._lock:
+            self.stats.stream = stream
+            self.stats.sort_stats(sort).print_stats(self.top)
+        return stream.getvalue()
+
+    def report(self, sort: str = "self") -> dict:
+        self.expired()
+        elapsed = (self.finished or time.time()) - self.started
+        report = {
+            "status": "running" if self.running else "done",
+            "reason": self.reason,
+            "mode": self.mode,
+            "filters": {"format": self.format, "intent": self.intent},
+            "requests": {"target": self.target, "profiled": self.profiled,
+                         "in_progress": self.in_progress, "skipped": self.skipped},
+            "elapsed_s": round(elapsed, 3),
+            "duration_s": self.duration,
+            "hot_functions": self.hot_functions(sort),
+        }
+        if self.mode == "sample":
+            report["interval_ms"] = self.interval * 1000
+            report["samples"] = sum(self.samples.values())
+        if self.memory:
+            report["allocations"] = {
+                agent: [{"where": where, "kb": round(size / 1024, 1)} for where, size in counter.most_common(self.top)]
+                for agent, counter in self.allocations.items()
+            }
+        return report
+
+
+def _profiled_call(fn: Callable, args: tuple, kwargs: dict) -> Any:
+    # Sampled stacks are cut at this frame, so they start at the agent's method
+    return fn(*args, **kwargs)
+
+
+def _label(filename: str, line: int, name: str) -> str:
+    if filename == "~":  # built-in
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _stack(frame) -> Optional[Tuple[str, ...]]:
+    """Root-first "file:function" names up to the agent call; None if the thread moved on meanwhile."""
+    stack = []
+    while frame is not None and frame.f_code is not _profiled_call.__code__:
+        if len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+        frame = frame.f_back
+    return tuple(reversed(stack)) if frame is not None else None
+
+
+def start(**options) -> ProfileSession:
+    """Start a session (see ProfileSession); ValueError for bad options, RuntimeError if one is running."""
+    global session, last
+    with _start_lock:
+        if session is not None and not session.expired():
+            raise RuntimeError("A profiling session is already running")
+        new = ProfileSession(**options)
+        new.start()
+        session = last = new
+    return new
+
+
+def stop() -> Optional[ProfileSession]:
+    """End the running session early, keeping what it collected."""
+    if session is not None:
+        session.stop("stopped")
+    return last
+
+
+async def profile_upload(pipeline) -> dict:
+    """
+    Await the upload's pipeline coroutine, profiled if the running session
+    still wants uploads. Only called while a session is running.
+    """
+    active = session
+    request = active.claim() if active is not None else None
+    if request is None:
+        return await pipeline
+    token = _request.set(request)
+    metadata = None
+    try:
+        result = await pipeline
+        metadata = result.get("metadata")
+        return result
+    finally:
+        _request.reset(token)
+        active.complete(request, metadata)
+
+
+def traced(fn: Callable, agent: str) -> Callable:
+    """
+    `fn`, profiled when it runs for an upload being profiled; `fn` itself
+    otherwise. Wrap the callable before handing it to asyncio.to_thread,
+    which carries the upload's context into the worker thread.
+    """
+    if session is None:
+        return fn
+    request = _request.get()
+    if request is None:
+        return fn
+
+    @wraps(fn)
+    def call(*args, **kwargs):
+        return request.session.call(request, agent, fn, args, kwargs)
+
+    return call
@@ -0,0 +1,78 @@
+# registry.py
+
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Union
+
+logger = logging.getLogger(__name__)
+
+Factory = Union[str, Callable[[], Any]]
+
+
+class AgentRegistry:
+    """
+    Builds components (agents, memory, router) the first time they are asked
+    for, so importing and starting the app stays cheap.
+
+    A factory is either a callable returning the instance, or an import path
+    "package.module:ClassName" that is imported and called with no arguments.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Factory] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.build_seconds: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Factory) -> None:
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self._factories:
+            raise KeyError(f"No component registered as '{name}'")
+
+        # One lock per component: building the PDF agent doesn't block the classifier
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = self._build(self._factories[name])
+                self.build_seconds[name] = time.perf_counter() - start
+                self._instances[name] = instance
+                logger.info(f"Built '{name}' in {self.build_seconds[name] * 1000:.1f}ms")
+        return instance
+
+    def _build(self, factory: Factory) -> Any:
+        if isinstance(factory, str):
+            module_name, _, attr = factory.partition(":")
+            factory = getattr(importlib.import_module(module_name), attr)
+        return factory()
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def loaded(self) -> Dict[str, Any]:
+        return dict(self._instances)
+
+    def names(self) -> List[str]:
+        return list(self._factories)
+
+    def warm_up(self, names: Iterable[str]) -> None:
+        """
+        Build the given components now and let them preload their own lazy
+        parts (prompt templates, LLM clients) via an optional warm_up() method.
+        Failures are logged, not raised, so a missing API key never blocks startup.
+        """
+        for name in names:
+            try:
+                instance = self.get(name)
+                if hasattr(instance, "warm_up"):
+                    instance.warm_up()
+            except Exception as e:
+                logger.warning(f"Warm-up of '{name}' failed: {e}")
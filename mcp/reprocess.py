@@ -0,0 +1,413 @@
+"""
+Re-evaluate stored uploads under the current decision rules.
+
+Reads the metadata, extraction and action events of past uploads from
+MemoryStore and re-runs only the deterministic decision stages
+(PDFAgent._determine_action, JSONAgent's validation and anomaly rules,
+EmailAgent's urgency/escalation rules and, with --reclassify, the
+classifier's keyword rules) in a process pool. No LLM is called: the stored
+extraction (including the LLM's tone or fields) is taken as given.
+
+Uploads whose suggested action changes are written to a JSONL diff; with
+--reroute the new action is also sent through ActionRouter and recorded.
+
+Usage (from the repository root):
+    python -m mcp.reprocess --since 2026-01-01 --diff reprocess-diff.jsonl
+    python -m mcp.reprocess --reroute --workers 8
+    python -m mcp.reprocess --restart          # ignore the saved checkpoint
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from memory.blobs import is_blob_ref
+
+logger = logging.getLogger(__name__)
+
+# (timestamp, ordinal among events with that timestamp): a resumable scan position
+Position = Tuple[str, int]
+
+STATS = ("events", "uploads", "changed", "unchanged", "unlinked", "incomplete", "errors", "rerouted")
+# Counted while scanning, ahead of the batches being completed
+SCAN_STATS = ("events", "unlinked", "incomplete")
+
+# Sources of the events one upload writes (see run_pipeline in mcp/main.py)
+EXTRACTION_SOURCES = {"email_agent", "json_agent", "pdf_agent"}
+
+
+# === Decision stages (run in the worker processes) ===
+
+_agents: Optional[Dict[str, Any]] = None
+
+
+def _load_agents() -> Dict[str, Any]:
+    """Agents are built once per worker; none of them creates its LLM until asked to."""
+    global _agents
+    if _agents is None:
+        from agents.classifier import ClassifierAgent
+        from agents.email_agent import EmailAgent
+        from agents.json_agent import JSONAgent
+        from agents.pdf_agent import PDFAgent
+        _agents = {"classifier": ClassifierAgent(), "Email": EmailAgent(), "JSON": JSONAgent(), "PDF": PDFAgent()}
+    return _agents
+
+
+def decide(fmt: str, intent: str, extraction: Any, reclassify: bool = False) -> Dict[str, Any]:
+    """
+    The intent and action the current rules give a stored extraction:
+        {"intent": ..., "action_suggestion": {"action", "target", ...}}
+    Raises ValueError for formats without decision rules.
+    """
+    agents = _load_agents()
+    if reclassify:
+        intent = _reclassify(agents["classifier"], fmt, intent, extraction)
+
+    if fmt == "PDF":
+        return {"intent": intent, "action_suggestion": agents["PDF"]._determine_action(extraction, intent.lower())}
+    if fmt == "JSON":
+        return {"intent": intent, "action_suggestion": agents["JSON"].process(extraction, {"intent": intent})["action_suggestion"]}
+    if fmt != "Email":
+        raise ValueError(f"No decision rules for format {fmt!r}")
+
+    email = agents["Email"]
+    subject, summary = extraction.get("subject", ""), extraction.get("body_summary", "")
+    urgency = email._get_urgency(subject, summary)
+    # Only the first 200 characters of the body are stored: an email found
+    # urgent further down stays urgent
+    if extraction.get("urgency") == "high" and len(summary) >= 200:
+        urgency = "high"
+    result = {"data": extraction, "action_suggestion": email._determine_action(urgency, extraction.get("tone"))}
+    children = [_redecide_attachment(child, reclassify) for child in extraction.get("attachments") or []]
+    return {"intent": intent, "action_suggestion": email.aggregate(result, children)["action_suggestion"]}
+
+
+def _redecide_attachment(child: Dict[str, Any], reclassify: bool) -> Dict[str, Any]:
+    if child.get("error") or "data" not in child:
+        return child
+    try:
+        decision = decide(child.get("format"), child.get("intent") or "", child["data"], reclassify)
+    except ValueError:
+        return child
+    return dict(child, intent=decision["intent"], action_suggestion=decision["action_suggestion"])
+
+
+def _reclassify(classifier, fmt: str, intent: str, extraction: Any) -> str:
+    """Apply the classifier's keyword rules to whatever text the extraction kept."""
+    if fmt == "Email":
+        text = f"{extraction.get('subject', '')}\n{extraction.get('body_summary', '')}"
+    elif fmt == "JSON":
+        text = json.dumps(extraction)
+    else:
+        text = extraction.get("text_snippet", "") if isinstance(extraction, dict) else ""
+    if not text:
+        return intent
+    snippet = text[:classifier.max_snippet_chars]
+    return classifier.keyword_intent(classifier._score_intents(snippet, fmt), fmt) or intent
+
+
+def decide_batch(records: List[Dict[str, Any]], reclassify: bool) -> List[Dict[str, Any]]:
+    decisions = []
+    for record in records:
+        try:
+            decisions.append(decide(record["format"], record["intent"], record["extraction"], reclassify))
+        except Exception as e:
+            decisions.append({"error": f"{type(e).__name__}: {e}"})
+    return decisions
+
+
+# === Job ===
+
+class WorkerPoolFailed(RuntimeError):
+    """The process pool died (e.g. a worker was killed); carries the run's stats so far."""
+
+    def __init__(self, message: str, stats: Dict[str, int]):
+        super().__init__(message)
+        self.stats = stats
+
+
+class Reprocessor:
+    """
+    Streams events from MemoryStore.scan(), joins each upload's metadata,
+    extraction and action events by request_id and sends the uploads to a
+    process pool in batches of `batch_size`. Results are handled in scan order:
+      - an upload whose action (or, with reclassify, intent) changes is
+        appended to the JSONL diff at `diff_path`
+      - with reroute, the new action goes through ActionRouter and is recorded
+        as an "action" event from source "reprocessor"
+
+    Memory stays bounded: at most 2 batches per worker are in flight, and an
+    upload whose action event hasn't shown up `join_window` seconds after
+    its first event is dropped as incomplete (e.g. the upload failed).
+    Events written without a request_id (before they were recorded) can't be
+    joined reliably and are only counted as unlinked.
+
+    After every batch the checkpoint at `checkpoint_path` records the scan
+    position to resume from, the last upload written and the diff's size, so
+    an interrupted run picks up where it stopped. If the process pool dies,
+    the run stops with WorkerPoolFailed, the checkpoint left at the last
+    completed batch.
+    """
+
+    def __init__(self, memory, diff_path: str, checkpoint_path: str, workers: int = None,
+                 batch_size: int = 500, join_window: float = 600.0, reclassify: bool = False,
+                 reroute: bool = False, router=None):
+        self.memory = memory
+        self.diff_path = diff_path
+        self.checkpoint_path = checkpoint_path
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+        self.join_window = timedelta(seconds=join_window)
+        self.reclassify = reclassify
+        self.reroute = reroute
+        self.router = router
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def run(self, since: str = None, until: str = None, restart: bool = False) -> Dict[str, int]:
+        checkpoint = None if restart else self._load_checkpoint()
+        if checkpoint is not None:
+            if (since or checkpoint["since"]) != checkpoint["since"] or (until or checkpoint["until"]) != checkpoint["until"]:
+                raise ValueError("The checkpoint is for another time range; pass --restart to start over")
+            since, until = checkpoint["since"], checkpoint["until"]
+            if checkpoint["done"]:
+                logger.info(f"Reprocessing of {since or 'the beginning'} .. {until} already completed")
+                return checkpoint["stats"]
+        until = until or datetime.utcnow().isoformat()  # never pick up events written by this run
+        self.since, self.until = since, until
+
+        stats = dict(checkpoint["stats"]) if checkpoint else {name: 0 for name in STATS}
+        resume_from = tuple(checkpoint["resume_from"]) if checkpoint else None
+        emitted_through = tuple(checkpoint["emitted_through"]) if checkpoint and checkpoint["emitted_through"] else None
+        self._checkpointed = (dict(stats), resume_from, emitted_through)
+
+        with open(self.diff_path, "ab") as f:
+            f.truncate(checkpoint["diff_offset"] if checkpoint else 0)
+        pool = None
+        if self.workers > 0:
+            # spawn: the store may be running threads (e.g. the SQLite writer)
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_load_agents,
+                                       mp_context=multiprocessing.get_context("spawn"))
+        if self.reroute:
+            self._loop = asyncio.new_event_loop()
+            if self.router is None:
+                from mcp.router import ActionRouter
+                self.router = ActionRouter()
+        try:
+            with open(self.diff_path, "a", encoding="utf-8") as diff:
+                self._run(pool, diff, stats, resume_from, emitted_through)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if self._loop is not None:
+                self._loop.run_until_complete(self.router.shutdown())
+                self._loop.close()
+        return stats
+
+    def _run(self, pool: Optional[ProcessPoolExecutor], diff, stats: Dict[str, int],
+             resume_from: Optional[Position], emitted_through: Optional[Position]) -> None:
+        start = resume_from[0] if resume_from else self.since
+        pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # request_id -> partial upload, oldest first
+        batch: List[Dict[str, Any]] = []
+        inflight: deque = deque()
+        position: Position = ("", 0)
+
+        def seal() -> None:
+            # Where a rerun must start so that every upload not yet written is seen again
+            restart_at = next(iter(pending.values()))["first"] if pending else (position[0], position[1] + 1)
+            marks = {"resume_from": restart_at, "emitted_through": batch[-1]["position"],
+                     "scanned": {name: stats[name] for name in SCAN_STATS}}
+            inputs = [{k: r[k] for k in ("format", "intent", "extraction")} for r in batch]
+            if pool is None:
+                future = Future()
+                future.set_result(decide_batch(inputs, self.reclassify))
+            else:
+                try:
+                    future = pool.submit(decide_batch, inputs, self.reclassify)
+                except BrokenProcessPool as e:
+                    future = Future()
+                    future.set_exception(e)
+            inflight.append((future, list(batch), marks))
+            batch.clear()
+            while len(inflight) > 2 * max(self.workers, 1):
+                self._complete(*inflight.popleft(), diff, stats)
+
+        for event in self.memory.scan(start, self.until):
+            ts = event["timestamp"]
+            position = (ts, position[1] + 1 if ts == position[0] else 1)
+            if resume_from is not None and position < resume_from:
+                continue
+            # Scanned again after a resume, but already counted by the interrupted run
+            counted = emitted_through is not None and position <= emitted_through
+            stats["events"] += not counted
+
+            cutoff = (datetime.fromisoformat(ts) - self.join_window).isoformat()
+            while pending and next(iter(pending.values()))["first"][0] < cutoff:
+                pending.popitem(last=False)
+                stats["incomplete"] += not counted
+
+            request_id = event.get("request_id")
+            if request_id is None:
+                stats["unlinked"] += not counted
+                continue
+            key, source = event["key"], event["source"]
+            if key == "metadata" and source == "classifier":
+                pending[request_id] = {"first": position, "metadata": event["value"]}
+            elif key == "extraction" and source in EXTRACTION_SOURCES and request_id in pending:
+                pending[request_id]["extraction"] = event["value"]
+            elif key == "action" and source == "router" and request_id in pending:
+                upload = pending.pop(request_id)
+                if "extraction" not in upload or (emitted_through is not None and position <= emitted_through):
+                    continue
+                batch.append(self._record(request_id, position, upload, event))
+                if len(batch) >= self.batch_size:
+                    seal()
+
+        stats["incomplete"] += len(pending)
+        pending.clear()
+        if batch:
+            seal()
+        while inflight:
+            self._complete(*inflight.popleft(), diff, stats)
+        self._save_checkpoint(diff, stats, None, None, done=True)
+
+    def _record(self, request_id: str, position: Position, upload: Dict[str, Any], action_event: dict) -> dict:
+        extraction = upload["extraction"]
+        if is_blob_ref(extraction):
+            extraction = self.memory.read_blob(extraction["$blob"])
+        action = action_event["value"]
+        return {
+            "request_id": request_id,
+            "timestamp":  action_event["timestamp"],
+            "position":   position,
+            "format":     upload["metadata"].get("format", ""),
+            "intent":     upload["metadata"].get("intent", ""),
+            "extraction": extraction,
+            "old":        {"action": action.get("action"), "target": action.get("target"),
+                           "status": action.get("status")},
+        }
+
+    def _complete(self, future: Future, batch: List[dict], marks: dict, diff, stats: Dict[str, int]) -> None:
+        try:
+            decisions = future.result()
+        except BrokenProcessPool as e:
+            stats["errors"] += len(batch)
+            # Nothing of this batch is written: a rerun resumes before it
+            self._save_checkpoint(diff, *self._checkpointed)
+            raise WorkerPoolFailed(f"The worker pool died ({e}) with {len(batch)} uploads unevaluated; "
+                                   f"progress is saved in {self.checkpoint_path}, rerun to resume", stats) from e
+        changed = []
+        for record, decision in zip(batch, decisions):
+            stats["uploads"] += 1
+            if "error" in decision:
+                stats["errors"] += 1
+                logger.warning(f"Could not re-evaluate upload {record['request_id']}: {decision['error']}")
+                continue
+            new = decision["action_suggestion"]
+            if (new.get("action"), new.get("target")) == (record["old"]["action"], record["old"]["target"]) \
+                    and decision["intent"] == record["intent"]:
+                stats["unchanged"] += 1
+                continue
+            stats["changed"] += 1
+            changed.append((record, decision))
+
+        outcomes = self._loop.run_until_complete(self._reroute(changed)) if self.reroute and changed else {}
+        for record, decision in changed:
+            entry = {
+                "request_id": record["request_id"],
+                "timestamp":  record["timestamp"],
+                "format":     record["format"],
+                "intent":     {"old": record["intent"], "new": decision["intent"]},
+                "old":        record["old"],
+                "new":        decision["action_suggestion"],
+            }
+            if record["request_id"] in outcomes:
+                entry["rerouted"] = outcomes[record["request_id"]]
+                stats["rerouted"] += 1
+            diff.write(json.dumps(entry, default=str) + "\n")
+        # Scan counters as of the batch's end, so a resumed run doesn't count the rest twice
+        self._save_checkpoint(diff, dict(stats, **marks["scanned"]), marks["resume_from"], marks["emitted_through"])
+
+    async def _reroute(self, changed: List[Tuple[dict, dict]]) -> Dict[str, dict]:
+        outcomes = await asyncio.gather(*(self.router.decide_and_execute(d["action_suggestion"]) for _, d in changed))
+        results = {}
+        for (record, decision), outcome in zip(changed, outcomes):
+            event = dict(outcome, action=decision["action_suggestion"].get("action"), format=record["format"],
+                         intent=decision["intent"], reprocessed=True)
+            self.memory.write("reprocessor", "action", event, request_id=record["request_id"])
+            results[record["request_id"]] = {"status": outcome["status"], "error": outcome["error"]}
+        return results
+
+    # === Checkpoints ===
+
+    def _load_checkpoint(self) -> Optional[dict]:
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save_checkpoint(self, diff, stats: Dict[str, int], resume_from: Optional[Position],
+                         emitted_through: Optional[Position], done: bool = False) -> None:
+        diff.flush()
+        self._checkpointed = (stats, resume_from, emitted_through)
+        checkpoint = {
+            "since":           self.since,
+            "until":           self.until,
+            "resume_from":     resume_from,
+            "emitted_through": emitted_through,
+            "diff_offset":     diff.tell(),
+            "stats":           stats,
+            "done":            done,
+            "updated":         datetime.utcnow().isoformat(),
+        }
+        with open(self.checkpoint_path + ".tmp", "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", default=None, help="first event timestamp (ISO, UTC; default: the beginning)")
+    parser.add_argument("--until", default=None, help="last event timestamp (ISO, UTC; default: now)")
+    parser.add_argument("--diff", default="reprocess-diff.jsonl", help="JSONL file of changed actions")
+    parser.add_argument("--checkpoint", default="reprocess-checkpoint.json", help="progress file")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--workers", type=int, default=None, help="decision processes (default: CPU count, 0 = inline)")
+    parser.add_argument("--batch", type=int, default=500, help="uploads per batch")
+    parser.add_argument("--join-window", type=float, default=600.0,
+                        help="seconds an upload's events may be spread over (default 600)")
+    parser.add_argument("--reclassify", action="store_true", help="also re-apply the classifier's keyword rules")
+    parser.add_argument("--reroute", action="store_true", help="send changed actions through ActionRouter")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    from memory.backend import open_memory_store
+    memory = open_memory_store()
+    try:
+        stats = Reprocessor(memory, args.diff, args.checkpoint, workers=args.workers, batch_size=args.batch,
+                            join_window=args.join_window, reclassify=args.reclassify,
+                            reroute=args.reroute).run(args.since, args.until, restart=args.restart)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    except WorkerPoolFailed as e:
+        print(e, file=sys.stderr)
+        print(json.dumps(e.stats, indent=2))
+        return 1
+    finally:
+        memory.close()
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
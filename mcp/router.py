@@ -1,17 +1,29 @@
 # action_router.py
 
 import os
+import time
 import asyncio
+import contextvars
 from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
 
 import httpx  # lightweight async HTTP client; pip install httpx
 
+from agents import deadline
+from mcp import correlation
+from mcp.metrics import ROUTER_ACTIONS, ROUTER_BATCH_SIZE, ROUTER_LATENCY
+
 class ActionRouter:
     def __init__(self, base_url: str = None):
         """
         base_url: The host where /crm and /risk_alert are served, 
                   e.g., "http://localhost:8000". 
                   Default: read from ENV or fallback to localhost:8000.
+
+        Batching (see ActionBatcher) is configured from the environment:
+          - ROUTER_BATCH_TARGETS:     targets delivered in bulk, e.g. "crm,risk_alert" (default: none)
+          - ROUTER_BATCH_MAX_ITEMS:   actions per bulk request at most (default 100)
+          - ROUTER_BATCH_MAX_WAIT_MS: how long an action waits for others to join it (default 50)
         """
         env_url = os.getenv("BASE_URL", None)
         self.base_url = base_url or env_url or "http://localhost:8000"
@@ -19,6 +31,11 @@ class ActionRouter:
         # An AsyncClient lets us do connection pooling and reuse
         self.client = httpx.AsyncClient(base_url=self.base_url, timeout=10.0)
 
+        self.batch_targets = {t.strip() for t in os.getenv("ROUTER_BATCH_TARGETS", "").split(",") if t.strip()}
+        self.batch_max_items = int(os.getenv("ROUTER_BATCH_MAX_ITEMS", 100))
+        self.batch_max_wait = float(os.getenv("ROUTER_BATCH_MAX_WAIT_MS", 50)) / 1000.0
+        self._batchers: Dict[str, ActionBatcher] = {}
+
     async def decide_and_execute(self, suggestion: dict) -> dict:
         action = suggestion.get("action")
         target = suggestion.get("target")
@@ -28,12 +45,17 @@ class ActionRouter:
             "action": action,
             "timestamp": datetime.utcnow().isoformat()
         }
+        # The upload's correlation ID, also per item of a bulk request (which has no single one)
+        request_id = correlation.current()
+        if request_id is not None:
+            payload["request_id"] = request_id
 
         if target == "crm":
             path = "/crm"
         elif target == "risk_alert":
             path = "/risk_alert"
         elif target == "database":
+            ROUTER_ACTIONS.labels(target="database", status="success").inc()
             return {
                 "status": "success",
                 "target": "database",
@@ -42,6 +64,7 @@ class ActionRouter:
                 "error": None
             }
         else:
+            ROUTER_ACTIONS.labels(target="unknown", status="error").inc()
             return {
                 "status": "error",
                 "target": target,
@@ -50,21 +73,44 @@ class ActionRouter:
                 "error": f"Unknown target: {target}"
             }
 
-        # 4) Make the HTTP call with retry logic
-        result = await self._post_with_retries(path, payload)
+        # 4) Make the HTTP call with retry logic (or join the target's next bulk request)
+        if target in self.batch_targets:
+            result = await self._batcher(target).submit(payload)
+        else:
+            result = await self._post_with_retries(path, payload)
+        ROUTER_ACTIONS.labels(target=result["target"], status=result["status"]).inc()
         return result
 
     async def _post_with_retries(self, path: str, payload: dict, max_retries: int = 2) -> dict:
+        """
+        POST with retries. Attempts are bounded by the request's latency
+        budget (agents/deadline.py): each one times out when the budget does,
+        and no retry starts once it is spent. The action is then marked degraded.
+        The upload's correlation ID goes along as X-Request-ID.
+        """
         last_error = None
         http_status = None
         response_body = None
 
+        target = path.lstrip("/")
+        request_id = correlation.current()
+        headers = {correlation.HEADER: request_id} if request_id is not None else None
+
         for attempt in range(max_retries + 1):
             try:
-                resp = await self.client.post(path, json=payload)
+                budget = deadline.remaining()
+            except deadline.DeadlineExceeded as e:
+                last_error = str(e)
+                deadline.degrade("action")
+                break
+            start = time.perf_counter()
+            try:
+                timeout = self.client.timeout if budget is None else min(10.0, budget)
+                resp = await self.client.post(path, json=payload, headers=headers, timeout=timeout)
                 http_status = resp.status_code
                 resp.raise_for_status()  # raise an exception if 4xx/5xx
                 response_body = resp.json()
+                ROUTER_LATENCY.labels(target=target, status="success").observe(time.perf_counter() - start)
                 return {
                     "status": "success",
                     "target": path.lstrip("/"),
@@ -73,7 +119,14 @@ class ActionRouter:
                     "error": None
                 }
             except Exception as e:
-                last_error = str(e)
+                ROUTER_LATENCY.labels(target=target, status="error").observe(time.perf_counter() - start)
+                last_error = str(e) or type(e).__name__
+                if attempt == max_retries:
+                    break
+                budget = deadline.current()
+                if budget is not None and budget.remaining() < 1 + deadline.MIN_CALL_SECONDS:
+                    deadline.degrade("action")  # no time left to back off and retry
+                    break
                 # Simple backoff before retrying
                 await asyncio.sleep(1)
 
@@ -86,5 +139,140 @@ class ActionRouter:
             "error": last_error
         }
 
+    def _batcher(self, target: str) -> "ActionBatcher":
+        batcher = self._batchers.get(target)
+        if batcher is None:
+            batcher = ActionBatcher(self, target, self.batch_max_items, self.batch_max_wait)
+            self._batchers[target] = batcher
+        return batcher
+
     async def shutdown(self):
+        # Deliver whatever is still buffered before closing the connection pool
+        await asyncio.gather(*(batcher.close() for batcher in self._batchers.values()))
         await self.client.aclose()
+
+
+class ActionBatcher:
+    """
+    Coalesces the actions for one target into bulk requests:
+      - actions are buffered until max_items have arrived or the oldest has
+        waited max_wait seconds
+      - the buffer is sent as one POST /<target>/batch {"items": [...]}, with
+        the router's usual retries
+      - the endpoint answers {"results": [...]} in the same order, and each
+        waiting caller gets its own item's outcome (the whole batch's error if
+        the request failed)
+
+    A bulk request belongs to no single upload, so it runs outside the callers'
+    latency budgets. A caller whose budget runs out stops waiting and gets a
+    degraded error outcome, though its action is still delivered.
+    """
+
+    def __init__(self, router: ActionRouter, target: str, max_items: int, max_wait: float):
+        self.router = router
+        self.target = target
+        self.path = f"/{target}/batch"
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: Set[asyncio.Task] = set()
+
+    async def submit(self, payload: dict) -> dict:
+        try:
+            deadline.remaining()
+        except deadline.DeadlineExceeded as e:
+            deadline.degrade("action")
+            return self._error(str(e))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((payload, future))
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        budget = deadline.current()
+        if budget is None:
+            return await future
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), budget.remaining())
+        except asyncio.TimeoutError:
+            deadline.degrade("action")
+            return self._error("Latency budget ran out waiting for the bulk delivery")
+
+    def _error(self, error: str) -> dict:
+        return {
+            "status": "error",
+            "target": self.target,
+            "http_status": None,
+            "response_body": None,
+            "error": error
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        # A fresh context: the bulk request must not inherit the deadline of
+        # whichever upload happened to trigger the flush
+        task = asyncio.get_running_loop().create_task(self._send(batch), context=contextvars.Context())
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        ROUTER_BATCH_SIZE.labels(target=self.target).observe(len(batch))
+        try:
+            try:
+                result = await self.router._post_with_retries(self.path, {"items": [payload for payload, _ in batch]})
+            except Exception as e:
+                result = {"status": "error", "http_status": None, "response_body": None, "error": str(e)}
+
+            result, results = self._item_results(result, len(batch))
+            for i, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if results is not None:
+                    future.set_result({
+                        "status": "success",
+                        "target": self.target,
+                        "http_status": result["http_status"],
+                        "response_body": results[i],
+                        "error": None
+                    })
+                else:
+                    future.set_result({
+                        "status": "error",
+                        "target": self.target,
+                        "http_status": result["http_status"],
+                        "response_body": result["response_body"],
+                        "error": result["error"]
+                    })
+        finally:
+            # Callers without a deadline wait on their future alone: never leave one unresolved
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(self._error("Bulk delivery failed before this item's outcome was known"))
+
+    @staticmethod
+    def _item_results(result: dict, count: int) -> Tuple[dict, Optional[list]]:
+        """
+        The bulk request's outcome and its per-item results, or (an error
+        outcome, None) unless the body is {"results": [...]} with one per item.
+        """
+        if result["status"] != "success":
+            return result, None
+        body = result.get("response_body")
+        results = body.get("results") if isinstance(body, dict) else None
+        if isinstance(results, list) and len(results) == count:
+            return result, results
+        found = f"{len(results)} results" if isinstance(results, list) else "no results list"
+        return dict(result, status="error", error=f"Bulk response has {found} for {count} items"), None
+
+    async def close(self) -> None:
+        self._flush()
+        await asyncio.gather(*self._sending, return_exceptions=True)
@@ -0,0 +1,316 @@
+import os
+import json
+import gzip
+import uuid
+import shutil
+import hashlib
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # gzip is always available
+    zstandard = None
+
+CODEC_EXTENSIONS = {"zstd": "zst", "gzip": "gz"}
+
+
+class SegmentArchive:
+    """
+    Cold storage for events compacted out of Redis: one segment file per time
+    bucket in a local directory.
+
+    A segment is JSONL compressed in independent blocks (zstd frames or gzip
+    members), so `zstd -dc` / `zcat` still read it as one stream. Next to each
+    segment sits a small JSON offset index:
+      - bucket / label  (the time bucket the events came from)
+      - codec, events
+      - blocks: byte offset + length of every compressed block, with its event
+        count, first/last timestamp and the set of keys and sources it holds
+
+    Readers use the index to skip segments and blocks outside the requested
+    time range, key or source without decompressing them. A second sidecar,
+    <segment>.req, maps each request id in the segment to the blocks holding
+    its events. read_request() finds the segments of a request in an
+    append-only request map: requests/<xx>.tsv files of "<request id> TAB
+    <segment>" lines, sharded by the first two hex digits of the id's sha1,
+    so a lookup reads one shard (about 1/256 of the map), not every segment.
+
+    Blobs referenced by archived events (see memory/blobs.py) are kept as
+    blobs/<xx>/<digest> files.
+    """
+
+    def __init__(self, directory: str = None, codec: str = None, block_events: int = None):
+        self.directory = directory or os.getenv("MEMORY_ARCHIVE_DIR", "archive")
+        codec = codec or os.getenv("MEMORY_ARCHIVE_CODEC") or ("zstd" if zstandard else "gzip")
+        if codec == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed; archiving with gzip")
+            codec = "gzip"
+        if codec not in CODEC_EXTENSIONS:
+            raise ValueError(f"Unknown archive codec: {codec}")
+        self.codec = codec
+        self.block_events = block_events or int(os.getenv("MEMORY_ARCHIVE_BLOCK_EVENTS", 512))
+
+    # === Writing ===
+
+    def write_segment(self, name: str, bucket: int, events: List[dict]) -> str:
+        """
+        Write `events` as segment `name` for the bucket starting at epoch
+        second `bucket`. An existing segment of the same name is replaced,
+        which makes re-running an interrupted compaction safe.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}.jsonl.{CODEC_EXTENSIONS[self.codec]}")
+        blocks = []
+        requests: Dict[str, List[int]] = {}
+        offset = 0
+        with open(path + ".tmp", "wb") as f:
+            for i in range(0, len(events), self.block_events):
+                chunk = events[i:i + self.block_events]
+                for request_id in {e["request_id"] for e in chunk if e.get("request_id")}:
+                    requests.setdefault(request_id, []).append(len(blocks))
+                data = self._compress("".join(json.dumps(e) + "\n" for e in chunk).encode("utf-8"))
+                f.write(data)
+                blocks.append({
+                    "offset":  offset,
+                    "length":  len(data),
+                    "count":   len(chunk),
+                    "first":   min(e["timestamp"] for e in chunk),
+                    "last":    max(e["timestamp"] for e in chunk),
+                    "keys":    sorted({e["key"] for e in chunk}),
+                    "sources": sorted({e["source"] for e in chunk}),
+                })
+                offset += len(data)
+        index = {
+            "name":   name,
+            "bucket": bucket,
+            "file":   os.path.basename(path),
+            "codec":  self.codec,
+            "events": len(events),
+            "blocks": blocks,
+        }
+        with open(path + ".idx.tmp", "w") as f:
+            json.dump(index, f)
+        with open(path + ".req.tmp", "w") as f:
+            json.dump(requests, f)
+        # Segment first, index last: a segment only becomes visible once complete
+        os.replace(path + ".tmp", path)
+        os.replace(path + ".req.tmp", self._requests_path(name))
+        os.replace(path + ".idx.tmp", self._index_path(name))
+        self._map_requests(name, requests)
+        return path
+
+    def _map_requests(self, name: str, request_ids: Iterable[str]) -> None:
+        """Append `request_ids` -> segment `name` to the request map (see read_request)."""
+        if not os.path.isdir(self._request_map_dir()):
+            # First segment since the map was introduced: map every segment so far, this one included
+            self._build_request_map()
+            return
+        shards: Dict[str, List[str]] = {}
+        for request_id in request_ids:
+            shards.setdefault(self._request_shard(request_id), []).append(f"{request_id}\t{name}\n")
+        for shard, lines in shards.items():
+            # One append per shard; a rewritten segment appends duplicates, which readers ignore
+            with open(os.path.join(self._request_map_dir(), f"{shard}.tsv"), "a") as f:
+                f.write("".join(lines))
+
+    def _build_request_map(self) -> None:
+        """Build the missing request map from the segments' .req sidecars."""
+        shards: Dict[str, List[str]] = {}
+        for index in self.segments():
+            try:
+                with open(self._requests_path(index["name"])) as f:
+                    request_ids = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for request_id in request_ids:
+                shards.setdefault(self._request_shard(request_id), []).append(f"{request_id}\t{index['name']}\n")
+        tmp = f"{self._request_map_dir()}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(tmp)
+        for shard, lines in shards.items():
+            with open(os.path.join(tmp, f"{shard}.tsv"), "w") as f:
+                f.write("".join(lines))
+        try:
+            os.rename(tmp, self._request_map_dir())
+        except OSError:  # built meanwhile by another reader or the compactor
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    # === Reading ===
+
+    def segments(self, start: int = None, end: int = None) -> List[dict]:
+        """
+        Indexes of all segments whose bucket starts in [start, end] (epoch
+        seconds, either bound optional), oldest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".idx"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    index = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable archive index {filename}: {e}")
+                continue
+            if start is not None and index["bucket"] < start:
+                continue
+            if end is not None and index["bucket"] > end:
+                continue
+            found.append(index)
+        found.sort(key=lambda idx: (idx["bucket"], idx["name"]))
+        return found
+
+    def read(self, start: str = None, end: str = None, key: str = None, source: str = None,
+             bucket_from: int = None, bucket_to: int = None, skip: Iterable[str] = ()) -> Iterator[dict]:
+        """
+        Yield archived events in chronological order.
+        - start / end: ISO timestamps bounding event["timestamp"] (inclusive)
+        - key / source: only events with this key / source
+        - bucket_from / bucket_to: epoch bounds used to pick segments
+        - skip: segment names the caller already has from hot storage
+        """
+        skip = set(skip)
+        for index in self.segments(bucket_from, bucket_to):
+            if index["name"] in skip:
+                continue
+            yield from self.read_segment(index, start, end, key, source)
+
+    def read_segment(self, index: dict, start: Optional[str] = None, end: Optional[str] = None,
+                     key: Optional[str] = None, source: Optional[str] = None) -> Iterator[dict]:
+        """Yield the events of one segment (see segments()), filtered like read()."""
+        path = os.path.join(self.directory, index["file"])
+        with open(path, "rb") as f:
+            for block in index["blocks"]:
+                if start is not None and block["last"] < start:
+                    continue
+                if end is not None and block["first"] > end:
+                    continue
+                if key is not None and key not in block["keys"]:
+                    continue
+                if source is not None and source not in block["sources"]:
+                    continue
+                for event in self._read_block(f, index, block):
+                    if start is not None and event["timestamp"] < start:
+                        continue
+                    if end is not None and event["timestamp"] > end:
+                        continue
+                    if key is not None and event["key"] != key:
+                        continue
+                    if source is not None and event["source"] != source:
+                        continue
+                    yield event
+
+    def read_request(self, request_id: str, skip: Iterable[str] = ()) -> Iterator[dict]:
+        """
+        Yield the archived events of one request, oldest first. Its segments
+        come from one shard of the request map, and only the blocks their .req
+        sidecars point to are decompressed. Segments written before sidecars
+        existed aren't searched.
+        """
+        if not os.path.isdir(self._request_map_dir()):
+            if not self.segments():
+                return
+            self._build_request_map()
+        skip = set(skip)
+        names = []
+        try:
+            with open(os.path.join(self._request_map_dir(), f"{self._request_shard(request_id)}.tsv")) as f:
+                for line in f:
+                    mapped, _, name = line.rstrip("\n").partition("\t")
+                    if mapped == request_id and name not in names and name not in skip:
+                        names.append(name)
+        except FileNotFoundError:
+            return
+
+        indexes = []
+        for name in names:
+            try:
+                with open(self._index_path(name)) as f:
+                    index = json.load(f)
+                with open(self._requests_path(name)) as f:
+                    block_numbers = json.load(f).get(request_id)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable archive segment {name}: {e}")
+                continue
+            if block_numbers:
+                indexes.append((index, block_numbers))
+        indexes.sort(key=lambda item: (item[0]["bucket"], item[0]["name"]))
+
+        for index, block_numbers in indexes:
+            with open(os.path.join(self.directory, index["file"]), "rb") as f:
+                for number in block_numbers:
+                    for event in self._read_block(f, index, index["blocks"][number]):
+                        if event.get("request_id") == request_id:
+                            yield event
+
+    def _read_block(self, f, index: dict, block: dict) -> List[dict]:
+        f.seek(block["offset"])
+        raw = self._decompress(f.read(block["length"]), index["codec"])
+        return [json.loads(line) for line in raw.decode("utf-8").splitlines()]
+
+    # === Blobs ===
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def has_blob(self, digest: str) -> bool:
+        return os.path.exists(self._blob_path(digest))
+
+    def write_blob(self, digest: str, payload: bytes) -> None:
+        """Keep a compacted event's blob (already compressed) next to the segments."""
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            return  # content-addressed: same digest, same bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(payload)
+        os.replace(path + ".tmp", path)
+
+    def read_blob(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # === Helpers ===
+
+    def _index_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.idx")
+
+    def _requests_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.req")
+
+    def _request_map_dir(self) -> str:
+        return os.path.join(self.directory, "requests")
+
+    @staticmethod
+    def _request_shard(request_id: str) -> str:
+        return hashlib.sha1(request_id.encode("utf-8")).hexdigest()[:2]
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(data: bytes, codec: str) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd archive segments")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def stats(self) -> Dict[str, int]:
+        segments = self.segments()
+        size = 0
+        for index in segments:
+            try:
+                size += os.path.getsize(os.path.join(self.directory, index["file"]))
+            except OSError:
+                pass
+        return {"segments": len(segments), "events": sum(s["events"] for s in segments), "bytes": size}
@@ -0,0 +1,180 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+from memory.blobs import is_blob_ref
+from memory.stats import DEFAULT_POINTS, GRANULARITIES
+
+EPOCH = datetime(1970, 1, 1)
+
+TimeBound = Union[str, datetime, None]
+
+BACKENDS = ("redis", "sqlite")
+
+
+def to_epoch(ts: datetime) -> int:
+    """Seconds since the epoch for a naive UTC datetime."""
+    return int((ts - EPOCH).total_seconds())
+
+
+def from_epoch(epoch: int) -> datetime:
+    return EPOCH + timedelta(seconds=epoch)
+
+
+def parse_bound(value: TimeBound) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Normalize a time-range bound (ISO string or datetime, naive = UTC) to the
+    (ISO string, epoch seconds) pair used to filter events and buckets.
+    Raises ValueError on malformed strings.
+    """
+    if value is None:
+        return None, None
+    ts = datetime.fromisoformat(value) if isinstance(value, str) else value
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.isoformat(), to_epoch(ts)
+
+
+class MemoryBackend(ABC):
+    """
+    What every MemoryStore backend provides: an append-only log of events
+      {"timestamp", "source", "key", "value"}  (+ "request_id" when written with one)
+    read back in chronological order, optionally by key or source and within a
+    time range, plus content-addressed blobs for large values (memory/blobs.py)
+    and the action counters behind /audit/stats.
+
+    Implementations:
+      - MemoryStore (memory/memory.py): Redis, compacted into a local archive
+      - SQLiteMemoryStore (memory/sqlite_store.py): one SQLite file in WAL mode
+
+    open_memory_store() picks one from MEMORY_BACKEND. A backend must implement
+    write(), _read(), read_blob() and _stats(); the rest builds on those.
+    """
+
+    @abstractmethod
+    def write(self, source: str, key: str, value: dict, request_id: str = None):
+        """
+        Store one event: {"source", "key", "value", "timestamp"} plus
+        `request_id` when given, which read_by_request() looks it up by.
+        """
+
+    def read_all(self, start: TimeBound = None, end: TimeBound = None) -> list:
+        """
+        Return all events in chronological order (oldest → newest). start / end
+        (ISO string or datetime, inclusive) optionally limit the time range.
+        """
+        return self._read(start, end)
+
+    def read_by_source(self, source: str, start: TimeBound = None, end: TimeBound = None) -> list:
+        """
+        Return only those events where event["source"] == source.
+        """
+        return self._read(start, end, source=source)
+
+    def read_by_key(self, key: str, start: TimeBound = None, end: TimeBound = None) -> list:
+        """
+        Return only those events where event["key"] == key.
+        """
+        return self._read(start, end, key=key)
+
+    def read_by_action(self, action: str, start: TimeBound = None, end: TimeBound = None) -> list:
+        """
+        Return the "action" events whose value["action"] == action (e.g. "escalate").
+        """
+        return [e for e in self.read_by_key("action", start, end)
+                if isinstance(e.get("value"), dict) and e["value"].get("action") == action]
+
+    def read_by_request(self, request_id: str) -> list:
+        """
+        Return the events written for one upload (its metadata, extraction and
+        action), oldest first. Backends index them by request id; this fallback
+        scans the whole log.
+        """
+        return [e for e in self.scan() if e.get("request_id") == request_id]
+
+    @abstractmethod
+    def _read(self, start: TimeBound, end: TimeBound, key: str = None, source: str = None) -> list:
+        """Events in [start, end], oldest first, optionally only those with this key / source."""
+
+    def scan(self, start: TimeBound = None, end: TimeBound = None) -> Iterator[dict]:
+        """
+        Yield every event in [start, end] in chronological order without
+        holding them all in memory (for jobs over the whole history, e.g.
+        mcp/reprocess.py).
+        """
+        yield from self.read_all(start, end)
+
+    @abstractmethod
+    def read_blob(self, digest: str):
+        """
+        Return the payload stored under `digest`, None if it doesn't exist.
+        Raises ValueError if `digest` isn't a sha256 hex digest.
+        """
+
+    def resolve(self, events: list) -> list:
+        """
+        Return `events` with blob references replaced by their payloads.
+        """
+        resolved = []
+        for e in events:
+            if is_blob_ref(e.get("value")):
+                e = dict(e, value=self.read_blob(e["value"]["$blob"]))
+            resolved.append(e)
+        return resolved
+
+    def read_rollups(self, start: TimeBound = None, end: TimeBound = None) -> Dict[str, Dict[str, int]]:
+        """
+        Rollup counters of compacted buckets, keyed by bucket start (ISO).
+        Backends that keep every event have none.
+        """
+        return {}
+
+    def read_stats(self, granularity: str = "hour", start: TimeBound = None, end: TimeBound = None,
+                   filters: Dict[str, str] = None, group_by: str = None) -> dict:
+        """
+        Action counts (totals, per-dimension breakdowns and a time series).
+        - granularity: "minute", "hour" or "day"
+        - start / end: range to cover (default: the last 60 minutes / 48 hours / 30 days)
+        - filters: e.g. {"action": "escalate", "status": "error"}
+        - group_by: a dimension to split every series point by
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        _, end_epoch = parse_bound(end)
+        end_ts = datetime.utcnow() if end_epoch is None else from_epoch(end_epoch)
+        _, start_epoch = parse_bound(start)
+        if start_epoch is None:
+            start_ts = end_ts - timedelta(seconds=GRANULARITIES[granularity][0] * (DEFAULT_POINTS[granularity] - 1))
+        else:
+            start_ts = from_epoch(start_epoch)
+        return self._stats(granularity, start_ts, end_ts, filters, group_by)
+
+    @abstractmethod
+    def _stats(self, granularity: str, start: datetime, end: datetime,
+               filters: Optional[Dict[str, str]], group_by: Optional[str]) -> dict:
+        """read_stats() once its arguments are checked and the range resolved."""
+
+    def close(self):
+        pass
+
+
+def backend_name() -> str:
+    name = os.getenv("MEMORY_BACKEND", "redis").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"MEMORY_BACKEND must be one of {', '.join(BACKENDS)}, not {name!r}")
+    return name
+
+
+def open_memory_store() -> MemoryBackend:
+    """
+    The MemoryStore backend chosen by MEMORY_BACKEND:
+      - "redis" (default): MemoryStore on REDIS_HOST / REDIS_PORT
+      - "sqlite": SQLiteMemoryStore in MEMORY_SQLITE_PATH
+    Backends are imported on demand, so a SQLite deployment never loads redis.
+    """
+    if backend_name() == "sqlite":
+        from memory.sqlite_store import SQLiteMemoryStore
+        return SQLiteMemoryStore()
+    from memory.memory import MemoryStore
+    return MemoryStore()
@@ -0,0 +1,93 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+from typing import Any, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # fall back to JSON encoding
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # fall back to zlib compression
+    zstandard = None
+
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def is_digest(value: str) -> bool:
+    return bool(DIGEST_RE.fullmatch(value or ""))
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and "$blob" in value
+
+
+class BlobStore:
+    """
+    Content-addressed storage for large event payloads (e.g. a whole parsed
+    JSON document as an extraction result).
+
+    A payload at or above MEMORY_BLOB_THRESHOLD bytes (default 8192, once
+    encoded) is encoded with msgpack (JSON if msgpack is missing), compressed
+    with zstd (zlib if zstandard is missing) and stored once under
+    memory:blob:<sha256 of the encoded bytes>. The event then carries only a
+    reference:
+        {"$blob": "<digest>", "size": <encoded bytes>, "stored": <compressed bytes>}
+
+    Stored blobs start with a header line naming their encoding, so they can
+    be decoded from the digest alone.
+    """
+
+    def __init__(self, threshold: int = None, prefix: str = "memory:blob:"):
+        self.threshold = threshold if threshold is not None else int(os.getenv("MEMORY_BLOB_THRESHOLD", 8192))
+        self.prefix = prefix
+        self.encoding = "msgpack" if msgpack else "json"
+        self.compression = "zstd" if zstandard else "zlib"
+
+    def key(self, digest: str) -> str:
+        return f"{self.prefix}{digest}"
+
+    def pack(self, value: Any) -> Optional[Tuple[dict, bytes]]:
+        """
+        Return (reference, stored bytes) if `value` is large enough to be kept
+        as a blob, otherwise None.
+        """
+        encoded = self._encode(value)
+        if encoded is None or len(encoded) < self.threshold:
+            return None
+        digest = hashlib.sha256(encoded).hexdigest()
+        header = f"{self.encoding}+{self.compression}\n".encode("ascii")
+        payload = header + self._compress(encoded)
+        return {"$blob": digest, "size": len(encoded), "stored": len(payload)}, payload
+
+    def unpack(self, payload: bytes) -> Any:
+        header, _, body = payload.partition(b"\n")
+        encoding, _, compression = header.decode("ascii").partition("+")
+        if compression == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read this blob")
+            body = zstandard.ZstdDecompressor().decompress(body)
+        else:
+            body = zlib.decompress(body)
+        if encoding == "msgpack":
+            if msgpack is None:
+                raise RuntimeError("msgpack is required to read this blob")
+            return msgpack.unpackb(body, raw=False, strict_map_key=False)
+        return json.loads(body)
+
+    def _encode(self, value: Any) -> Optional[bytes]:
+        if msgpack is not None:
+            try:
+                return msgpack.packb(value, use_bin_type=True)
+            except (TypeError, ValueError, OverflowError):
+                return None  # not msgpack-serializable: keep the event inline as JSON
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return zlib.compress(data, 6)
@@ -0,0 +1,148 @@
+import os
+import json
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from memory.blobs import is_blob_ref
+from memory.memory import MemoryStore, rollup_counts, to_epoch
+
+logger = logging.getLogger(__name__)
+
+
+class Compactor:
+    """
+    Moves MemoryStore buckets that are past their hot retention out of Redis:
+      1. the bucket's raw events are written to a compressed archive segment,
+         along with any blobs they reference
+      2. its rollup counters (see memory.rollup_counts) are stored in a Redis hash
+      3. the bucket list and its index entry are deleted
+
+    Steps 2 and 3 run in one MULTI transaction and the segment write is
+    idempotent, so a compactor that dies midway simply redoes the bucket on
+    the next pass. A Redis lock keeps concurrent workers from compacting at
+    the same time.
+
+    Events still in the pre-partitioning `memory:events` list are migrated to
+    the archive on the same pass.
+
+    Configured from the environment:
+      - MEMORY_COMPACT_INTERVAL: seconds between passes of run() (default 300, 0 = disabled)
+    """
+
+    def __init__(self, store: MemoryStore, interval: float = None):
+        self.store = store
+        self.interval = interval if interval is not None else float(os.getenv("MEMORY_COMPACT_INTERVAL", 300))
+        self.lock_key = "memory:compactor:lock"
+        self.lock_seconds = max(60, int(self.interval * 2))
+
+    def compact_once(self, now: datetime = None) -> Dict[str, int]:
+        """
+        Compact every bucket that ended more than hot_retention seconds before
+        `now` (default: current UTC time). Returns counts of what was moved.
+        """
+        client = self.store.client
+        now = now or datetime.utcnow()
+        # A bucket is cold once its end (start + width) is older than the retention
+        cutoff = to_epoch(now) - self.store.hot_retention - self.store.bucket_seconds
+        stats = {"buckets": 0, "events": 0, "legacy_events": 0}
+
+        token = uuid.uuid4().hex
+        if not client.set(self.lock_key, token, nx=True, ex=self.lock_seconds):
+            logger.debug("Another compactor holds the lock; skipping this pass")
+            return stats
+        try:
+            for bucket_key, bucket in client.zrangebyscore(self.store.index_key, "-inf", cutoff, withscores=True):
+                stats["events"] += self._compact_bucket(bucket_key, int(bucket))
+                stats["buckets"] += 1
+            stats["legacy_events"] = self._migrate_legacy()
+        finally:
+            if client.get(self.lock_key) == token:
+                client.delete(self.lock_key)
+
+        if stats["buckets"] or stats["legacy_events"]:
+            logger.info(f"Compacted {stats['buckets']} buckets ({stats['events']} events) "
+                        f"and {stats['legacy_events']} legacy events into {self.store.archive.directory}")
+        return stats
+
+    def _compact_bucket(self, bucket_key: str, bucket: int) -> int:
+        client = self.store.client
+        events = [json.loads(record) for record in client.lrange(bucket_key, 0, -1)]
+        name = self.store.segment_name(bucket)
+        if events:
+            self._archive_blobs(events)
+            self.store.archive.write_segment(name, bucket, events)
+
+        pipe = client.pipeline(transaction=True)
+        if events:
+            self._store_rollup(pipe, name, bucket, events)
+        pipe.delete(bucket_key)
+        pipe.zrem(self.store.index_key, bucket_key)
+        pipe.execute()
+        return len(events)
+
+    def _archive_blobs(self, events: List[dict]) -> None:
+        """
+        Copy the blobs these events reference to the archive. They stay in Redis
+        until their TTL, as newer events may share them.
+        """
+        archive = self.store.archive
+        digests = sorted({e["value"]["$blob"] for e in events if is_blob_ref(e.get("value"))})
+        digests = [d for d in digests if not archive.has_blob(d)]
+        if not digests:
+            return
+        pipe = self.store.blob_client.pipeline(transaction=False)
+        for digest in digests:
+            pipe.get(self.store.blobs.key(digest))
+        for digest, payload in zip(digests, pipe.execute()):
+            if payload is None:
+                logger.warning(f"Blob {digest} expired before it could be archived")
+                continue
+            archive.write_blob(digest, payload)
+
+    def _migrate_legacy(self) -> int:
+        """
+        Archive the events of the old single `memory:events` list, grouped by
+        bucket. Only the migrated prefix is trimmed, so anything appended
+        meanwhile (e.g. by a not-yet-upgraded worker) is picked up next pass.
+        """
+        client = self.store.client
+        raw = client.lrange(self.store.list_key, 0, -1)
+        if not raw:
+            return 0
+
+        groups: Dict[int, List[dict]] = {}
+        for record in raw:
+            event = json.loads(record)
+            ts = datetime.fromisoformat(event["timestamp"])
+            groups.setdefault(self.store.bucket_of(to_epoch(ts)), []).append(event)
+
+        pipe = client.pipeline(transaction=True)
+        for bucket, events in sorted(groups.items()):
+            # Readers skip this segment while its events are still in the list (see
+            # MemoryStore.legacy_segment_names), until the ltrim below
+            name = self.store.legacy_segment_name(bucket, events[0])
+            self.store.archive.write_segment(name, bucket, events)
+            self._store_rollup(pipe, name, bucket, events)
+        pipe.ltrim(self.store.list_key, len(raw), -1)
+        pipe.execute()
+        return len(raw)
+
+    def _store_rollup(self, pipe, name: str, bucket: int, events: List[dict]) -> None:
+        # One hash per segment, written with absolute counts: redoing a
+        # segment overwrites its rollup instead of counting it twice
+        rollup_key = f"{self.store.rollup_prefix}{name}"
+        pipe.delete(rollup_key)
+        pipe.hset(rollup_key, mapping=rollup_counts(events))
+        pipe.zadd(self.store.rollup_index_key, {rollup_key: bucket})
+
+    async def run(self) -> None:
+        """Background task: compact every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.compact_once)
+            except Exception as e:
+                logger.warning(f"Memory compaction failed: {e}")
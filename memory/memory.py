@@ -1,9 +1,35 @@
 import os
 import json
+import hashlib
+from collections import Counter
 from datetime import datetime
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+
 import redis
 
-class MemoryStore:
+from memory.archive import SegmentArchive
+from memory.backend import MemoryBackend, TimeBound, from_epoch, parse_bound, to_epoch
+from memory.blobs import BlobStore, is_digest
+from memory.stats import AuditStats
+
+
+def rollup_counts(events: List[dict]) -> Dict[str, int]:
+    """
+    Aggregate counters kept for compacted buckets:
+      - "events"                     total events
+      - "<source>|<key>"             events per source and key
+      - "action|<target>|<status>"   routed actions per target and outcome
+    """
+    counts = Counter({"events": len(events)})
+    for e in events:
+        counts[f"{e['source']}|{e['key']}"] += 1
+        if e["key"] == "action" and isinstance(e.get("value"), dict):
+            counts[f"action|{e['value'].get('target')}|{e['value'].get('status')}"] += 1
+    return dict(counts)
+
+
+class MemoryStore(MemoryBackend):
     """
     A simple Redis‑based “blackboard” where every agent (or router) can append an event.
     Each event is a JSON blob with:
@@ -11,49 +37,293 @@ class MemoryStore:
       - source    (e.g., "classifier", "email_agent", "router")
       - key       (e.g., "metadata", "extraction", "action")
       - value     (a dict of agent‑specific data)
+
+    Large values are stored once in a content-addressed blob store
+    (memory/blobs.py); their event only carries {"$blob": digest, "size": ...}.
+    Use read_blob() / resolve() to get the payload back.
+
+    Events written with a request_id are also indexed in a per-request list
+    (memory:request:<id>) of [bucket, position] pointers into the bucket lists,
+    expiring with their bucket, so read_by_request() finds an upload's events
+    without scanning or storing them twice.
+
+    Events are partitioned into time buckets (one Redis list per bucket, hourly
+    by default) that expire after a retention period. memory/compactor.py moves
+    buckets past their hot retention into compressed segments on local disk
+    (memory/archive.py) and keeps per-bucket rollup counters in Redis. Reads
+    span both tiers transparently.
+
+    Configured from the environment:
+      - MEMORY_BUCKET_SECONDS: bucket width (default 3600)
+      - MEMORY_HOT_RETENTION:  seconds a bucket stays in Redis before compaction (default 86400)
+      - MEMORY_TTL_GRACE:      extra TTL on top of the retention, so buckets survive
+                               a late compactor but never leak forever (default 86400)
+
+    This is the default backend (MEMORY_BACKEND=redis, see memory/backend.py).
     """
 
-    def __init__(self, host: str = None, port: int = None, db: int = 0):
+    def __init__(self, host: str = None, port: int = None, db: int = 0, archive: SegmentArchive = None):
         # Read from environment (so it works in Docker Compose, etc.)
         redis_host = host or os.getenv("REDIS_HOST", "localhost")
         redis_port = port or int(os.getenv("REDIS_PORT", 6379))
         self.client = redis.Redis(host=redis_host, port=redis_port, db=db, decode_responses=True)
-        self.list_key = "memory:events"
+        # Blobs are compressed bytes, so they are read without response decoding
+        self.blob_client = redis.Redis(host=redis_host, port=redis_port, db=db, decode_responses=False)
+        self.list_key = "memory:events"  # single unbounded list used before partitioning
+        self.bucket_prefix = "memory:events:"
+        self.index_key = "memory:buckets"  # sorted set: bucket key -> bucket start (epoch)
+        self.rollup_prefix = "memory:rollup:"
+        self.rollup_index_key = "memory:rollups"  # sorted set: rollup key -> bucket start (epoch)
+        self.request_prefix = "memory:request:"
+        self.bucket_seconds = int(os.getenv("MEMORY_BUCKET_SECONDS", 3600))
+        self._current_bucket = None  # (bucket start, key) of the latest write
+        self.hot_retention = int(os.getenv("MEMORY_HOT_RETENTION", 24 * 3600))
+        self.ttl_grace = int(os.getenv("MEMORY_TTL_GRACE", 24 * 3600))
+        self.archive = archive or SegmentArchive()
+        self.stats = AuditStats()
+        self.blobs = BlobStore()
+
+    # === Buckets ===
+
+    def bucket_of(self, epoch: int) -> int:
+        """Start (epoch seconds) of the bucket containing `epoch`."""
+        return epoch - epoch % self.bucket_seconds
+
+    def bucket_label(self, bucket: int) -> str:
+        return from_epoch(bucket).strftime("%Y%m%dT%H%M%S")
+
+    def bucket_key(self, bucket: int) -> str:
+        current = self._current_bucket
+        if current is None or current[0] != bucket:
+            current = self._current_bucket = (bucket, f"{self.bucket_prefix}{self.bucket_label(bucket)}")
+        return current[1]
+
+    def request_key(self, request_id: str) -> str:
+        return f"{self.request_prefix}{request_id}"
+
+    def segment_name(self, bucket: int) -> str:
+        """Name of the archive segment holding a compacted bucket."""
+        return f"events-{self.bucket_label(bucket)}"
+
+    def legacy_segment_name(self, bucket: int, first_event: dict) -> str:
+        """
+        Name of the segment memory/compactor.py migrates the `memory:events`
+        events of `bucket` into, after the first of them: a retried migration
+        rewrites the same segment, a later one gets a new segment.
+        """
+        first = hashlib.sha1(json.dumps(first_event, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return f"{self.segment_name(bucket)}-legacy-{first}"
+
+    def legacy_segment_names(self, legacy: List[dict]) -> set:
+        """
+        Segments a migration of these `memory:events` events writes. Readers
+        skip them in the archive: until the migrated events are trimmed from the
+        list, they would be read twice.
+        """
+        firsts: Dict[int, dict] = {}
+        for event in legacy:
+            firsts.setdefault(self.bucket_of(to_epoch(datetime.fromisoformat(event["timestamp"]))), event)
+        return {self.legacy_segment_name(bucket, event) for bucket, event in firsts.items()}
+
+    # === Writes ===
 
-    def write(self, source: str, key: str, value: dict):
+    def write(self, source: str, key: str, value: dict, request_id: str = None):
         """
         Append a new event to the memory.
         - source: which agent or component ("classifier", "email_agent", "router", etc.)
         - key: short tag ("metadata", "extraction", "action")
         - value: a JSON‑serializable dict with whatever data you need to store
+        - request_id: the upload the event belongs to, if any
         """
+        now = datetime.utcnow()
+        blob = self.blobs.pack(value) if isinstance(value, (dict, list)) else None
         event = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": now.isoformat(),
             "source":    source,
             "key":       key,
-            "value":     value
+            "value":     value if blob is None else blob[0]
         }
-        # Push to the right (newest at the end)
-        self.client.rpush(self.list_key, json.dumps(event))
+        if request_id is not None:
+            event["request_id"] = request_id
+        bucket = self.bucket_of(to_epoch(now))
+        bucket_key = self.bucket_key(bucket)
+        expires = bucket + self.bucket_seconds + self.hot_retention + self.ttl_grace
+        # One atomic round trip: store the blob (once per digest), push to the right
+        # (newest at the end), refresh the TTL, index the bucket and, for actions,
+        # bump the audit counters
+        pipe = self.client.pipeline(transaction=True)
+        if blob is not None:
+            ref, payload = blob
+            blob_key = self.blobs.key(ref["$blob"])
+            pipe.set(blob_key, payload, nx=True)
+            pipe.expireat(blob_key, expires)  # lives as long as its newest reference
+        pushed_at = len(pipe)
+        pipe.rpush(bucket_key, json.dumps(event))
+        pipe.expireat(bucket_key, expires)
+        pipe.zadd(self.index_key, {bucket_key: bucket})
+        if key == "action" and isinstance(value, dict):
+            self.stats.record(pipe, now, value)
+        results = pipe.execute()
+
+        if request_id is not None:
+            # Bucket lists are append-only until compacted, so the event's position
+            # (known once RPUSH returns the new length) stays valid while it lives
+            request_key = self.request_key(request_id)
+            pipe = self.client.pipeline(transaction=False)
+            pipe.rpush(request_key, json.dumps([bucket, results[pushed_at] - 1]))
+            pipe.expireat(request_key, expires)
+            pipe.execute()
+
+    # === Reads ===
+
+    def _read(self, start: TimeBound, end: TimeBound, key: str = None, source: str = None) -> list:
+        start_iso, start_epoch = parse_bound(start)
+        end_iso, end_epoch = parse_bound(end)
+        # Buckets overlapping [start, end] start after (start - bucket width)
+        bucket_from = None if start_epoch is None else start_epoch - self.bucket_seconds + 1
+
+        events, hot_segments = self._read_hot(bucket_from, end_epoch)
+        if any(bound is not None for bound in (start_iso, end_iso, key, source)):
+            events = [e for e in events if self._matches(e, start_iso, end_iso, key, source)]
+        # A bucket is either still in Redis or already archived. Buckets read from
+        # Redis are skipped in the archive, which covers the moment between the
+        # compactor writing a segment and deleting the bucket.
+        cold = list(self.archive.read(
+            start_iso, end_iso, key=key, source=source,
+            bucket_from=bucket_from, bucket_to=end_epoch, skip=hot_segments,
+        ))
+        if not cold:
+            return events
+        cold.extend(events)
+        cold.sort(key=itemgetter("timestamp"))
+        return cold
+
+    def read_by_request(self, request_id: str) -> list:
+        """
+        Return one upload's events, oldest first: through its Redis pointers
+        while their buckets are hot, and from the archive (memory/archive.py
+        read_request) for buckets already compacted.
+        """
+        pointers = [json.loads(p) for p in self.client.lrange(self.request_key(request_id), 0, -1)]
+        pipe = self.client.pipeline(transaction=False)
+        for bucket, position in pointers:
+            pipe.lindex(f"{self.bucket_prefix}{self.bucket_label(bucket)}", position)
+        events, hot_segments = [], set()
+        for (bucket, _), record in zip(pointers, pipe.execute() if pointers else []):
+            event = json.loads(record) if record is not None else None
+            if event is not None and event.get("request_id") == request_id:
+                events.append(event)
+                hot_segments.add(self.segment_name(bucket))
+        if len(events) < len(pointers) or not pointers:
+            events.extend(self.archive.read_request(request_id, skip=hot_segments))
+            events.sort(key=itemgetter("timestamp"))
+        return events
+
+    def _read_hot(self, bucket_from: Optional[int], bucket_to: Optional[int]) -> Tuple[List[dict], set]:
+        lo = "-inf" if bucket_from is None else bucket_from
+        hi = "+inf" if bucket_to is None else bucket_to
+        bucket_keys = self.client.zrangebyscore(self.index_key, lo, hi, withscores=True)
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.lrange(self.list_key, 0, -1)
+        for bucket_key, _ in bucket_keys:
+            pipe.lrange(bucket_key, 0, -1)
+        legacy, *buckets = pipe.execute()
+
+        events = [json.loads(record) for record in legacy]
+        hot_segments = self.legacy_segment_names(events)
+        for (_, bucket), raw in zip(bucket_keys, buckets):
+            if raw:
+                hot_segments.add(self.segment_name(int(bucket)))
+                events.extend([json.loads(record) for record in raw])
+        return events, hot_segments
 
-    def read_all(self) -> list:
+    def scan(self, start: TimeBound = None, end: TimeBound = None, page: int = 1000) -> Iterator[dict]:
         """
-        Return all events in chronological order (oldest → newest).
+        Yield events in [start, end] bucket by bucket, oldest first: hot buckets
+        are read from Redis `page` events at a time, archived ones segment block
+        by segment block. Within a bucket events come in write order.
         """
-        raw = self.client.lrange(self.list_key, 0, -1)
-        return [json.loads(record) for record in raw]
+        start_iso, start_epoch = parse_bound(start)
+        end_iso, end_epoch = parse_bound(end)
+        bucket_from = None if start_epoch is None else start_epoch - self.bucket_seconds + 1
 
-    def read_by_source(self, source: str) -> list:
+        legacy = [json.loads(record) for record in self.client.lrange(self.list_key, 0, -1)]
+        legacy_segments = self.legacy_segment_names(legacy)
+        legacy.sort(key=itemgetter("timestamp"))
+        yield from (e for e in legacy if self._matches(e, start_iso, end_iso, None, None))
+
+        lo = "-inf" if bucket_from is None else bucket_from
+        hi = "+inf" if end_epoch is None else end_epoch
+        hot = [(int(bucket), ("hot", key))
+               for key, bucket in self.client.zrangebyscore(self.index_key, lo, hi, withscores=True)]
+        hot_segments = {self.segment_name(bucket) for bucket, _ in hot} | legacy_segments
+        cold = [(index["bucket"], ("cold", index)) for index in self.archive.segments(bucket_from, end_epoch)
+                if index["name"] not in hot_segments]
+        for _, (tier, ref) in sorted(hot + cold, key=itemgetter(0)):
+            if tier == "cold":
+                yield from self.archive.read_segment(ref, start_iso, end_iso)
+                continue
+            offset = 0
+            while True:
+                records = self.client.lrange(ref, offset, offset + page - 1)
+                for record in records:
+                    event = json.loads(record)
+                    if self._matches(event, start_iso, end_iso, None, None):
+                        yield event
+                if len(records) < page:
+                    break
+                offset += page
+
+    @staticmethod
+    def _matches(event: dict, start: Optional[str], end: Optional[str],
+                 key: Optional[str], source: Optional[str]) -> bool:
+        if start is not None and event["timestamp"] < start:
+            return False
+        if end is not None and event["timestamp"] > end:
+            return False
+        if key is not None and event["key"] != key:
+            return False
+        return source is None or event["source"] == source
+
+    def read_blob(self, digest: str):
         """
-        Return only those events where event["source"] == source.
+        Return the payload stored under `digest`, from Redis or, once its
+        events were compacted, from the archive. None if it doesn't exist.
+        Raises ValueError if `digest` isn't a sha256 hex digest.
         """
-        return [e for e in self.read_all() if e["source"] == source]
+        if not is_digest(digest):
+            raise ValueError(f"Not a blob digest: {digest!r}")
+        payload = self.blob_client.get(self.blobs.key(digest))
+        if payload is None:
+            payload = self.archive.read_blob(digest)
+        return None if payload is None else self.blobs.unpack(payload)
 
-    def read_by_key(self, key: str) -> list:
+    def read_rollups(self, start: TimeBound = None, end: TimeBound = None) -> Dict[str, Dict[str, int]]:
         """
-        Return only those events where event["key"] == key.
+        Return the rollup counters of compacted buckets, keyed by bucket start
+        (ISO), for buckets overlapping [start, end].
         """
-        return [e for e in self.read_all() if e["key"] == key]
+        _, start_epoch = parse_bound(start)
+        _, end_epoch = parse_bound(end)
+        lo = "-inf" if start_epoch is None else start_epoch - self.bucket_seconds + 1
+        hi = "+inf" if end_epoch is None else end_epoch
+        rollup_keys = self.client.zrangebyscore(self.rollup_index_key, lo, hi, withscores=True)
+
+        pipe = self.client.pipeline(transaction=False)
+        for rollup_key, _ in rollup_keys:
+            pipe.hgetall(rollup_key)
+        rollups: Dict[str, Dict[str, int]] = {}
+        for (_, bucket), counts in zip(rollup_keys, pipe.execute()):
+            merged = rollups.setdefault(from_epoch(int(bucket)).isoformat(), {})
+            for field, count in counts.items():
+                merged[field] = merged.get(field, 0) + int(count)
+        return rollups
+
+    def _stats(self, granularity: str, start: datetime, end: datetime,
+               filters: Optional[Dict[str, str]], group_by: Optional[str]) -> dict:
+        # From the counters maintained by write(), without reading any events
+        return self.stats.query(self.client, granularity, start, end, filters, group_by)
 
     def close(self):
         """
@@ -61,5 +331,6 @@ class MemoryStore:
         """
         try:
             self.client.close()
+            self.blob_client.close()
         except Exception:
             pass
@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from memory.backend import MemoryBackend, TimeBound, parse_bound
+from memory.blobs import BlobStore, is_digest
+from memory.stats import DIMENSIONS, GRANULARITIES, counter_field, plan_query, summarize
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id         INTEGER PRIMARY KEY,
+    timestamp  TEXT NOT NULL,
+    source     TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    action     TEXT,
+    request_id TEXT,
+    value      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_time    ON events (timestamp);
+CREATE INDEX IF NOT EXISTS events_by_key     ON events (key, timestamp);
+CREATE INDEX IF NOT EXISTS events_by_source  ON events (source, timestamp);
+CREATE INDEX IF NOT EXISTS events_by_action  ON events (action, timestamp);
+CREATE INDEX IF NOT EXISTS events_by_request ON events (request_id);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest  TEXT PRIMARY KEY,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS action_totals (
+    field TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+"""
+
+# Length of the ISO timestamp prefix that identifies a stats bucket
+BUCKET_PREFIX = {"minute": 16, "hour": 13, "day": 10}
+
+
+class SQLiteMemoryStore(MemoryBackend):
+    """
+    MemoryStore backend for edge and single-node deployments: one SQLite file
+    in WAL mode instead of a Redis server.
+    - events go into an `events` table indexed by timestamp, source, key,
+      action and request id, with the value as JSON
+    - reads, the /audit filters and /audit/stats are indexed SQL queries
+    - large values are stored once in a `blobs` table (see memory/blobs.py)
+
+    write() only queues the event: a writer thread commits queued events in
+    batched transactions, so the pipeline never waits for a disk sync. Reads
+    wait for the events queued before them, so a write is always visible to
+    the next read. A batch that can't be committed is retried; if it still
+    fails the store is marked failed, and write() and flush() (so every read)
+    raise instead of losing audit events silently.
+
+    Configured from the environment:
+      - MEMORY_SQLITE_PATH:     database file (default memory.db)
+      - MEMORY_SQLITE_BATCH:    events committed per transaction at most (default 256)
+      - MEMORY_SQLITE_FLUSH_MS: how long a write may wait for others to share its
+                                transaction (default 50)
+      - MEMORY_SQLITE_RETRIES:  retries of a failed transaction before giving up (default 3)
+    """
+
+    def __init__(self, path: str = None, batch_size: int = None, flush_ms: float = None):
+        self.path = path or os.getenv("MEMORY_SQLITE_PATH", "memory.db")
+        self.batch_size = batch_size or int(os.getenv("MEMORY_SQLITE_BATCH", 256))
+        flush_ms = flush_ms if flush_ms is not None else float(os.getenv("MEMORY_SQLITE_FLUSH_MS", 50))
+        self.flush_interval = flush_ms / 1000.0
+        self.retries = int(os.getenv("MEMORY_SQLITE_RETRIES", 3))
+        self.blobs = BlobStore()
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._writer_conn = self._connect()
+        self._writer_conn.execute("PRAGMA journal_mode=WAL")
+        self._writer_conn.executescript(SCHEMA)
+
+        # Readers get a connection per thread; WAL lets them run alongside the writer
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+        self._cond = threading.Condition()
+        self._pending: List[tuple] = []
+        self._queued = 0      # events handed to write() so far
+        self._committed = 0   # of those, events committed to the database
+        self._flushing = 0    # readers waiting for the queue to drain
+        self._closed = False
+        self._failed: Optional[Exception] = None  # why the writer gave up, if it did
+        self._writer = threading.Thread(target=self._write_loop, name="memory-sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        # WAL only needs a sync at checkpoints; a crash can lose the last commits, not corrupt the file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    # === Writes ===
+
+    def write(self, source: str, key: str, value: dict, request_id: str = None):
+        """
+        Queue a new event; it is committed within MEMORY_SQLITE_FLUSH_MS.
+        - source: which agent or component ("classifier", "email_agent", "router", etc.)
+        - key: short tag ("metadata", "extraction", "action")
+        - value: a JSON‑serializable dict with whatever data you need to store
+        - request_id: the upload the event belongs to, if any
+        """
+        blob = self.blobs.pack(value) if isinstance(value, (dict, list)) else None
+        stored = value if blob is None else blob[0]
+        is_dict = isinstance(value, dict)
+        row = (
+            datetime.utcnow().isoformat(),
+            source,
+            key,
+            value.get("action") if key == "action" and is_dict else None,
+            request_id,
+            json.dumps(stored),
+            blob,
+            counter_field(value) if key == "action" and is_dict else None,
+        )
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SQLiteMemoryStore is closed")
+            self._raise_if_failed()
+            self._pending.append(row)
+            self._queued += 1
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """
+        Block until every event queued so far is committed. Raises
+        RuntimeError if the writer gave up on some of them.
+        """
+        with self._cond:
+            target = self._queued
+            if self._committed >= target:
+                return
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                self._cond.wait_for(lambda: self._committed >= target or self._failed is not None
+                                    or not self._writer.is_alive())
+            finally:
+                self._flushing -= 1
+            if self._committed < target:
+                self._raise_if_failed()
+
+    def _raise_if_failed(self) -> None:
+        if self._failed is not None:
+            raise RuntimeError(f"SQLiteMemoryStore failed; {len(self._pending)} events are not stored: "
+                               f"{self._failed}") from self._failed
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return  # closed and drained
+                # Let more writes join this transaction, unless someone is waiting to read
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.batch_size or self._flushing or self._closed,
+                    timeout=self.flush_interval,
+                )
+                # Left queued until committed: only this thread removes events, writes append
+                batch = self._pending[:self.batch_size]
+            error = self._insert_with_retries(batch)
+            with self._cond:
+                if error is None:
+                    del self._pending[:len(batch)]
+                    self._committed += len(batch)
+                else:
+                    self._failed = error
+                self._cond.notify_all()
+            if error is not None:
+                logger.error(f"Giving up on storing memory events after {self.retries + 1} attempts: {error}")
+                return
+
+    def _insert_with_retries(self, batch: List[tuple]) -> Optional[Exception]:
+        """Commit `batch`, retrying with backoff; the last error if every attempt failed."""
+        for attempt in range(self.retries + 1):
+            try:
+                self._insert(batch)
+                return None
+            except Exception as e:  # the transaction was rolled back; the batch can be retried
+                if attempt == self.retries:
+                    return e
+                logger.warning(f"Failed to store {len(batch)} memory events ({e}); retrying")
+                time.sleep(0.05 * 2 ** attempt)
+
+    def _insert(self, batch: List[tuple]) -> None:
+        blobs = [(row[6][0]["$blob"], row[6][1]) for row in batch if row[6] is not None]
+        totals = [(row[7],) for row in batch if row[7] is not None]
+        with self._writer_conn:  # one transaction, committed on exit
+            if blobs:
+                self._writer_conn.executemany("INSERT OR IGNORE INTO blobs (digest, payload) VALUES (?, ?)", blobs)
+            self._writer_conn.executemany(
+                "INSERT INTO events (timestamp, source, key, action, request_id, value) VALUES (?, ?, ?, ?, ?, ?)",
+                [row[:6] for row in batch],
+            )
+            if totals:
+                self._writer_conn.executemany(
+                    "INSERT INTO action_totals (field, count) VALUES (?, 1) "
+                    "ON CONFLICT (field) DO UPDATE SET count = count + 1",
+                    totals,
+                )
+
+    # === Reads ===
+
+    def read_by_action(self, action: str, start: TimeBound = None, end: TimeBound = None) -> list:
+        # Indexed on the action column rather than filtered after reading
+        return self._read(start, end, key="action", action=action)
+
+    def read_by_request(self, request_id: str) -> list:
+        # Indexed on the request_id column
+        return self._read(None, None, request_id=request_id)
+
+    def _read(self, start: TimeBound, end: TimeBound, key: str = None, source: str = None,
+              action: str = None, request_id: str = None) -> list:
+        where, params = self._where(start, end, key, source, action, request_id)
+        self.flush()
+        rows = self._reader().execute(
+            f"SELECT timestamp, source, key, value, request_id FROM events{where} ORDER BY timestamp, id", params
+        )
+        return [self._event(row) for row in rows]
+
+    @staticmethod
+    def _where(start: TimeBound, end: TimeBound, key: str = None, source: str = None,
+               action: str = None, request_id: str = None) -> tuple:
+        start_iso, _ = parse_bound(start)
+        end_iso, _ = parse_bound(end)
+        clauses, params = [], []
+        for column, value in (("key", key), ("source", source), ("action", action), ("request_id", request_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start_iso is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start_iso)
+        if end_iso is not None:
+            clauses.append("timestamp <= ?")
+            params.append(end_iso)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def scan(self, start: TimeBound = None, end: TimeBound = None) -> Iterator[dict]:
+        """
+        Yield events in [start, end] in chronological order, streamed from a
+        cursor on a connection of its own (a consistent snapshot of the file).
+        """
+        where, params = self._where(start, end)
+        self.flush()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT timestamp, source, key, value, request_id FROM events{where} ORDER BY timestamp, id", params
+            )
+            for row in rows:
+                yield self._event(row)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _event(row: tuple) -> dict:
+        timestamp, source, key, value, request_id = row
+        event = {"timestamp": timestamp, "source": source, "key": key, "value": json.loads(value)}
+        if request_id is not None:
+            event["request_id"] = request_id
+        return event
+
+    def read_blob(self, digest: str):
+        """
+        Return the payload stored under `digest`, None if it doesn't exist.
+        Raises ValueError if `digest` isn't a sha256 hex digest.
+        """
+        if not is_digest(digest):
+            raise ValueError(f"Not a blob digest: {digest!r}")
+        self.flush()
+        row = self._reader().execute("SELECT payload FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return None if row is None else self.blobs.unpack(row[0])
+
+    def _stats(self, granularity: str, start: datetime, end: datetime,
+               filters: Optional[Dict[str, str]], group_by: Optional[str]) -> dict:
+        filters, buckets = plan_query(granularity, start, end, filters, group_by)
+        prefix = BUCKET_PREFIX[granularity]
+        bucket_counts: Dict[str, Dict[str, int]] = {b.isoformat()[:prefix]: {} for b in buckets}
+
+        self.flush()
+        conn = self._reader()
+        if buckets:
+            until = buckets[-1] + timedelta(seconds=GRANULARITIES[granularity][0])
+            rows = conn.execute(
+                "SELECT substr(timestamp, 1, ?), action, json_extract(value, '$.target'), "
+                "json_extract(value, '$.status'), json_extract(value, '$.format'), "
+                "json_extract(value, '$.intent'), COUNT(*) "
+                "FROM events WHERE key = 'action' AND timestamp >= ? AND timestamp < ? "
+                "GROUP BY 1, 2, 3, 4, 5, 6",
+                (prefix, buckets[0].isoformat(), until.isoformat()),
+            )
+            for bucket, *dims, count in rows:
+                field = counter_field(dict(zip(DIMENSIONS, dims)))
+                counts = bucket_counts[bucket]
+                counts[field] = counts.get(field, 0) + count
+        all_time = dict(conn.execute("SELECT field, count FROM action_totals"))
+        return summarize(granularity, start, end, buckets, list(bucket_counts.values()), all_time,
+                         filters, group_by)
+
+    def close(self):
+        """
+        Commit queued events and close the database.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._writer_conn.close()
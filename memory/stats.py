@@ -0,0 +1,168 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+# Dimensions of an action event that audit counters are kept for
+DIMENSIONS = ("action", "target", "status", "format", "intent")
+
+# granularity -> (bucket width in seconds, strftime label, default TTL in seconds)
+GRANULARITIES = {
+    "minute": (60,    "%Y%m%dT%H%M", 2 * 86400),
+    "hour":   (3600,  "%Y%m%dT%H",   90 * 86400),
+    "day":    (86400, "%Y%m%d",      730 * 86400),
+}
+
+MAX_POINTS = 1500
+DEFAULT_POINTS = {"minute": 60, "hour": 48, "day": 30}
+EPOCH = datetime(1970, 1, 1)
+
+
+def retention(granularity: str) -> int:
+    """Seconds counters of a granularity are kept, e.g. AUDIT_STATS_MINUTE_TTL."""
+    default = GRANULARITIES[granularity][2]
+    return int(os.getenv(f"AUDIT_STATS_{granularity.upper()}_TTL", default))
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    width = GRANULARITIES[granularity][0]
+    seconds = int((ts - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % width)
+
+
+def counter_field(value: dict) -> str:
+    """
+    One hash field per combination of dimension values, e.g.
+    "escalate|crm|success|Email|Complaint". Combinations are few, so any
+    filter or breakdown is answered by summing the fields of a bucket.
+    """
+    parts = []
+    for dim in DIMENSIONS:
+        v = value.get(dim)
+        parts.append("" if v is None else str(v).replace("|", "/"))
+    return "|".join(parts)
+
+
+def parse_field(field: str) -> Dict[str, str]:
+    return dict(zip(DIMENSIONS, field.split("|")))
+
+
+class AuditStats:
+    """
+    Counters of routed actions, maintained on every MemoryStore write so
+    dashboards never rescan raw events:
+      - audit:stats:total                      all-time counts (no TTL)
+      - audit:stats:<granularity>:<bucket>     per minute / hour / day, with a TTL
+
+    Each is a hash of counter_field(...) -> count.
+    """
+
+    def __init__(self, prefix: str = "audit:stats"):
+        self.prefix = prefix
+        self.total_key = f"{prefix}:total"
+        self.retention = {granularity: retention(granularity) for granularity in GRANULARITIES}
+        self._current: Dict[str, tuple] = {}  # granularity -> (bucket start, key, expiry)
+
+    def key(self, granularity: str, bucket: datetime) -> str:
+        return f"{self.prefix}:{granularity}:{bucket.strftime(GRANULARITIES[granularity][1])}"
+
+    def record(self, pipe, now: datetime, value: dict) -> None:
+        """Queue the counter updates for one action event on `pipe`."""
+        field = counter_field(value)
+        epoch = int((now - EPOCH).total_seconds())
+        pipe.hincrby(self.total_key, field, 1)
+        for granularity, (width, _, _) in GRANULARITIES.items():
+            start = epoch - epoch % width
+            # Consecutive writes almost always share buckets; skip re-formatting the key
+            current = self._current.get(granularity)
+            if current is None or current[0] != start:
+                bucket = EPOCH + timedelta(seconds=start)
+                current = (start, self.key(granularity, bucket), start + width + self.retention[granularity])
+                self._current[granularity] = current
+            _, key, expires = current
+            pipe.hincrby(key, field, 1)
+            pipe.expireat(key, expires)
+
+    def query(self, client, granularity: str, start: datetime, end: datetime,
+              filters: Dict[str, str] = None, group_by: str = None) -> dict:
+        """
+        Totals, per-dimension breakdowns and a time series for [start, end]
+        from the counters alone. Only combinations matching `filters`
+        (dimension -> value) are counted; `group_by` splits each series
+        point by one dimension.
+        Raises ValueError on an unknown granularity/dimension or too many points.
+        """
+        filters, buckets = plan_query(granularity, start, end, filters, group_by)
+
+        pipe = client.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.hgetall(self.key(granularity, bucket))
+        pipe.hgetall(self.total_key)
+        *bucket_counts, all_time = pipe.execute()
+        return summarize(granularity, start, end, buckets, bucket_counts, all_time, filters, group_by)
+
+
+def plan_query(granularity: str, start: datetime, end: datetime, filters: Dict[str, str] = None,
+               group_by: str = None) -> Tuple[Dict[str, str], List[datetime]]:
+    """
+    Validate a stats query; returns the effective filters and the starts of
+    the buckets covering [start, end].
+    Raises ValueError on an unknown granularity/dimension or too many points.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    for dim in list(filters) + ([group_by] if group_by else []):
+        if dim not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dim}")
+
+    width = timedelta(seconds=GRANULARITIES[granularity][0])
+    buckets: List[datetime] = []
+    bucket = bucket_start(start, granularity)
+    while bucket <= end:
+        buckets.append(bucket)
+        if len(buckets) > MAX_POINTS:
+            raise ValueError(f"Range spans more than {MAX_POINTS} {granularity} buckets")
+        bucket += width
+    return filters, buckets
+
+
+def summarize(granularity: str, start: datetime, end: datetime, buckets: List[datetime],
+              bucket_counts: List[Dict[str, str]], all_time: Dict[str, str],
+              filters: Dict[str, str], group_by: Optional[str]) -> dict:
+    """
+    Build the stats response from counter_field -> count maps, one per bucket
+    plus the all-time one. Shared by every MemoryStore backend.
+    """
+    by = {dim: Counter() for dim in DIMENSIONS}
+    series = []
+    for bucket, counts in zip(buckets, bucket_counts):
+        point = {"bucket": bucket.isoformat(), "count": 0}
+        groups = Counter()
+        for field, count in _matching(counts, filters):
+            point["count"] += count
+            for dim, v in field.items():
+                by[dim][v] += count
+            if group_by:
+                groups[field[group_by]] += count
+        if group_by:
+            point["groups"] = dict(groups)
+        series.append(point)
+
+    return {
+        "granularity": granularity,
+        "since":       buckets[0].isoformat() if buckets else start.isoformat(),
+        "until":       end.isoformat(),
+        "filters":     filters,
+        "total":       sum(p["count"] for p in series),
+        "all_time":    sum(count for _, count in _matching(all_time, filters)),
+        "by":          {dim: dict(c) for dim, c in by.items()},
+        "series":      series,
+    }
+
+
+def _matching(counts: Dict[str, str], filters: Dict[str, str]):
+    for raw_field, count in counts.items():
+        field = parse_field(raw_field)
+        if all(field.get(dim) == v for dim, v in filters.items()):
+            yield field, int(count)
@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+
+from mcp import main
+from mcp.admission import AdmissionController
+
+
+def test_saturated_upload_is_rejected_before_its_body_is_parsed(monkeypatch):
+    """A 429 comes from the headers alone: the multipart body is never parsed."""
+    monkeypatch.setenv("ADMISSION_LIMIT", "1")
+    monkeypatch.setenv("ADMISSION_QUEUE_MS", "50")
+    admission = AdmissionController()
+    declared, parsed = [], []
+
+    async def component(name):
+        assert name == "admission"
+        return admission
+
+    async def read_upload(request):
+        parsed.append(request.url.path)
+        raise AssertionError("body parsed")
+
+    original_acquire = admission.acquire
+
+    async def acquire(fmt, timeout=None):
+        declared.append(fmt)
+        return await original_acquire(fmt, timeout)
+
+    monkeypatch.setattr(main, "component", component)
+    monkeypatch.setattr(main, "read_upload", read_upload)
+    monkeypatch.setattr(admission, "acquire", acquire)
+    admission._by_format["PDF"] = admission.in_flight = 1  # the one slot is taken
+
+    client = TestClient(main.app)
+    response = client.post("/upload", headers={"X-Filename": "scan.pdf"},
+                           files={"file": ("scan.pdf", b"%PDF-1.4")})
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert declared == ["PDF"]
+    assert parsed == []
+
+
+def test_email_is_admitted_while_the_pdf_share_is_saturated(monkeypatch):
+    """PDFs hold their whole share of the limit: another PDF waits, an email goes straight in."""
+    monkeypatch.setenv("ADMISSION_LIMIT", "4")
+    monkeypatch.setenv("ADMISSION_ADAPTIVE", "0")
+    monkeypatch.setenv("ADMISSION_QUEUE_MS", "50")
+    admission = AdmissionController()
+    processed = []
+
+    async def component(name):
+        return admission
+
+    async def read_upload(request):
+        return request.headers["x-filename"], b"body"
+
+    async def process_upload(raw_bytes, filename, *args, **kwargs):
+        processed.append(filename)
+        return {"filename": filename}
+
+    monkeypatch.setattr(main, "component", component)
+    monkeypatch.setattr(main, "read_upload", read_upload)
+    monkeypatch.setattr(main, "process_upload", process_upload)
+    admission._by_format["PDF"] = admission.in_flight = admission.quota("PDF")  # 2 of 4 slots
+
+    client = TestClient(main.app)
+    pdf = client.post("/upload", headers={"X-Filename": "scan.pdf"}, files={"file": ("scan.pdf", b"%PDF")})
+    email = client.post("/upload", headers={"X-Filename": "note.eml"}, files={"file": ("note.eml", b"Hi")})
+    assert pdf.status_code == 429
+    assert email.status_code == 200
+    assert processed == ["note.eml"]
@@ -0,0 +1,49 @@
+import time
+
+import groq
+import httpx
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from agents import deadline
+
+
+def connection_error():
+    return groq.APIConnectionError(request=httpx.Request("POST", "https://api.groq.com"))
+
+
+def test_bounded_call_retries_within_the_budget():
+    """A transient failure is retried, each attempt timing out with what is left of the budget."""
+    timeouts = []
+
+    def call(prompt, timeout):
+        timeouts.append(timeout)
+        if len(timeouts) == 1:
+            raise connection_error()
+        return "ok"
+
+    with deadline.deadline_scope(5):
+        llm = deadline.bounded(RunnableLambda(call))
+        llm.backoff = 0.05
+        assert llm.invoke("hi") == "ok"
+    assert len(timeouts) == 2
+    assert 4.5 < timeouts[1] < timeouts[0] <= 5
+
+
+def test_bounded_call_does_not_retry_past_the_budget():
+    """Once the budget can't cover the backoff and another attempt, the error surfaces."""
+    calls = []
+
+    def call(prompt, timeout):
+        calls.append(timeout)
+        time.sleep(0.3)
+        raise connection_error()
+
+    with deadline.deadline_scope(0.6):
+        llm = deadline.bounded(RunnableLambda(call))
+        llm.backoff = 0.2
+        started = time.monotonic()
+        with pytest.raises(groq.APIConnectionError):
+            llm.invoke("hi")
+    assert len(calls) == 1
+    assert time.monotonic() - started < 0.6
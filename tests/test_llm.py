@@ -0,0 +1,20 @@
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, LLMResult
+
+from agents.llm import token_usage
+
+
+def test_token_usage_of_an_invoked_call():
+    result = LLMResult(generations=[[ChatGeneration(message=AIMessage(content="ok"))]],
+                       llm_output={"token_usage": {"prompt_tokens": 120, "completion_tokens": 8}})
+    assert token_usage(result) == {"prompt": 120, "completion": 8}
+
+
+def test_token_usage_of_a_streamed_call():
+    """Streamed generations have no llm_output; the usage is on the merged message."""
+    chunks = [AIMessageChunk(content="o"),
+              AIMessageChunk(content="k", usage_metadata={"input_tokens": 95, "output_tokens": 2,
+                                                          "total_tokens": 97})]
+    message = chunks[0] + chunks[1]
+    result = LLMResult(generations=[[ChatGenerationChunk(message=message)]], llm_output=None)
+    assert token_usage(result) == {"prompt": 95, "completion": 2}
@@ -0,0 +1,116 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.fakes import FakeRedis
+from memory.archive import SegmentArchive
+from memory.compactor import Compactor
+from memory import memory as memory_module
+from memory.memory import MemoryStore
+from memory.sqlite_store import SQLiteMemoryStore
+
+
+def make_store(tmp_path) -> MemoryStore:
+    store = MemoryStore(archive=SegmentArchive(directory=str(tmp_path), codec="gzip", block_events=2))
+    store.client = store.blob_client = FakeRedis()
+    return store
+
+
+def test_request_list_holds_pointers_not_events(tmp_path):
+    """An upload's events are stored once, in their bucket; the request list only points at them."""
+    store = make_store(tmp_path)
+    store.write("classifier", "metadata", {"format": "PDF", "notes": "x" * 200}, request_id="req-1")
+    store.write("classifier", "metadata", {"format": "JSON"}, request_id="req-2")
+    store.write("pdf_agent", "extraction", {"total": 10}, request_id="req-1")
+
+    pointers = store.client.lrange(store.request_key("req-1"), 0, -1)
+    assert [len(json.loads(p)) for p in pointers] == [2, 2]
+    assert "notes" not in "".join(pointers)
+    events = store.read_by_request("req-1")
+    assert [e["key"] for e in events] == ["metadata", "extraction"]
+    assert events[0]["value"]["notes"] == "x" * 200
+
+
+def test_compacted_request_is_read_from_its_segment_only(tmp_path, monkeypatch):
+    """Once compacted, a request's events come from the segments the request map names."""
+    store = make_store(tmp_path)
+    clock = [datetime(2026, 1, 1, 10, 15)]
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return clock[0]
+
+    monkeypatch.setattr(memory_module, "datetime", FrozenDatetime)
+    for n in range(6):
+        store.write("classifier", "metadata", {"n": n}, request_id=f"req-{n % 3}")
+    clock[0] += timedelta(days=3)
+    Compactor(store).compact_once(now=clock[0])
+    store.write("classifier", "metadata", {"n": 6}, request_id="req-0")  # a later, hot bucket
+
+    assert [e["value"]["n"] for e in store.read_by_request("req-0")] == [0, 3, 6]
+    assert [e["value"]["n"] for e in store.read_by_request("req-1")] == [1, 4]
+    assert list(store.archive.read_request("req-9")) == []
+    shards = list((tmp_path / "requests").iterdir())
+    assert 1 <= len(shards) <= 3
+
+
+def test_legacy_events_are_read_once_while_being_migrated(tmp_path, monkeypatch):
+    """Between archiving the old `memory:events` list and trimming it, its events are not read twice."""
+    store = make_store(tmp_path)
+    for n, hour in enumerate([1, 2, 30]):
+        event = {"source": "classifier", "key": "metadata", "value": {"n": n},
+                 "timestamp": (datetime(2026, 1, 1) + timedelta(hours=hour)).isoformat()}
+        store.client.rpush(store.list_key, json.dumps(event))
+
+    with monkeypatch.context() as m:
+        m.setattr(store.client, "ltrim", lambda *args: True)  # the segments are written, the list not yet trimmed
+        Compactor(store).compact_once()
+        assert store.client.llen(store.list_key) == 3
+        assert sorted(e["value"]["n"] for e in store.read_all()) == [0, 1, 2]
+        assert sorted(e["value"]["n"] for e in store.scan()) == [0, 1, 2]
+
+    Compactor(store).compact_once()  # the retry rewrites the same segments, then trims
+    assert store.client.llen(store.list_key) == 0
+    assert sorted(e["value"]["n"] for e in store.read_all()) == [0, 1, 2]
+
+
+def test_sqlite_store_retries_a_failed_batch(tmp_path, monkeypatch):
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), flush_ms=1)
+    insert, attempts = store._insert, []
+
+    def flaky(batch):
+        attempts.append(len(batch))
+        if len(attempts) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        insert(batch)
+
+    monkeypatch.setattr(store, "_insert", flaky)
+    try:
+        store.write("classifier", "metadata", {"format": "PDF"}, request_id="req-1")
+        assert [e["key"] for e in store.read_by_request("req-1")] == ["metadata"]
+        assert len(attempts) == 2
+    finally:
+        store.close()
+
+
+def test_sqlite_store_raises_once_events_cannot_be_stored(tmp_path, monkeypatch):
+    """Events that never commit aren't reported as stored: flush() and later writes raise."""
+    monkeypatch.setenv("MEMORY_SQLITE_RETRIES", "1")
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), flush_ms=1)
+
+    def broken(batch):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(store, "_insert", broken)
+    try:
+        store.write("classifier", "metadata", {"format": "PDF"})
+        with pytest.raises(RuntimeError, match="1 events are not stored"):
+            store.flush()
+        with pytest.raises(RuntimeError):
+            store.write("classifier", "metadata", {"format": "JSON"})
+        assert store._committed == 0
+    finally:
+        store.close()
@@ -0,0 +1,16 @@
+from mcp import metrics
+
+
+def test_intent_labels_are_bounded_to_the_classifier_intents():
+    """Free-text LLM intents can't add label values: anything unknown is "other"."""
+    assert metrics.intent_label("Invoice") == "Invoice"
+    assert metrics.intent_label(" fraud risk ") == "Fraud Risk"
+    assert metrics.intent_label("Invoice for a subscription renewal") == "other"
+    assert metrics.intent_label("") == ""
+
+
+def test_stage_timer_labels_unknown_intents_as_other():
+    with metrics.stage_timer("test_stage", format="PDF") as span:
+        span.update(intent="Purchase Order Acknowledgement")
+    labels = {"stage": "test_stage", "format": "PDF", "intent": "other", "agent": ""}
+    assert metrics.REGISTRY.get_sample_value("conduit_stage_duration_seconds_count", labels) == 1
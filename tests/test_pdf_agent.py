@@ -0,0 +1,77 @@
+import pytest
+from langchain_core.language_models import FakeListChatModel
+
+from agents.pdf_agent import PDFAgent, merge_chunk_results
+
+
+def two_page_document() -> str:
+    return "\n".join(f"--- Page {n} ---\n" + "Line item widget 10.00\n" * 40 for n in (1, 2))
+
+
+def test_chunk_answering_a_json_list_counts_as_a_failed_chunk():
+    """A chunk whose LLM output is a JSON list (not an object) doesn't break the merge."""
+    agent = PDFAgent(llm=FakeListChatModel(responses=['[{"item": "widget"}]']))
+    agent.chunk_tokens = 300
+
+    extracted = agent._process_chunked(two_page_document(), "invoice")
+
+    assert extracted["extraction_method"] == "failed"
+    assert "Expected a JSON object" in extracted["error"]
+    assert extracted["chunking"]["chunks"] == 2
+    assert extracted["chunking"]["failed_chunks"] == 2
+
+
+def test_merge_keeps_zero_and_false_from_the_first_chunk():
+    """0 and False are values, not gaps a later chunk should fill."""
+    merged = merge_chunk_results([
+        {"discount": 0, "paid": False, "vendor": "", "terms": {}},
+        {"discount": 15, "paid": True, "vendor": "Acme", "terms": {"net": 30}},
+    ])
+    assert merged["discount"] == 0
+    assert merged["paid"] is False
+    assert merged["vendor"] == "Acme"
+    assert merged["terms"] == {"net": 30}
+
+
+def long_invoice(pages: int) -> str:
+    return "\n".join(f"--- Page {n} ---\n" + f"Widget {n} 10.00\n" * 40 for n in range(1, pages + 1)) \
+        + "\nTotal due: 1,234.50"
+
+
+def chunk_answers(count: int) -> list:
+    return [f'{{"line_items": [{{"description": "chunk {i}", "total": 10.0}}], "invoice_total": 1234.5}}'
+            for i in range(count)]
+
+
+def test_every_chunk_is_extracted_by_default(monkeypatch):
+    monkeypatch.delenv("PDF_MAX_CHUNKS", raising=False)
+    agent = PDFAgent(llm=FakeListChatModel(responses=chunk_answers(6)))
+    agent.chunk_tokens = 300
+
+    extracted = agent._process_chunked(long_invoice(6), "invoice")
+
+    assert extracted["chunking"]["chunks"] == 6
+    assert extracted["chunking"]["partial"] is False
+    assert len(extracted["line_items"]) == 6
+
+
+def test_capped_document_flags_the_skipped_range(monkeypatch):
+    """Chunks beyond PDF_MAX_CHUNKS get the rule-based extraction and the result is partial."""
+    monkeypatch.setenv("PDF_MAX_CHUNKS", "2")
+    agent = PDFAgent(llm=FakeListChatModel(responses=chunk_answers(2)))
+    agent.chunk_tokens = 300
+
+    extracted = agent._process_chunked(long_invoice(6), "invoice")
+
+    assert extracted["chunking"]["chunks"] == 2
+    assert extracted["chunking"]["dropped_chunks"] == 4
+    assert extracted["chunking"]["partial"] is True
+    assert "Widget 2" in extracted["skipped_range"]["text_snippet"]
+    assert extracted["reconciliation"]["consistent"] is None
+
+
+@pytest.mark.parametrize("value", ["0", "-3"])
+def test_max_chunks_below_one_is_rejected(monkeypatch, value):
+    monkeypatch.setenv("PDF_MAX_CHUNKS", value)
+    with pytest.raises(ValueError):
+        PDFAgent()
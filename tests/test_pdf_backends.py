@@ -0,0 +1,15 @@
+from agents.pdf_backends import render_layout
+
+
+def test_render_layout_keeps_columns_apart():
+    fragments = [(72, 700, 110, 10, "Item"), (300, 700, 330, 10, "Total"),
+                 (72, 686, 120, 10, "Widget"), (300, 686, 325, 10, "10.00")]
+    lines = render_layout(fragments).splitlines()
+    assert lines[0].split() == ["Item", "Total"]
+    assert lines[0].index("Total") == lines[1].index("10.00")
+
+
+def test_render_layout_with_zero_font_sizes():
+    """Text whose size is only in the text matrix reports 0; it is still laid out."""
+    fragments = [(72, 700, None, 0, "Invoice"), (200, 700, None, 0, "#42")]
+    assert render_layout(fragments).split() == ["Invoice", "#42"]
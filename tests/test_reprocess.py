@@ -0,0 +1,37 @@
+import json
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from mcp.reprocess import STATS, Reprocessor, WorkerPoolFailed
+
+
+def test_a_dead_worker_pool_stops_the_run_at_the_last_checkpoint(tmp_path):
+    """A broken pool is counted as errors and the checkpoint stays before the lost batch."""
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    job = Reprocessor(memory=None, diff_path=str(tmp_path / "diff.jsonl"), checkpoint_path=checkpoint_path, workers=0)
+    job.since, job.until = None, "2026-01-02T00:00:00"
+    stats = {name: 0 for name in STATS}
+    done = Future()
+    done.set_result([{"intent": "RFQ", "action_suggestion": {"action": "reply", "target": "sales"}}])
+    broken = Future()
+    broken.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+    record = {"request_id": "req-1", "timestamp": "2026-01-01T10:00:00", "format": "Email", "intent": "RFQ",
+              "old": {"action": "reply", "target": "sales", "status": "sent"}}
+
+    with open(job.diff_path, "a", encoding="utf-8") as diff:
+        job._checkpointed = (dict(stats), None, None)
+        job._complete(done, [record], {"resume_from": ("2026-01-01T10:00:00", 2), "emitted_through": ("2026-01-01T10:00:00", 1),
+                                       "scanned": {"events": 3, "unlinked": 0, "incomplete": 0}}, diff, stats)
+        with pytest.raises(WorkerPoolFailed, match="rerun to resume") as failure:
+            job._complete(broken, [dict(record, request_id="req-2")] * 2,
+                          {"resume_from": ("2026-01-01T11:00:00", 1), "emitted_through": ("2026-01-01T11:00:00", 1),
+                           "scanned": {"events": 6, "unlinked": 0, "incomplete": 0}}, diff, stats)
+
+    assert failure.value.stats["errors"] == 2
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    assert checkpoint["resume_from"] == ["2026-01-01T10:00:00", 2]
+    assert checkpoint["stats"]["uploads"] == 1 and checkpoint["stats"]["errors"] == 0
+    assert not checkpoint["done"]
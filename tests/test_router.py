@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from mcp.router import ActionBatcher, ActionRouter
+
+
+@pytest.mark.parametrize("body", [[{"ok": True}], {"results": 7}, {"results": {"0": "ok"}}, "accepted", None])
+def test_malformed_bulk_response_resolves_every_caller(monkeypatch, body):
+    """Callers without a deadline get an error outcome instead of waiting forever."""
+    async def post(path, payload, max_retries=2):
+        return {"status": "success", "http_status": 200, "response_body": body, "error": None}
+
+    async def main():
+        router = ActionRouter(base_url="http://bulk.invalid")
+        monkeypatch.setattr(router, "_post_with_retries", post)
+        batcher = ActionBatcher(router, "crm", max_items=2, max_wait=0.01)
+        try:
+            return await asyncio.wait_for(
+                asyncio.gather(batcher.submit({"action": "a"}), batcher.submit({"action": "b"})), 2)
+        finally:
+            await router.client.aclose()
+
+    outcomes = asyncio.run(main())
+    assert [o["status"] for o in outcomes] == ["error", "error"]
+    assert all("Bulk response has" in o["error"] for o in outcomes)
+
+
+def test_bulk_results_are_fanned_out_in_order(monkeypatch):
+    async def post(path, payload, max_retries=2):
+        return {"status": "success", "http_status": 200, "error": None,
+                "response_body": {"results": [{"id": item["action"]} for item in payload["items"]]}}
+
+    async def main():
+        router = ActionRouter(base_url="http://bulk.invalid")
+        monkeypatch.setattr(router, "_post_with_retries", post)
+        batcher = ActionBatcher(router, "crm", max_items=2, max_wait=0.01)
+        try:
+            return await asyncio.gather(batcher.submit({"action": "a"}), batcher.submit({"action": "b"}))
+        finally:
+            await router.client.aclose()
+
+    outcomes = asyncio.run(main())
+    assert [o["response_body"] for o in outcomes] == [{"id": "a"}, {"id": "b"}]
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from agents import scheduler
+
+
+def test_urgent_call_overtakes_a_backlog_of_low_priority_calls(monkeypatch):
+    """An urgent upload's LLM work runs ahead of bulk work that was submitted before it."""
+    monkeypatch.setenv("CONDUIT_PRIORITY_THREADS", "4")
+    scheduler.shutdown_executors()
+    llm = scheduler.LLMScheduler(slots=2)
+    finished = []
+
+    def call(name):
+        with llm.slot():
+            time.sleep(0.02)
+        finished.append(name)
+
+    async def submit(level, name):
+        with scheduler.priority_scope(level, fixed=True):
+            await scheduler.run_in_thread(call, name)
+
+    async def main():
+        backlog = [asyncio.create_task(submit("low", f"low-{i}")) for i in range(60)]
+        await asyncio.sleep(0.05)  # the backlog holds every low-priority thread
+        await submit("urgent", "urgent")
+        await asyncio.gather(*backlog)
+
+    try:
+        asyncio.run(main())
+    finally:
+        scheduler.shutdown_executors()
+    # Behind the calls already holding a slot or queued for one, not behind all 60
+    assert finished.index("urgent") < 10